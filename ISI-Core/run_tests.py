@@ -43,6 +43,48 @@ def run_experiment_workflow_test():
         return False
 
 
+def run_stimulus_rendering_test():
+    """Run the stimulus rendering test."""
+    print("Running stimulus rendering test...")
+    try:
+        from tests.test_stimulus_rendering import main
+
+        main()
+        print("✅ Stimulus rendering test completed successfully")
+        return True
+    except Exception as e:
+        print(f"❌ Stimulus rendering test failed: {e}")
+        return False
+
+
+def run_stimulus_storage_test():
+    """Run the stimulus storage test."""
+    print("Running stimulus storage test...")
+    try:
+        from tests.test_stimulus_storage import main
+
+        main()
+        print("✅ Stimulus storage test completed successfully")
+        return True
+    except Exception as e:
+        print(f"❌ Stimulus storage test failed: {e}")
+        return False
+
+
+def run_acquisition_pipeline_test():
+    """Run the acquisition pipeline test."""
+    print("Running acquisition pipeline test...")
+    try:
+        from tests.test_acquisition_pipeline import main
+
+        main()
+        print("✅ Acquisition pipeline test completed successfully")
+        return True
+    except Exception as e:
+        print(f"❌ Acquisition pipeline test failed: {e}")
+        return False
+
+
 def run_integration_test():
     """Run the integration test."""
     print("Running integration test...")
@@ -72,6 +114,9 @@ def main():
     # Run individual tests
     results.append(run_demo())
     results.append(run_experiment_workflow_test())
+    results.append(run_stimulus_rendering_test())
+    results.append(run_stimulus_storage_test())
+    results.append(run_acquisition_pipeline_test())
     results.append(run_integration_test())
 
     # Print summary
@@ -22,12 +22,14 @@ isi_core_path = os.path.join(os.path.dirname(__file__), "../../../ISI-Core/src")
 sys.path.insert(0, isi_core_path)
 
 # Import the service factory and experimental services
-from factories.service_factory import service_factory
+from factories.service_factory import ServiceConfig, ServiceFactory, service_factory
 from interfaces.experiment_interfaces import (
     SetupParameters,
     StimulusParameters,
+    StimulusGenerationOptions,
     AcquisitionParameters,
     AnalysisParameters,
+    CameraFrame,
     ExperimentPhase,
 )
 
@@ -38,18 +40,22 @@ class ExperimentAPI:
     Single Responsibility: Handle HTTP requests for experimental operations.
     """
 
-    def __init__(self):
-        """Initialize the experiment API."""
+    def __init__(self, config: Optional[ServiceConfig] = None):
+        """Initialize the experiment API with services built from config."""
         self.app = Flask(__name__)
         CORS(self.app)
 
         # Create service instances using the service factory
-        self.setup_manager = service_factory.get_setup_manager()
-        self.stimulus_generator = service_factory.get_stimulus_generator()
-        self.acquisition_controller = service_factory.get_acquisition_controller()
-        self.frame_synchronizer = service_factory.get_frame_synchronizer()
-        self.data_analyzer = service_factory.get_data_analyzer()
-        self.experiment_workflow = service_factory.get_experiment_workflow()
+        factory = ServiceFactory(config) if config is not None else service_factory
+        self.setup_manager = factory.get_setup_manager()
+        self.stimulus_generator = factory.get_stimulus_generator()
+        self.acquisition_controller = factory.get_acquisition_controller()
+        self.frame_synchronizer = factory.get_frame_synchronizer()
+        self.data_analyzer = factory.get_data_analyzer()
+        self.experiment_workflow = factory.get_experiment_workflow()
+
+        # Renders the stimulus being configured before generate is clicked
+        self.stimulus_pregenerator = factory.get_stimulus_pregenerator()
 
         # Current experiment state
         self.current_experiment: Optional[str] = None
@@ -75,8 +81,21 @@ class ExperimentAPI:
             self.generate_stimulus
         )
         self.app.route("/api/stimulus/preview", methods=["POST"])(self.preview_stimulus)
+        self.app.route("/api/stimulus/budget", methods=["POST"])(
+            self.profile_render_budget
+        )
         self.app.route("/api/stimulus/save", methods=["POST"])(self.save_stimulus)
         self.app.route("/api/stimulus/load", methods=["POST"])(self.load_stimulus)
+        self.app.route("/api/stimulus/export", methods=["POST"])(self.export_stimulus)
+        self.app.route("/api/stimulus/cache", methods=["GET"])(
+            self.get_stimulus_cache_statistics
+        )
+        self.app.route("/api/stimulus/pregenerate", methods=["POST"])(
+            self.pregenerate_stimulus
+        )
+        self.app.route("/api/stimulus/pregenerate", methods=["GET"])(
+            self.get_pregeneration_status
+        )
 
         # Acquisition Tab Endpoints
         self.app.route("/api/acquisition/initialize", methods=["POST"])(
@@ -255,8 +274,12 @@ class ExperimentAPI:
             stimulus_params = StimulusParameters(**data["stimulus_parameters"])
             setup_params = SetupParameters(**data["setup_parameters"])
 
+            # Finish a matching background render, then reopen it from the cache
+            self.stimulus_pregenerator.wait_for(stimulus_params, setup_params)
             result = self.stimulus_generator.generate_stimulus_frames(
-                stimulus_params, setup_params
+                stimulus_params,
+                setup_params,
+                StimulusGenerationOptions(cached=True),
             )
 
             if result.success:
@@ -287,8 +310,98 @@ class ExperimentAPI:
                 500,
             )
 
+    def get_stimulus_cache_statistics(self):
+        """Get stimulus cache hit/miss counters and occupancy."""
+        try:
+            result = self.stimulus_generator.get_cache_statistics()
+
+            if result.success:
+                return jsonify({"success": True, "cache": result.data})
+            else:
+                return jsonify({"success": False, "error": result.error_message}), 400
+
+        except Exception as e:
+            return (
+                jsonify(
+                    {"success": False, "error": f"Cache statistics failed: {str(e)}"}
+                ),
+                500,
+            )
+
+    def pregenerate_stimulus(self):
+        """Update the expected stimulus rendered in the background."""
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({"error": "No data provided"}), 400
+
+            stimulus_params = StimulusParameters(**data["stimulus_parameters"])
+            setup_params = SetupParameters(**data["setup_parameters"])
+
+            self.stimulus_pregenerator.update(stimulus_params, setup_params)
+
+            return jsonify(
+                {"success": True, "pregeneration": self.stimulus_pregenerator.status()}
+            )
+
+        except Exception as e:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": f"Stimulus pre-generation failed: {str(e)}",
+                    }
+                ),
+                500,
+            )
+
+    def get_pregeneration_status(self):
+        """Get the state of the background stimulus render."""
+        try:
+            return jsonify(
+                {"success": True, "pregeneration": self.stimulus_pregenerator.status()}
+            )
+
+        except Exception as e:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": f"Pre-generation status failed: {str(e)}",
+                    }
+                ),
+                500,
+            )
+
+    def profile_render_budget(self):
+        """Check whether a stimulus can be rendered in real time on a setup."""
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({"error": "No data provided"}), 400
+
+            stimulus_params = StimulusParameters(**data["stimulus_parameters"])
+            setup_params = SetupParameters(**data["setup_parameters"])
+
+            result = self.stimulus_generator.profile_render_budget(
+                stimulus_params, setup_params, frames=data.get("frames", 120)
+            )
+
+            if result.success:
+                return jsonify({"success": True, "report": result.data.dict()})
+            else:
+                return jsonify({"success": False, "error": result.error_message}), 400
+
+        except Exception as e:
+            return (
+                jsonify(
+                    {"success": False, "error": f"Render profiling failed: {str(e)}"}
+                ),
+                500,
+            )
+
     def preview_stimulus(self):
-        """Generate preview frames for stimulus."""
+        """Render preview frames (or thumbnails) at arbitrary frame indices."""
         try:
             data = request.get_json()
             if not data:
@@ -296,40 +409,55 @@ class ExperimentAPI:
 
             stimulus_params = StimulusParameters(**data["stimulus_parameters"])
             setup_params = SetupParameters(**data["setup_parameters"])
-            frame_count = data.get("frame_count", 10)
+            downscale = int(data.get("downscale", 1))
 
+            # Scrubbing requests explicit indices; otherwise preview the first
+            # frames. The generator rejects more than MAX_PREVIEW_FRAMES
+            # indices, which is reported as an invalid request
+            frame_indices = data.get("frame_indices")
             result = self.stimulus_generator.preview_stimulus(
-                stimulus_params, setup_params, frame_count
+                stimulus_params,
+                setup_params,
+                frame_count=int(data.get("frame_count", 10)),
+                frame_indices=frame_indices,
+                downscale=downscale,
             )
 
             if result.success and result.data:
-                # Convert frames to base64 for web display
-                preview_frames = []
-                for frame in result.data[
-                    :5
-                ]:  # Limit to first 5 frames for response size
-                    import base64
+                import base64
 
+                # Preview frames are RGB, ready for web display
+                preview_frames = []
+                for frame in result.data:
                     frame_b64 = base64.b64encode(frame.frame_data).decode("utf-8")
                     preview_frames.append(
                         {
                             "frame_number": frame.frame_number,
                             "timestamp": frame.timestamp,
                             "frame_data": frame_b64,
-                            "photodiode_state": frame.photodiode_state,
                         }
                     )
 
+                height, width = result.metadata["frame_size"]
                 return jsonify(
                     {
                         "success": True,
                         "preview_frames": preview_frames,
-                        "total_preview_frames": len(result.data),
+                        "total_preview_frames": len(preview_frames),
+                        "width": width,
+                        "height": height,
+                        "downscale": downscale,
                     }
                 )
             else:
                 return jsonify({"success": False, "error": result.error_message}), 400
 
+        except (ValueError, TypeError, KeyError) as e:
+            # Malformed parameters, downscale or frame indices are client errors
+            return (
+                jsonify({"success": False, "error": f"Invalid preview request: {e}"}),
+                400,
+            )
         except Exception as e:
             return (
                 jsonify(
@@ -361,7 +489,7 @@ class ExperimentAPI:
                 "output_path", f"stimulus_{self.current_experiment}.json"
             )
             result = self.stimulus_generator.save_stimulus_sequence(
-                stimulus_frames, output_path
+                stimulus_frames, output_path, codec=data.get("codec", "raw")
             )
 
             if result.success:
@@ -379,6 +507,47 @@ class ExperimentAPI:
         except Exception as e:
             return jsonify({"success": False, "error": f"Save failed: {str(e)}"}), 500
 
+    def export_stimulus(self):
+        """Export the current stimulus sequence as PNG images."""
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({"error": "No data provided"}), 400
+
+            if (
+                not self.current_experiment
+                or self.current_experiment not in self.experiment_data
+            ):
+                return jsonify({"error": "No stimulus sequence to export"}), 400
+
+            experiment_data = self.experiment_data[self.current_experiment]
+            stimulus_frames = experiment_data.get("stimulus_frames", [])
+            if not stimulus_frames:
+                return jsonify({"error": "No stimulus frames to export"}), 400
+
+            output_directory = data.get(
+                "output_directory", f"stimulus_{self.current_experiment}_frames"
+            )
+            result = self.stimulus_generator.export_stimulus_images(
+                stimulus_frames, output_directory
+            )
+
+            if result.success:
+                metadata = getattr(result, "metadata", {})
+                return jsonify(
+                    {
+                        "success": True,
+                        "exported_frames": metadata.get("exported_frames", 0),
+                        "output_directory": metadata.get("output_directory", ""),
+                        "total_bytes": metadata.get("total_bytes", 0),
+                    }
+                )
+            else:
+                return jsonify({"success": False, "error": result.error_message}), 400
+
+        except Exception as e:
+            return jsonify({"success": False, "error": f"Export failed: {str(e)}"}), 500
+
     def load_stimulus(self):
         """Load stimulus sequence from disk."""
         try:
@@ -509,15 +678,36 @@ class ExperimentAPI:
     def get_camera_preview(self):
         """Get current camera frame for preview."""
         try:
-            result = self.acquisition_controller.get_camera_preview()
+            # Polling clients pass the last sequence they received
+            after = request.args.get("after", type=int)
+            result = self.acquisition_controller.get_camera_preview(after)
 
             if result.success:
-                # Return image directly
+                metadata = result.metadata
+                headers = {
+                    "X-Frame-Sequence": str(metadata["frame_sequence"]),
+                    "X-Frame-Shape": ",".join(map(str, metadata["frame_shape"])),
+                    "X-Frame-Dtype": metadata["dtype"],
+                    "X-Preview-Shared-Memory": metadata["shared_memory"],
+                }
+                # Skips are only known to clients that sent their last frame
+                if metadata["frames_skipped"] is not None:
+                    headers["X-Frames-Skipped"] = str(metadata["frames_skipped"])
+
+                # Nothing newer than the client's last frame
+                if not result.data:
+                    return "", 204, headers
+
+                # Raw preview pixels, already reduced to preview resolution
                 import io
 
-                return send_file(
-                    io.BytesIO(result.data), mimetype="image/jpeg", as_attachment=False
+                response = send_file(
+                    io.BytesIO(result.data),
+                    mimetype="application/octet-stream",
+                    as_attachment=False,
                 )
+                response.headers.update(headers)
+                return response
             else:
                 return jsonify({"success": False, "error": result.error_message}), 400
 
@@ -590,16 +780,53 @@ class ExperimentAPI:
             if not data:
                 return jsonify({"error": "No data provided"}), 400
 
-            # This would normally receive camera and stimulus frame data
-            # For now, return placeholder response
-            return jsonify(
-                {
-                    "success": True,
-                    "synchronized_count": 0,
-                    "message": "Frame synchronization endpoint ready",
-                }
+            if (
+                not self.current_experiment
+                or self.current_experiment not in self.experiment_data
+            ):
+                return jsonify({"error": "No stimulus sequence to synchronize"}), 400
+
+            stimulus_frames = self.experiment_data[self.current_experiment].get(
+                "stimulus_frames", []
+            )
+            camera_timestamps = data.get("camera_timestamps", [])
+            if not stimulus_frames or not camera_timestamps:
+                return (
+                    jsonify(
+                        {"error": "Stimulus frames and camera timestamps required"}
+                    ),
+                    400,
+                )
+
+            # Stored stimulus sequences are synchronized directly from their
+            # timestamp column, without materializing per-frame objects
+            camera_frames = [
+                CameraFrame(
+                    frame_number=index,
+                    timestamp=timestamp,
+                    camera_timestamp=timestamp,
+                    frame_data=b"",
+                )
+                for index, timestamp in enumerate(camera_timestamps)
+            ]
+            result = self.frame_synchronizer.synchronize_frames(
+                camera_frames, stimulus_frames
             )
 
+            if result.success:
+                return jsonify(
+                    {
+                        "success": True,
+                        "synchronized_count": len(result.data),
+                        "stimulus_frame_numbers": [
+                            stimulus_frame.frame_number
+                            for _, stimulus_frame in result.data
+                        ],
+                    }
+                )
+            else:
+                return jsonify({"success": False, "error": result.error_message}), 400
+
         except Exception as e:
             return (
                 jsonify(
@@ -751,12 +978,22 @@ class ExperimentAPI:
             )
 
     def run(self, host="localhost", port=5000, debug=True):
-        """Run the Flask application."""
-        self.app.run(host=host, port=port, debug=debug)
+        """Run the Flask application, shutting down when it stops."""
+        try:
+            self.app.run(host=host, port=port, debug=debug)
+        finally:
+            self.shutdown()
 
+    def shutdown(self) -> None:
+        """Stop background stimulus pre-generation."""
+        self.stimulus_pregenerator.close()
 
-# Create global API instance
-experiment_api = ExperimentAPI()
+
+# Create global API instance, caching stimuli on disk when
+# ISI_CACHE_DIRECTORY names a cache directory
+experiment_api = ExperimentAPI(
+    ServiceConfig(cache_directory=os.environ.get("ISI_CACHE_DIRECTORY"))
+)
 
 if __name__ == "__main__":
     # Run on port 5001 to match Electron configuration
@@ -15,7 +15,7 @@ This gateway embodies the "One Way, Many Options" principle:
 - Implementation substitutability via dependency injection
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 import logging
@@ -27,6 +27,8 @@ from ..interfaces.experiment_interfaces import (
     IStimulusGenerator,
     IAcquisitionController,
     IDataAnalyzer,
+    SetupParameters,
+    StimulusParameters,
 )
 
 logger = logging.getLogger(__name__)
@@ -194,10 +196,10 @@ class UnifiedISIGateway:
             # Get stimulus service through canonical interface
             stimulus_service = self._get_stimulus_service()
 
-            # Generate stimulus through domain service
+            # Generate lazily rendered stimulus through domain service
             generation_result = stimulus_service.generate_stimulus_frames(
-                stimulus_params=self.config.stimulus_params,
-                setup_params=self.config.setup_params,
+                parameters=StimulusParameters(**self.config.stimulus_params),
+                setup=SetupParameters(**self.config.setup_params),
             )
 
             if generation_result.success:
@@ -235,7 +237,7 @@ class UnifiedISIGateway:
                 operation_id="generate_stimulus",
             )
 
-    def acquire_data(self, stimulus_sequence: List[Any]) -> OperationResult:
+    def acquire_data(self, stimulus_sequence: Sequence[Any]) -> OperationResult:
         """
         Canonical method for data acquisition.
 
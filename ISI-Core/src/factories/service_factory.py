@@ -3,8 +3,10 @@ Service factory for ISI experimental workflow.
 Implements dependency injection and service registration patterns.
 """
 
-from typing import Dict, Type, Any, Optional
+import functools
+from typing import Callable, Dict, Any, Optional
 from abc import ABC, abstractmethod
+from pydantic import BaseModel, Field
 
 from ..interfaces.data_interfaces import IDataStore, IConfigurationService
 from ..interfaces.experiment_interfaces import (
@@ -15,6 +17,33 @@ from ..interfaces.experiment_interfaces import (
     IDataAnalyzer,
     IExperimentWorkflow,
 )
+from ..services.stimulus_cache_service import DEFAULT_STIMULUS_CACHE_BYTES
+from ..services.stimulus_pregeneration_service import (
+    DEFAULT_SETTLE_SECONDS,
+    StimulusPregenerator,
+)
+
+
+class ServiceConfig(BaseModel):
+    """Construction options of the services created by the factory."""
+
+    cache_directory: Optional[str] = Field(
+        None,
+        description="Stimulus and warp table cache directory; None disables caching",
+    )
+    stimulus_cache_bytes: int = Field(
+        DEFAULT_STIMULUS_CACHE_BYTES,
+        gt=0,
+        description="Size budget of the stimulus cache in bytes",
+    )
+    pregeneration_settle_seconds: float = Field(
+        DEFAULT_SETTLE_SECONDS,
+        ge=0,
+        description="Seconds parameters must settle before pre-generation starts",
+    )
+
+    class Config:
+        validate_assignment = True
 
 
 class ServiceRegistry:
@@ -25,13 +54,13 @@ class ServiceRegistry:
 
     def __init__(self):
         """Initialize service registry."""
-        self._services: Dict[str, Dict[str, Type]] = {}
+        self._services: Dict[str, Dict[str, Callable[[], Any]]] = {}
         self._instances: Dict[str, Dict[str, Any]] = {}
 
     def register_service(
-        self, service_name: str, variant: str, service_class: Type
+        self, service_name: str, variant: str, service_class: Callable[[], Any]
     ) -> None:
-        """Register a service implementation."""
+        """Register a service implementation or a callable constructing it."""
         if not service_name or not service_name.strip():
             raise ValueError("service_name cannot be empty")
         if not variant or not variant.strip():
@@ -93,8 +122,12 @@ class ServiceFactory:
     Single Responsibility: Provide centralized service creation and dependency injection.
     """
 
-    def __init__(self):
-        """Initialize service factory."""
+    def __init__(self, config: Optional[ServiceConfig] = None):
+        """Initialize service factory constructing services from config."""
+        if config is not None and not isinstance(config, ServiceConfig):
+            raise TypeError("config must be a ServiceConfig instance")
+
+        self.config = config or ServiceConfig()
         self._registry = ServiceRegistry()
         self._initialize_default_services()
 
@@ -123,7 +156,21 @@ class ServiceFactory:
         # Register experiment services
         self._registry.register_service("setup_manager", "default", SetupManager)
         self._registry.register_service(
-            "stimulus_generator", "default", StimulusGenerator
+            "stimulus_generator",
+            "default",
+            functools.partial(
+                StimulusGenerator,
+                cache_directory=self.config.cache_directory,
+                cache_bytes=self.config.stimulus_cache_bytes,
+            ),
+        )
+        self._registry.register_service(
+            "stimulus_pregenerator",
+            "default",
+            lambda: StimulusPregenerator(
+                self.get_stimulus_generator(),
+                settle_seconds=self.config.pregeneration_settle_seconds,
+            ),
         )
         self._registry.register_service(
             "acquisition_controller", "default", AcquisitionController
@@ -137,9 +184,9 @@ class ServiceFactory:
         )
 
     def register_service(
-        self, service_name: str, variant: str, service_class: Type
+        self, service_name: str, variant: str, service_class: Callable[[], Any]
     ) -> None:
-        """Register a service implementation."""
+        """Register a service implementation or a callable constructing it."""
         self._registry.register_service(service_name, variant, service_class)
 
     def create_service_instance(
@@ -166,6 +213,12 @@ class ServiceFactory:
         """Get stimulus generator service instance."""
         return self._registry.create_service_instance("stimulus_generator", variant)
 
+    def get_stimulus_pregenerator(
+        self, variant: str = "default"
+    ) -> StimulusPregenerator:
+        """Get background stimulus pre-generator service instance."""
+        return self._registry.create_service_instance("stimulus_pregenerator", variant)
+
     def get_acquisition_controller(
         self, variant: str = "default"
     ) -> IAcquisitionController:
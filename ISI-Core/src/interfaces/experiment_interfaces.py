@@ -5,14 +5,19 @@ Interfaces for complete ISI experimental workflow.
 Defines contracts for setup, stimulus generation, acquisition, and analysis phases.
 """
 
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from enum import Enum
+import numpy as np
 
 from .data_interfaces import DataResponse
 
+if TYPE_CHECKING:
+    from ..services.stimulus_service import StimulusFrameSequence
+
 
 class ExperimentPhase(str, Enum):
     """Enumeration of experiment phases."""
@@ -23,6 +28,28 @@ class ExperimentPhase(str, Enum):
     ANALYSIS = "analysis"
 
 
+class FrameFormat(str, Enum):
+    """Enumeration of stored stimulus frame representations."""
+
+    RGB = "rgb"
+    LUMINANCE = "luminance"
+    BINARY = "binary"
+
+
+class StimulusEncoding(str, Enum):
+    """Enumeration of how generated stimulus sequences hold their frames."""
+
+    RENDERED = "rendered"
+    PARAMETRIC = "parametric"
+
+
+class LateFramePolicy(str, Enum):
+    """Enumeration of ways to handle acquisition frames woken past their deadline."""
+
+    CATCH_UP = "catch_up"
+    SKIP = "skip"
+
+
 class SetupParameters(BaseModel):
     """Parameters for experimental setup configuration."""
 
@@ -103,6 +130,10 @@ class StimulusParameters(BaseModel):
         (128, 128, 128), description="Background RGB color"
     )
     bar_color: Optional[Tuple[int, int, int]] = Field(None, description="Bar RGB color")
+    frame_format: FrameFormat = Field(
+        FrameFormat.RGB,
+        description="Stored frame representation: rgb, luminance or 1-bit binary mask",
+    )
 
     # ARCHITECTURAL PURITY: Synchronization removed (modern software approach)
     # Timing/sync handled by ISI-Acquisition in pure software
@@ -126,6 +157,72 @@ class StimulusFrame(BaseModel):
         validate_assignment = True
 
 
+class RenderBudgetReport(BaseModel):
+    """Measured real-time rendering cost of a stimulus on a setup."""
+
+    stimulus_type: str = Field(..., description="Type of stimulus")
+    retinotopy_mode: Optional[str] = Field(None, description="Retinotopy mode")
+    resolution: Tuple[int, int] = Field(
+        ..., description="Monitor resolution (width, height) in pixels"
+    )
+    fps: int = Field(..., gt=0, description="Frames per second")
+    frame_format: FrameFormat = Field(..., description="Stored frame representation")
+    frame_bytes: int = Field(..., ge=0, description="Bytes per rendered frame")
+    frames_profiled: int = Field(..., gt=0, description="Frames rendered and timed")
+
+    # Timing
+    setup_ms: float = Field(..., ge=0, description="Renderer construction time")
+    frame_budget_ms: float = Field(..., gt=0, description="Frame interval 1000/fps")
+    mean_frame_ms: float = Field(..., ge=0, description="Mean per-frame render time")
+    p95_frame_ms: float = Field(
+        ..., ge=0, description="95th percentile per-frame render time"
+    )
+    max_frame_ms: float = Field(..., ge=0, description="Slowest frame render time")
+
+    # Throughput and memory
+    frames_per_second: float = Field(..., ge=0, description="Render throughput")
+    megabytes_per_second: float = Field(
+        ..., ge=0, description="Rendered pixel throughput in MB/s"
+    )
+    peak_frame_allocation_bytes: int = Field(
+        ..., ge=0, description="Peak memory allocated while rendering one frame"
+    )
+
+    # Verdict
+    realtime_capable: bool = Field(
+        ..., description="Whether rendering fits the real-time frame budget"
+    )
+    recommended_mode: str = Field(
+        ..., description="Presentation mode: streaming or pre_rendered"
+    )
+
+
+class StimulusGenerationOptions(BaseModel):
+    """Options selecting how a stimulus sequence is generated."""
+
+    encoding: StimulusEncoding = Field(
+        StimulusEncoding.RENDERED,
+        description="Rendered pixel frames or bar geometry rasterized on demand",
+    )
+    cached: bool = Field(
+        False,
+        description="Reuse and store the sequence in the stimulus cache, if configured",
+    )
+    derive_sweeps: bool = Field(
+        True,
+        description="Derive retinotopy bar sweeps from an already generated direction",
+    )
+
+    @validator("cached")
+    def validate_cached(cls, v, values):
+        if v and values.get("encoding") == StimulusEncoding.PARAMETRIC:
+            raise ValueError("Parametric stimuli are encoded, not cached")
+        return v
+
+    class Config:
+        validate_assignment = True
+
+
 class AcquisitionParameters(BaseModel):
     """Parameters for data acquisition."""
 
@@ -134,7 +231,7 @@ class AcquisitionParameters(BaseModel):
     camera_resolution: Tuple[int, int] = Field(
         (1920, 1080), description="Camera resolution"
     )
-    camera_fps: int = Field(30, gt=0, le=60, description="Camera capture FPS")
+    camera_fps: int = Field(30, gt=0, le=1000, description="Camera capture FPS")
     camera_exposure: Optional[float] = Field(
         None, description="Camera exposure in milliseconds"
     )
@@ -154,6 +251,13 @@ class AcquisitionParameters(BaseModel):
         16.67, gt=0, description="Frame sync tolerance in milliseconds"
     )
     buffer_size: int = Field(1000, gt=0, description="Frame buffer size")
+    buffer_max_bytes: int = Field(
+        1024**3, gt=0, description="Memory budget of the frame buffer in bytes"
+    )
+    late_frame_policy: LateFramePolicy = Field(
+        LateFramePolicy.SKIP,
+        description="Catch up on or skip frames whose deadline has passed",
+    )
 
     # Recording
     save_camera_frames: bool = Field(True, description="Save camera frames to disk")
@@ -163,6 +267,16 @@ class AcquisitionParameters(BaseModel):
         95, ge=0, le=100, description="Image compression quality"
     )
 
+    # Live preview
+    preview_max_size: int = Field(
+        512, gt=0, description="Longest side of camera previews in pixels"
+    )
+    preview_mode: str = Field(
+        "bin",
+        regex="^(bin|decimate)$",
+        description="Preview reduction: block averaging or decimation",
+    )
+
     class Config:
         validate_assignment = True
 
@@ -290,9 +404,46 @@ class IStimulusGenerator(ABC):
 
     @abstractmethod
     def generate_stimulus_frames(
-        self, parameters: StimulusParameters, setup: SetupParameters
-    ) -> DataResponse[List[StimulusFrame]]:
-        """Generate complete stimulus sequence."""
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        options: Optional[StimulusGenerationOptions] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> DataResponse["StimulusFrameSequence"]:
+        """
+        Generate a stimulus sequence with random frame access.
+
+        The sequence hands out lightweight frame views with the attributes
+        of StimulusFrame; to_list() materializes StimulusFrame objects.
+        Options select the frame encoding, caching and sweep derivation;
+        setting cancel abandons a cached render in progress.
+        """
+        pass
+
+    @abstractmethod
+    def get_cache_statistics(self) -> DataResponse[Dict[str, Any]]:
+        """Get stimulus cache hit/miss counters and occupancy."""
+        pass
+
+    @abstractmethod
+    def profile_render_budget(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        frames: int = 120,
+    ) -> DataResponse[RenderBudgetReport]:
+        """Measure whether a stimulus renders within its real-time frame budget."""
+        pass
+
+    @abstractmethod
+    def render_frames(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        indices: Sequence[int],
+        downscale: int = 1,
+    ) -> DataResponse[Sequence[StimulusFrame]]:
+        """Render arbitrary frames of a stimulus sequence by index."""
         pass
 
     @abstractmethod
@@ -301,25 +452,82 @@ class IStimulusGenerator(ABC):
         parameters: StimulusParameters,
         setup: SetupParameters,
         frame_count: int = 10,
+        frame_indices: Optional[Sequence[int]] = None,
+        downscale: int = 1,
     ) -> DataResponse[List[StimulusFrame]]:
-        """Generate preview frames for stimulus."""
+        """Generate RGB preview frames, the first frame_count or at frame_indices."""
         pass
 
     @abstractmethod
     def save_stimulus_sequence(
-        self, frames: List[StimulusFrame], output_path: str
+        self, frames: Sequence[StimulusFrame], output_path: str, codec: str = "raw"
     ) -> DataResponse[bool]:
-        """Save stimulus sequence to disk."""
+        """Save stimulus sequence to disk as raw or delta-encoded frames."""
+        pass
+
+    @abstractmethod
+    def export_stimulus_images(
+        self,
+        frames: Sequence[StimulusFrame],
+        output_directory: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> DataResponse[List[str]]:
+        """Export stimulus frames as lossless image files."""
         pass
 
     @abstractmethod
     def load_stimulus_sequence(
         self, input_path: str
-    ) -> DataResponse[List[StimulusFrame]]:
+    ) -> DataResponse[Sequence[StimulusFrame]]:
         """Load stimulus sequence from disk."""
         pass
 
 
+class ICameraBackend(ABC):
+    """Interface for camera devices the acquisition controller captures from."""
+
+    @abstractmethod
+    def open(self, parameters: AcquisitionParameters) -> DataResponse[Dict[str, Any]]:
+        """Open the camera for the given acquisition parameters."""
+        pass
+
+    @abstractmethod
+    def grab(self, frame_index: int) -> Optional[float]:
+        """
+        Acquire the frame due at frame_index.
+
+        Returns its camera timestamp in seconds, or None if the camera
+        dropped the frame. Called on the capture thread for every frame.
+        """
+        pass
+
+    @abstractmethod
+    def retrieve_into(self, frame: np.ndarray) -> None:
+        """Copy the last grabbed frame into a preallocated frame in place."""
+        pass
+
+    @abstractmethod
+    def close(self) -> DataResponse[bool]:
+        """Release the camera."""
+        pass
+
+    @property
+    @abstractmethod
+    def is_open(self) -> bool:
+        """Whether the camera is open."""
+        pass
+
+    @abstractmethod
+    def statistics(self) -> Dict[str, Any]:
+        """Frames grabbed and dropped by the camera."""
+        pass
+
+    @property
+    def paces_capture(self) -> bool:
+        """Whether grab() paces frames itself instead of the frame scheduler."""
+        return False
+
+
 class IAcquisitionController(ABC):
     """Interface for data acquisition control."""
 
@@ -332,7 +540,7 @@ class IAcquisitionController(ABC):
 
     @abstractmethod
     def start_acquisition(
-        self, stimulus_frames: List[StimulusFrame]
+        self, stimulus_frames: Sequence[StimulusFrame]
     ) -> DataResponse[str]:
         """Start data acquisition with stimulus sequence."""
         pass
@@ -348,8 +556,10 @@ class IAcquisitionController(ABC):
         pass
 
     @abstractmethod
-    def get_camera_preview(self) -> DataResponse[bytes]:
-        """Get current camera frame for preview."""
+    def get_camera_preview(
+        self, after_sequence: Optional[int] = None
+    ) -> DataResponse[bytes]:
+        """Get current camera frame for preview, if newer than after_sequence."""
         pass
 
     @abstractmethod
@@ -363,7 +573,9 @@ class IFrameSynchronizer(ABC):
 
     @abstractmethod
     def synchronize_frames(
-        self, camera_frames: List[CameraFrame], stimulus_frames: List[StimulusFrame]
+        self,
+        camera_frames: Sequence[CameraFrame],
+        stimulus_frames: Sequence[StimulusFrame],
     ) -> DataResponse[List[Tuple[CameraFrame, StimulusFrame]]]:
         """Synchronize camera and stimulus frames using software timing."""
         pass
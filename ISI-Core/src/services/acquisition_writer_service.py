@@ -0,0 +1,368 @@
+# ISI-Core/src/services/acquisition_writer_service.py
+
+"""
+Asynchronous camera frame writing.
+Drains the camera frame ring in batches and writes them to disk on a
+thread pool, keeping disk I/O off the capture thread.
+"""
+
+import os
+import json
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+
+from .camera_buffer_service import CameraFrameBatch, CameraFrameRing, CameraRingReader
+
+# Default frames per written batch
+DEFAULT_WRITE_BATCH_FRAMES = 8
+
+# Default batches being written at once; bounds the writer's memory
+DEFAULT_PENDING_BATCHES = 4
+
+# Default writer threads (file writes and zlib release the GIL)
+DEFAULT_WRITER_WORKERS = 2
+
+# Ring reader name of the disk writer
+WRITER_READER_NAME = "writer"
+
+# Sleep between ring polls while no new frame has been captured
+DRAIN_POLL_SECONDS = 0.002
+
+# Raw camera stack file names
+RAW_FRAMES_FILE = "camera_frames.raw"
+RAW_TIMING_FILE = "camera_timing.npy"
+RAW_HEADER_FILE = "camera_stack.json"
+
+# Per-frame timing columns stored next to raw frames
+CAMERA_TIMING_DTYPE = np.dtype(
+    [
+        ("frame_number", "<i8"),
+        ("timestamp", "<f8"),
+        ("camera_timestamp", "<f8"),
+    ]
+)
+
+
+class CameraFrameSink(ABC):
+    """
+    Destination of written camera frames.
+    Single Responsibility: Persist batches of camera frames.
+
+    Batches arrive from several writer threads and possibly out of order;
+    frame_offset is the position of a batch's first frame in the stack.
+    """
+
+    @abstractmethod
+    def write_batch(self, frame_offset: int, batch: CameraFrameBatch) -> int:
+        """Write a batch at its stack position; returns bytes written."""
+        pass
+
+    @abstractmethod
+    def close(self, frame_count: int) -> None:
+        """Finish the stack once frame_count frames were written."""
+        pass
+
+
+class RawStackSink(CameraFrameSink):
+    """
+    Uncompressed camera stack files.
+    Single Responsibility: Write camera frames as a raw frame file.
+
+    Frames are written at their offset in one raw file, so batches land in
+    any order without coordination. Timing columns and a JSON header with
+    shape and dtype are written on close.
+    """
+
+    def __init__(self, directory: Union[str, Path], ring: CameraFrameRing):
+        """Initialize sink writing into a directory."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.frame_shape = ring.frame_shape
+        self.dtype = ring.dtype
+        self.frame_nbytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+
+        self._timing: List[Tuple[int, np.ndarray]] = []
+        self._timing_lock = threading.Lock()
+        self._fd = os.open(
+            self.directory / RAW_FRAMES_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        )
+
+    def write_batch(self, frame_offset: int, batch: CameraFrameBatch) -> int:
+        """Write a batch's frames at their offset in the raw file."""
+        data = memoryview(batch.frames[: batch.count]).cast("B")
+        position = frame_offset * self.frame_nbytes
+        written = 0
+        while written < len(data):
+            written += os.pwrite(self._fd, data[written:], position + written)
+
+        timing = np.empty(batch.count, dtype=CAMERA_TIMING_DTYPE)
+        timing["frame_number"] = batch.frame_numbers[: batch.count]
+        timing["timestamp"] = batch.timestamps[: batch.count]
+        timing["camera_timestamp"] = batch.camera_timestamps[: batch.count]
+        with self._timing_lock:
+            self._timing.append((frame_offset, timing))
+
+        return written
+
+    def close(self, frame_count: int) -> None:
+        """Write timing and header, then close the raw file."""
+        # Batches written past frame_count (after a failed one) are dropped
+        try:
+            os.ftruncate(self._fd, frame_count * self.frame_nbytes)
+        finally:
+            os.close(self._fd)
+
+        timing = np.empty(frame_count, dtype=CAMERA_TIMING_DTYPE)
+        for frame_offset, columns in self._timing:
+            kept = max(0, min(len(columns), frame_count - frame_offset))
+            timing[frame_offset : frame_offset + kept] = columns[:kept]
+        np.save(self.directory / RAW_TIMING_FILE, timing)
+
+        header = {
+            "frame_count": frame_count,
+            "frame_shape": list(self.frame_shape),
+            "dtype": self.dtype.str,
+            "frames_file": RAW_FRAMES_FILE,
+            "timing_file": RAW_TIMING_FILE,
+        }
+        with open(self.directory / RAW_HEADER_FILE, "w") as f:
+            json.dump(header, f, indent=2)
+
+
+class BatchedFrameWriter:
+    """
+    Asynchronous batched camera frame writer.
+    Single Responsibility: Drain the frame ring to disk off the capture path.
+
+    A drain thread copies ring frames into a fixed pool of batches and
+    hands each full batch to a thread pool that writes it through a sink.
+    The pool of free batches is the bounded queue: when the disk falls
+    behind, the drain thread waits for a batch to come back while capture
+    keeps running, and frames the ring overwrites meanwhile are counted as
+    overruns instead of being silently lost. Write latency, queue depth and
+    throughput are reported by statistics().
+    """
+
+    def __init__(
+        self,
+        ring: CameraFrameRing,
+        sink: CameraFrameSink,
+        batch_frames: int = DEFAULT_WRITE_BATCH_FRAMES,
+        pending_batches: int = DEFAULT_PENDING_BATCHES,
+        workers: int = DEFAULT_WRITER_WORKERS,
+        reader_name: str = WRITER_READER_NAME,
+    ):
+        """Initialize writer draining a ring into a sink."""
+        if not isinstance(ring, CameraFrameRing):
+            raise TypeError("ring must be a CameraFrameRing instance")
+        if not isinstance(sink, CameraFrameSink):
+            raise TypeError("sink must be a CameraFrameSink instance")
+        if batch_frames <= 0:
+            raise ValueError("batch_frames must be positive")
+        if pending_batches <= 0:
+            raise ValueError("pending_batches must be positive")
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+
+        self.ring = ring
+        self.sink = sink
+        self.batch_frames = batch_frames
+        self.pending_batches = pending_batches
+        self.workers = workers
+        self.reader_name = reader_name
+
+        self._free: "queue.Queue[CameraFrameBatch]" = queue.Queue()
+        for _ in range(pending_batches):
+            self._free.put(CameraFrameBatch(batch_frames, ring.frame_shape, ring.dtype))
+
+        self._reader: Optional[CameraRingReader] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._drain_thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._stop_position = 0
+        self._stats_lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+
+        self._frames_submitted = 0
+        self._frames_written = 0
+        self._batches_written = 0
+        self._bytes_written = 0
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._latency_sum = 0.0
+        self._max_latency = 0.0
+        self._failed_offset: Optional[int] = None
+        self._drain_stalls = 0
+        self._stall_seconds = 0.0
+        self._started_at = 0.0
+        self._stopped_at: Optional[float] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the drain thread is running."""
+        return self._drain_thread is not None and self._drain_thread.is_alive()
+
+    def start(self) -> None:
+        """Start draining frames published from now on."""
+        if self._drain_thread is not None:
+            raise RuntimeError("Writer already started")
+
+        self._reader = self.ring.reader(self.reader_name)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="camera-writer"
+        )
+        self._started_at = time.perf_counter()
+        self._drain_thread = threading.Thread(target=self._drain, daemon=True)
+        self._drain_thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Write every frame captured so far, close the sink and stop.
+
+        Returns the final statistics; raises RuntimeError if a write failed.
+        """
+        if self._drain_thread is None:
+            raise RuntimeError("Writer not started")
+
+        self._stop_position = self.ring.published
+        self._stopping.set()
+        self._drain_thread.join(timeout)
+        if self._drain_thread.is_alive():
+            raise RuntimeError("Timed out waiting for the frame writer to drain")
+
+        try:
+            self._pool.shutdown(wait=True)
+        finally:
+            self._reader.close()
+            self._stopped_at = time.perf_counter()
+
+            # Frames before a failed batch are still closed into a readable stack
+            try:
+                self.sink.close(self._frames_saved())
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+
+        if self._error is not None:
+            raise RuntimeError(f"Camera frame write failed: {self._error}")
+
+        return self.statistics()
+
+    def statistics(self) -> Dict[str, Any]:
+        """Write latency, queue depth, throughput and dropped frames."""
+        with self._stats_lock:
+            batches = self._batches_written
+            stopped_at = self._stopped_at or time.perf_counter()
+            elapsed = stopped_at - self._started_at if self._started_at else 0.0
+
+            return {
+                "frames_written": self._frames_written,
+                "batches_written": self._batches_written,
+                "bytes_written": self._bytes_written,
+                "queue_depth": self._queue_depth,
+                "max_queue_depth": self._max_queue_depth,
+                "queue_capacity": self.pending_batches,
+                "mean_write_latency_ms": (
+                    self._latency_sum / batches * 1000 if batches else 0.0
+                ),
+                "max_write_latency_ms": self._max_latency * 1000,
+                "frames_per_second": self._frames_written / elapsed if elapsed else 0.0,
+                "megabytes_per_second": (
+                    self._bytes_written / elapsed / 1e6 if elapsed else 0.0
+                ),
+                "drain_stalls": self._drain_stalls,
+                "stall_seconds": self._stall_seconds,
+                "dropped_frames": self._reader.overruns if self._reader else 0,
+                "error": str(self._error) if self._error else "",
+            }
+
+    def _drain(self) -> None:
+        """Fill batches from the ring and submit them for writing."""
+        try:
+            while self._error is None:
+                batch = self._next_free_batch()
+                batch.clear()
+
+                # Only the batch reaching the stop position may be partial,
+                # so every earlier batch stays aligned in the stack
+                while not batch.is_full:
+                    if self._reader.read_into(batch, append=True) == 0:
+                        if self._stop_reached():
+                            break
+                        time.sleep(DRAIN_POLL_SECONDS)
+
+                if batch.count == 0:
+                    self._free.put(batch)
+                    return
+
+                self._submit(batch)
+                if self._stop_reached():
+                    return
+        except Exception as e:
+            self._error = e
+
+    def _stop_reached(self) -> bool:
+        """Whether stop() was called and every frame before it was read."""
+        return self._stopping.is_set() and self._reader.position >= self._stop_position
+
+    def _frames_saved(self) -> int:
+        """Frames written without a gap from the start of the stack."""
+        with self._stats_lock:
+            if self._failed_offset is not None:
+                return self._failed_offset
+            return self._frames_written
+
+    def _next_free_batch(self) -> CameraFrameBatch:
+        """Take a free batch, waiting for a write to finish when none is left."""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Backpressure: every batch is queued for the disk
+        waited_from = time.perf_counter()
+        batch = self._free.get()
+        with self._stats_lock:
+            self._drain_stalls += 1
+            self._stall_seconds += time.perf_counter() - waited_from
+        return batch
+
+    def _submit(self, batch: CameraFrameBatch) -> None:
+        """Queue a filled batch for writing at the next stack position."""
+        frame_offset = self._frames_submitted
+        self._frames_submitted += batch.count
+
+        with self._stats_lock:
+            self._queue_depth += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+
+        self._pool.submit(self._write, batch, frame_offset, time.perf_counter())
+
+    def _write(
+        self, batch: CameraFrameBatch, frame_offset: int, submitted_at: float
+    ) -> None:
+        """Writer thread: write one batch and return it to the free pool."""
+        try:
+            written = self.sink.write_batch(frame_offset, batch)
+            latency = time.perf_counter() - submitted_at
+            with self._stats_lock:
+                self._frames_written += batch.count
+                self._batches_written += 1
+                self._bytes_written += written
+                self._latency_sum += latency
+                self._max_latency = max(self._max_latency, latency)
+        except Exception as e:
+            with self._stats_lock:
+                if self._failed_offset is None or frame_offset < self._failed_offset:
+                    self._failed_offset = frame_offset
+            self._error = e
+        finally:
+            with self._stats_lock:
+                self._queue_depth -= 1
+            self._free.put(batch)
@@ -0,0 +1,443 @@
+# ISI-Core/src/services/camera_backend_service.py
+
+"""
+Camera backends for acquisition without hardware.
+Provides a deterministic simulated camera producing intrinsic-signal-like
+frames fast enough to load-test the acquisition pipeline, and a replay
+camera streaming a recorded acquisition back through it.
+"""
+
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+import numpy as np
+
+from ..interfaces.experiment_interfaces import AcquisitionParameters, ICameraBackend
+from ..interfaces.data_interfaces import DataResponse
+from .camera_buffer_service import CAMERA_FRAME_DTYPE
+from .camera_stack_service import CameraStackReader
+from .frame_scheduler_service import NS_PER_SECOND, sleep_until
+
+# Supported simulated sensor bit depths
+SIMULATED_BIT_DEPTHS = (12, 16)
+
+# Mean reflectance as a fraction of the sensor's full scale
+SIMULATED_MEAN_LEVEL = 0.5
+
+# Default intrinsic signal amplitude as a fraction of the mean level
+DEFAULT_SIGNAL_AMPLITUDE = 0.002
+
+# Default standard deviation of sensor noise in counts
+DEFAULT_NOISE_COUNTS = 8.0
+
+# Precomputed noise frames cycled through pseudo-randomly
+DEFAULT_NOISE_FRAMES = 8
+
+# Default duration of one stimulus cycle (one bar sweep) in seconds
+DEFAULT_CYCLE_SECONDS = 10.0
+
+# Quantization of a pixel's preferred stimulus phase
+RESPONSE_PHASE_STEPS = 256
+
+# Multipliers of the 32-bit integer hash (MurmurHash3 finalizer) driving
+# per-frame noise selection, jitter and drops
+FRAME_HASH_MULTIPLIERS = (0x9E3779B1, 0x85EBCA6B, 0xC2B2AE35)
+
+
+def _frame_hash(frame_index: int, salt: int) -> float:
+    """Deterministic uniform value in [0, 1) for a frame."""
+    golden, first, second = FRAME_HASH_MULTIPLIERS
+    value = (frame_index * golden + salt * first) & 0xFFFFFFFF
+    value ^= value >> 16
+    value = (value * first) & 0xFFFFFFFF
+    value ^= value >> 13
+    value = (value * second) & 0xFFFFFFFF
+    value ^= value >> 16
+    return value / float(1 << 32)
+
+
+class SimulatedCamera(ICameraBackend):
+    """
+    Deterministic simulated ISI camera.
+    Single Responsibility: Produce reproducible camera frames without hardware.
+
+    Frames show a vignetted cortex with dark vessels, plus a retinotopic
+    intrinsic signal: each pixel in a simulated visual area responds when
+    the stimulus phase, frame_index over the cycle length, passes its
+    preferred phase, so a sweep produces a travelling wave across the map.
+
+    Everything per-frame is a table lookup: the base image with noise comes
+    from a few precomputed noise frames, and the signal is one lookup of a
+    per-frame phase table through each pixel's preferred-phase index, the
+    same scheme the stimulus renderer uses for gratings. Frame content,
+    timestamp jitter and drops depend only on the seed and frame_index, so
+    runs are reproducible however the capture loop is paced.
+    """
+
+    def __init__(
+        self,
+        bit_depth: int = 12,
+        signal_amplitude: float = DEFAULT_SIGNAL_AMPLITUDE,
+        noise_counts: float = DEFAULT_NOISE_COUNTS,
+        cycle_seconds: float = DEFAULT_CYCLE_SECONDS,
+        jitter_ms: float = 0.0,
+        drop_probability: float = 0.0,
+        noise_frames: int = DEFAULT_NOISE_FRAMES,
+        seed: int = 0,
+    ):
+        """Initialize simulated camera."""
+        if bit_depth not in SIMULATED_BIT_DEPTHS:
+            raise ValueError(f"bit_depth must be one of {SIMULATED_BIT_DEPTHS}")
+        if not 0 <= signal_amplitude < 1:
+            raise ValueError("signal_amplitude must be in [0, 1)")
+        if noise_counts < 0:
+            raise ValueError("noise_counts cannot be negative")
+        if cycle_seconds <= 0:
+            raise ValueError("cycle_seconds must be positive")
+        if jitter_ms < 0:
+            raise ValueError("jitter_ms cannot be negative")
+        if not 0 <= drop_probability < 1:
+            raise ValueError("drop_probability must be in [0, 1)")
+        if noise_frames <= 0:
+            raise ValueError("noise_frames must be positive")
+
+        self.bit_depth = bit_depth
+        self.signal_amplitude = signal_amplitude
+        self.noise_counts = noise_counts
+        self.cycle_seconds = cycle_seconds
+        self.jitter_ms = jitter_ms
+        self.drop_probability = drop_probability
+        self.noise_frames = noise_frames
+        self.seed = seed
+
+        self._fps = 0
+        self._frame_shape: Optional[tuple] = None
+        self._base_frames: Optional[np.ndarray] = None
+        self._phase_index: Optional[np.ndarray] = None
+        self._signal_offset = 0
+        self._signal_table: Optional[np.ndarray] = None
+        self._lut = np.empty(RESPONSE_PHASE_STEPS + 1, dtype=CAMERA_FRAME_DTYPE)
+        self._grabbed_index = -1
+        self._frames_grabbed = 0
+        self._frames_dropped = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the camera is open."""
+        return self._base_frames is not None
+
+    @property
+    def full_scale(self) -> int:
+        """Largest pixel value of the simulated sensor."""
+        return (1 << self.bit_depth) - 1
+
+    @property
+    def preferred_phase(self) -> Optional[np.ndarray]:
+        """Per-pixel preferred stimulus phase in cycles, NaN outside the visual area."""
+        if self._phase_index is None:
+            return None
+        phase = self._phase_index / RESPONSE_PHASE_STEPS
+        return np.where(self._phase_index < RESPONSE_PHASE_STEPS, phase, np.nan)
+
+    def open(self, parameters: AcquisitionParameters) -> DataResponse[Dict[str, Any]]:
+        """Build the frame tables for the camera resolution and rate."""
+        if not isinstance(parameters, AcquisitionParameters):
+            raise TypeError("parameters must be an AcquisitionParameters instance")
+
+        try:
+            width, height = parameters.camera_resolution
+            self._fps = parameters.camera_fps
+            self._frame_shape = (height, width)
+            rng = np.random.default_rng(self.seed)
+
+            base = self._build_base_image(rng, height, width)
+            self._phase_index = self._build_phase_index(rng, height, width)
+
+            # Signal table values are offset to stay unsigned; the base
+            # frames are stored with the offset subtracted
+            mean_level = SIMULATED_MEAN_LEVEL * self.full_scale
+            amplitude = self.signal_amplitude * mean_level
+            self._signal_offset = int(math.ceil(amplitude))
+            phases = np.arange(RESPONSE_PHASE_STEPS) / RESPONSE_PHASE_STEPS
+            self._signal_table = np.rint(
+                self._signal_offset + amplitude * np.cos(2 * np.pi * phases)
+            ).astype(CAMERA_FRAME_DTYPE)
+            self._lut[RESPONSE_PHASE_STEPS] = self._signal_offset
+
+            base_frames = np.empty(
+                (self.noise_frames, height, width), dtype=CAMERA_FRAME_DTYPE
+            )
+            ceiling = self.full_scale - 2 * self._signal_offset
+            for index in range(self.noise_frames):
+                noisy = base + rng.normal(0.0, self.noise_counts, base.shape)
+                np.clip(
+                    np.rint(noisy) - self._signal_offset,
+                    0,
+                    ceiling,
+                    out=noisy,
+                )
+                base_frames[index] = noisy
+            self._base_frames = base_frames
+
+            self._frames_grabbed = 0
+            self._frames_dropped = 0
+            self._grabbed_index = -1
+
+            info = {
+                "backend": "simulated",
+                "resolution": [width, height],
+                "fps": self._fps,
+                "bit_depth": self.bit_depth,
+                "table_bytes": base_frames.nbytes + self._phase_index.nbytes,
+            }
+            return DataResponse(success=True, data=info, error_message="")
+
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to open simulated camera: {e}",
+            )
+
+    def grab(self, frame_index: int) -> Optional[float]:
+        """Acquire frame_index; returns its camera timestamp or None if dropped."""
+        if self._base_frames is None:
+            raise RuntimeError("Camera not open")
+
+        if self.drop_probability and (
+            _frame_hash(frame_index, self.seed + 1) < self.drop_probability
+        ):
+            self._frames_dropped += 1
+            return None
+
+        self._grabbed_index = frame_index
+        self._frames_grabbed += 1
+
+        timestamp = frame_index / self._fps
+        if self.jitter_ms:
+            offset = 2 * _frame_hash(frame_index, self.seed + 2) - 1
+            timestamp += offset * self.jitter_ms / 1000
+        return timestamp
+
+    def retrieve_into(self, frame: np.ndarray) -> None:
+        """Render the grabbed frame into frame in place."""
+        if self._grabbed_index < 0:
+            raise RuntimeError("No frame grabbed")
+
+        frame_index = self._grabbed_index
+
+        # Signal of every preferred phase at this frame's stimulus phase
+        cycle_frames = self.cycle_seconds * self._fps
+        shift = int((frame_index % cycle_frames) / cycle_frames * RESPONSE_PHASE_STEPS)
+        self._lut[:RESPONSE_PHASE_STEPS] = np.roll(self._signal_table, shift)
+
+        noise = int(_frame_hash(frame_index, self.seed) * self.noise_frames)
+        # mode="clip" lets take write straight into the frame unbuffered
+        np.take(self._lut, self._phase_index, out=frame, mode="clip")
+        np.add(frame, self._base_frames[noise], out=frame)
+
+    def close(self) -> DataResponse[bool]:
+        """Release the frame tables."""
+        self._base_frames = None
+        self._phase_index = None
+        self._grabbed_index = -1
+        return DataResponse(success=True, data=True, error_message="")
+
+    def statistics(self) -> Dict[str, Any]:
+        """Frames grabbed and dropped."""
+        return {
+            "backend": "simulated",
+            "frames_grabbed": self._frames_grabbed,
+            "frames_dropped": self._frames_dropped,
+        }
+
+    def _build_base_image(
+        self, rng: np.random.Generator, height: int, width: int
+    ) -> np.ndarray:
+        """Vignetted cortical surface with dark vessels, in counts."""
+        rows = np.linspace(-1.0, 1.0, height)[:, None]
+        columns = np.linspace(-1.0, 1.0, width)[None, :]
+        vignette = 1.0 - 0.25 * (rows**2 + columns**2)
+
+        # Vessels: narrow valleys of a random smooth field
+        field = np.zeros((height, width))
+        for _ in range(6):
+            frequency = rng.uniform(1.0, 4.0, size=2)
+            phase = rng.uniform(0, 2 * np.pi, size=2)
+            field += np.sin(np.pi * frequency[0] * rows + phase[0]) * np.cos(
+                np.pi * frequency[1] * columns + phase[1]
+            )
+        vessels = np.exp(-((field / 0.15) ** 2))
+
+        mean_level = SIMULATED_MEAN_LEVEL * self.full_scale
+        return mean_level * vignette * (1.0 - 0.3 * vessels)
+
+    def _build_phase_index(
+        self, rng: np.random.Generator, height: int, width: int
+    ) -> np.ndarray:
+        """
+        Quantized preferred phase of every pixel.
+
+        Inside an elliptical visual area the preferred phase runs along a
+        tilted axis, a retinotopic gradient; outside it pixels point at the
+        table's last entry, which carries no signal.
+        """
+        rows = np.linspace(-1.0, 1.0, height)[:, None]
+        columns = np.linspace(-1.0, 1.0, width)[None, :]
+        angle = rng.uniform(-0.3, 0.3)
+        along = columns * np.cos(angle) + rows * np.sin(angle)
+        inside = (columns / 0.8) ** 2 + (rows / 0.7) ** 2 <= 1.0
+
+        phase = np.clip((along + 0.8) / 1.6, 0.0, 1.0 - 1e-9)
+        # Native index dtype, so np.take does not convert indices every frame
+        index = np.floor(phase * RESPONSE_PHASE_STEPS).astype(np.intp)
+        index[~inside] = RESPONSE_PHASE_STEPS
+        return index
+
+
+class ReplayCamera(ICameraBackend):
+    """
+    Recorded acquisition replay camera.
+    Single Responsibility: Stream a saved camera stack through live acquisition.
+
+    Frame index i returns the recorded frame numbered i with its recorded
+    camera timestamp, and frames missing from the recording are dropped
+    again, so synchronization sees exactly what it saw live. In real time
+    the replay paces itself on the recorded host timestamps, reproducing
+    capture jitter; otherwise frames are delivered as fast as the pipeline
+    takes them. Frames are decompressed a whole stack chunk at a time,
+    before any pacing wait.
+    """
+
+    def __init__(self, path: Union[str, Path], realtime: bool = True):
+        """Initialize replay of the camera stack at path."""
+        self.path = Path(path)
+        self.realtime = realtime
+
+        self._reader: Optional[CameraStackReader] = None
+        self._positions: Optional[np.ndarray] = None
+        self._offsets_ns: Optional[np.ndarray] = None
+        self._anchor_ns: Optional[int] = None
+        self._chunk: Optional[np.ndarray] = None
+        self._chunk_start = -1
+        self._position = -1
+        self._frames_grabbed = 0
+        self._frames_dropped = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the recording is open."""
+        return self._reader is not None
+
+    @property
+    def paces_capture(self) -> bool:
+        """Replay delivers frames on recorded timing or as fast as possible."""
+        return True
+
+    @property
+    def frame_count(self) -> int:
+        """Frame indices covered by the recording, including dropped ones."""
+        return 0 if self._positions is None else len(self._positions)
+
+    def open(self, parameters: AcquisitionParameters) -> DataResponse[Dict[str, Any]]:
+        """Open the recording; it must match the camera resolution."""
+        if not isinstance(parameters, AcquisitionParameters):
+            raise TypeError("parameters must be an AcquisitionParameters instance")
+
+        try:
+            reader = CameraStackReader(self.path)
+            width, height = parameters.camera_resolution
+            if reader.frame_shape != (height, width):
+                raise ValueError(
+                    f"Recorded frame shape {reader.frame_shape} does not match "
+                    f"camera resolution {parameters.camera_resolution}"
+                )
+
+            # Stack position of every recorded frame number, -1 where dropped
+            frame_numbers = np.asarray(reader.frame_numbers)
+            size = int(frame_numbers.max()) + 1 if len(frame_numbers) else 0
+            self._positions = np.full(size, -1, dtype=np.int64)
+            self._positions[frame_numbers] = np.arange(len(frame_numbers))
+
+            timestamps = np.asarray(reader.timestamps, dtype=np.float64)
+            self._offsets_ns = np.rint(
+                (timestamps - (timestamps[0] if len(timestamps) else 0.0))
+                * NS_PER_SECOND
+            ).astype(np.int64)
+
+            self._reader = reader
+            self._anchor_ns = None
+            self._chunk = None
+            self._chunk_start = -1
+            self._position = -1
+            self._frames_grabbed = 0
+            self._frames_dropped = 0
+
+            info = {
+                "backend": "replay",
+                "source": str(self.path),
+                "resolution": [width, height],
+                "frames_recorded": len(reader),
+                "frame_count": size,
+                "realtime": self.realtime,
+            }
+            return DataResponse(success=True, data=info, error_message="")
+
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to open replay camera: {e}",
+            )
+
+    def grab(self, frame_index: int) -> Optional[float]:
+        """Load recorded frame frame_index; None if it was not recorded."""
+        if self._reader is None:
+            raise RuntimeError("Camera not open")
+
+        if frame_index >= len(self._positions) or self._positions[frame_index] < 0:
+            self._frames_dropped += 1
+            return None
+
+        position = int(self._positions[frame_index])
+        chunk_frames = self._reader.chunk_frames
+        chunk_start = position - position % chunk_frames
+        if chunk_start != self._chunk_start:
+            self._chunk = self._reader.read(
+                chunk_start, min(chunk_start + chunk_frames, len(self._reader))
+            )
+            self._chunk_start = chunk_start
+
+        if self.realtime:
+            if self._anchor_ns is None:
+                self._anchor_ns = time.perf_counter_ns() - int(
+                    self._offsets_ns[position]
+                )
+            sleep_until(self._anchor_ns + int(self._offsets_ns[position]))
+
+        self._position = position
+        self._frames_grabbed += 1
+        return float(self._reader.camera_timestamps[position])
+
+    def retrieve_into(self, frame: np.ndarray) -> None:
+        """Copy the grabbed recorded frame into frame."""
+        if self._position < 0:
+            raise RuntimeError("No frame grabbed")
+        np.copyto(frame, self._chunk[self._position - self._chunk_start])
+
+    def close(self) -> DataResponse[bool]:
+        """Release the recording."""
+        self._reader = None
+        self._chunk = None
+        self._chunk_start = -1
+        self._position = -1
+        return DataResponse(success=True, data=True, error_message="")
+
+    def statistics(self) -> Dict[str, Any]:
+        """Frames replayed and frames missing from the recording."""
+        return {
+            "backend": "replay",
+            "frames_grabbed": self._frames_grabbed,
+            "frames_dropped": self._frames_dropped,
+        }
@@ -0,0 +1,356 @@
+# ISI-Core/src/services/camera_buffer_service.py
+
+"""
+Preallocated camera frame buffering.
+Holds captured camera frames in a fixed ring of NumPy frames written by one
+capture thread and read by any number of independent consumers.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from ..interfaces.experiment_interfaces import AcquisitionParameters
+
+# Stored camera pixel type: 12- and 16-bit sensors both fit in uint16
+CAMERA_FRAME_DTYPE = np.dtype(np.uint16)
+
+# Attempts to copy the latest frame before giving up on a lapping producer
+LATEST_FRAME_ATTEMPTS = 3
+
+
+class CameraFrameBatch:
+    """
+    Reusable batch of camera frames.
+    Single Responsibility: Hold a consumer's copy of consecutive ring frames.
+
+    Consumers allocate batches once and refill them from the ring, so
+    draining the ring does not allocate per frame either.
+    """
+
+    def __init__(
+        self,
+        max_frames: int,
+        frame_shape: Tuple[int, ...],
+        dtype: Any = CAMERA_FRAME_DTYPE,
+    ):
+        """Initialize batch holding up to max_frames frames."""
+        if max_frames <= 0:
+            raise ValueError("max_frames must be positive")
+
+        self.frames = np.empty((max_frames,) + tuple(frame_shape), dtype=dtype)
+        self.frame_numbers = np.empty(max_frames, dtype=np.int64)
+        self.timestamps = np.empty(max_frames, dtype=np.float64)
+        self.camera_timestamps = np.empty(max_frames, dtype=np.float64)
+
+        # Touch every page now so the first refill does not page-fault
+        self.frames.fill(0)
+
+        # Frames held and ring sequence number of the first of them
+        self.count = 0
+        self.first_sequence = 0
+
+    @property
+    def is_full(self) -> bool:
+        """Whether the batch holds max_frames frames."""
+        return self.count == len(self.frames)
+
+    def clear(self) -> None:
+        """Empty the batch for refilling."""
+        self.count = 0
+
+    @property
+    def max_frames(self) -> int:
+        """Number of frames the batch can hold."""
+        return len(self.frames)
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single frame."""
+        return self.frames.shape[1:]
+
+
+class CameraFrameRing:
+    """
+    Camera frame ring buffer.
+    Single Responsibility: Hand captured frames from the capture thread to consumers.
+
+    Frames and their timing live in arrays allocated once. The single
+    producer claims the next slot, captures into it in place and publishes
+    it; it never waits, so once every slot is in use the oldest frame is
+    overwritten. Consumers keep their own read positions: a slow consumer
+    loses its oldest unread frames, counted as overruns, without stalling
+    capture or the other consumers.
+
+    Publication is a sequence lock: a claim marks the slot as being
+    overwritten before any pixel changes, and readers check after copying
+    that none of the frames they copied was claimed meanwhile.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        frame_shape: Tuple[int, ...],
+        dtype: Any = CAMERA_FRAME_DTYPE,
+    ):
+        """Initialize ring of capacity preallocated frames."""
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if len(frame_shape) == 0 or int(np.prod(frame_shape)) == 0:
+            raise ValueError("frame_shape must describe a non-empty frame")
+
+        self.capacity = capacity
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+
+        # Filled rather than zero-allocated: zeroed allocations are mapped
+        # lazily, and page faults on the first lap stall capture
+        self.frames = np.empty((capacity,) + self.frame_shape, dtype=self.dtype)
+        self.frames.fill(0)
+        self.frame_numbers = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.camera_timestamps = np.zeros(capacity, dtype=np.float64)
+
+        # Slot views built once so claiming a slot allocates nothing
+        self._slots = list(self.frames)
+
+        # Frames published, and frames whose slot may already be overwritten
+        self._published = 0
+        self._claimed = 0
+
+        # Guards reader registration only, never the data path
+        self._readers: Dict[str, "CameraRingReader"] = {}
+        self._readers_lock = threading.Lock()
+
+    @classmethod
+    def for_parameters(cls, parameters: AcquisitionParameters) -> "CameraFrameRing":
+        """Ring of up to buffer_size frames within buffer_max_bytes."""
+        if not isinstance(parameters, AcquisitionParameters):
+            raise TypeError("parameters must be an AcquisitionParameters instance")
+
+        width, height = parameters.camera_resolution
+        frame_bytes = width * height * CAMERA_FRAME_DTYPE.itemsize
+        if frame_bytes > parameters.buffer_max_bytes:
+            raise ValueError("buffer_max_bytes is smaller than one camera frame")
+
+        capacity = min(
+            parameters.buffer_size, parameters.buffer_max_bytes // frame_bytes
+        )
+        return cls(capacity, (height, width))
+
+    @property
+    def published(self) -> int:
+        """Total number of frames published."""
+        return self._published
+
+    @property
+    def claimed(self) -> int:
+        """
+        Sequence bound of frames whose slot may already be overwritten.
+
+        Equals published, or published + 1 while a frame is claimed. Frames
+        below claimed - capacity are gone; a copy of a frame is intact only
+        if the frame is still at or above that bound after copying.
+        """
+        return self._claimed
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of preallocated frame storage."""
+        return self.frames.nbytes
+
+    def claim(self) -> np.ndarray:
+        """Writable slot of the next frame, published by publish()."""
+        if self._claimed != self._published:
+            raise RuntimeError("Previous frame was claimed but not published")
+
+        # Readers treat the slot's old frame as overwritten from here on
+        self._claimed = self._published + 1
+        return self._slots[self._published % self.capacity]
+
+    def publish(
+        self, frame_number: int, timestamp: float, camera_timestamp: float
+    ) -> int:
+        """Publish the claimed frame with its timing; returns its sequence number."""
+        sequence = self._published
+        if self._claimed != sequence + 1:
+            raise RuntimeError("No claimed frame to publish")
+
+        slot = sequence % self.capacity
+        self.frame_numbers[slot] = frame_number
+        self.timestamps[slot] = timestamp
+        self.camera_timestamps[slot] = camera_timestamp
+        self._published = sequence + 1
+        return sequence
+
+    def reader(self, name: str) -> "CameraRingReader":
+        """Register a consumer that reads from the next published frame on."""
+        if not name:
+            raise ValueError("name cannot be empty")
+
+        with self._readers_lock:
+            if name in self._readers:
+                raise ValueError(f"Reader already registered: {name}")
+            reader = CameraRingReader(self, name)
+            self._readers[name] = reader
+            return reader
+
+    def remove_reader(self, name: str) -> None:
+        """Unregister a consumer."""
+        with self._readers_lock:
+            self._readers.pop(name, None)
+
+    def latest_into(
+        self,
+        out: np.ndarray,
+        transform: Optional[Callable[[np.ndarray, np.ndarray], None]] = None,
+    ) -> Optional[int]:
+        """
+        Copy the newest published frame into out.
+
+        A transform(frame, out) writes a reduced copy instead, reading the
+        ring slot directly. Returns the frame's sequence number, or None
+        when no frame has been published or the producer kept overwriting
+        it while copying.
+        """
+        for _ in range(LATEST_FRAME_ATTEMPTS):
+            sequence = self._published - 1
+            if sequence < 0:
+                return None
+
+            slot = self._slots[sequence % self.capacity]
+            if transform is None:
+                np.copyto(out, slot)
+            else:
+                transform(slot, out)
+            if sequence >= self._claimed - self.capacity:
+                return sequence
+
+        return None
+
+    def statistics(self) -> Dict[str, Any]:
+        """Ring occupancy and per-consumer progress and overruns."""
+        with self._readers_lock:
+            readers: List[CameraRingReader] = list(self._readers.values())
+
+        return {
+            "capacity": self.capacity,
+            "frame_shape": list(self.frame_shape),
+            "dtype": self.dtype.name,
+            "buffer_bytes": self.nbytes,
+            "frames_published": self._published,
+            "readers": {reader.name: reader.statistics() for reader in readers},
+        }
+
+    def copy_range(
+        self, batch: CameraFrameBatch, start: int, stop: int, offset: int
+    ) -> None:
+        """
+        Copy sequences [start, stop) into a batch from position offset.
+
+        The copy does not synchronize with the producer: frames below
+        claimed - capacity once it returns may be torn and must be dropped.
+        """
+        while start < stop:
+            slot = start % self.capacity
+            count = min(stop - start, self.capacity - slot)
+            target = slice(offset, offset + count)
+            source = slice(slot, slot + count)
+
+            np.copyto(batch.frames[target], self.frames[source])
+            batch.frame_numbers[target] = self.frame_numbers[source]
+            batch.timestamps[target] = self.timestamps[source]
+            batch.camera_timestamps[target] = self.camera_timestamps[source]
+
+            offset += count
+            start += count
+
+
+class CameraRingReader:
+    """
+    Independent consumer position in a camera frame ring.
+    Single Responsibility: Drain ring frames in order for one consumer.
+
+    Frames the producer overwrote before they were read are skipped and
+    counted as overruns, so a consumer always resumes at the oldest frame
+    still intact.
+    """
+
+    def __init__(self, ring: CameraFrameRing, name: str):
+        """Initialize reader positioned at the ring's next frame."""
+        self.ring = ring
+        self.name = name
+        self.position = ring.published
+        self.frames_read = 0
+        self.overruns = 0
+
+    @property
+    def lag(self) -> int:
+        """Published frames not yet read."""
+        return self.ring.published - self.position
+
+    def read_into(self, batch: CameraFrameBatch, append: bool = False) -> int:
+        """
+        Copy the oldest unread frames into a batch.
+
+        The batch is refilled from the front, or extended after its current
+        frames when append is set. Returns the number of frames copied, 0
+        when the reader is caught up.
+        """
+        if batch.frame_shape != self.ring.frame_shape:
+            raise ValueError(
+                f"Batch frame shape {batch.frame_shape} does not match "
+                f"ring frame shape {self.ring.frame_shape}"
+            )
+
+        if not append:
+            batch.clear()
+        offset = batch.count
+
+        ring = self.ring
+        start = max(self.position, ring.claimed - ring.capacity)
+        stop = min(ring.published, start + batch.max_frames - offset)
+        self.overruns += start - self.position
+
+        if stop <= start:
+            self.position = start
+            return 0
+
+        ring.copy_range(batch, start, stop, offset)
+
+        # Frames claimed for overwriting during the copy are torn; drop them
+        torn = min(max(0, ring.claimed - ring.capacity - start), stop - start)
+        if torn:
+            kept = stop - start - torn
+            for array in (
+                batch.frames,
+                batch.frame_numbers,
+                batch.timestamps,
+                batch.camera_timestamps,
+            ):
+                array[offset : offset + kept] = array[
+                    offset + torn : offset + torn + kept
+                ]
+            self.overruns += torn
+            start += torn
+
+        copied = stop - start
+        if offset == 0:
+            batch.first_sequence = start
+        batch.count = offset + copied
+        self.position = stop
+        self.frames_read += copied
+        return copied
+
+    def close(self) -> None:
+        """Unregister from the ring."""
+        self.ring.remove_reader(self.name)
+
+    def statistics(self) -> Dict[str, Any]:
+        """Progress and overrun counters of this consumer."""
+        return {
+            "position": self.position,
+            "lag": self.lag,
+            "frames_read": self.frames_read,
+            "overruns": self.overruns,
+        }
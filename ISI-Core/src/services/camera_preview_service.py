@@ -0,0 +1,236 @@
+# ISI-Core/src/services/camera_preview_service.py
+
+"""
+Shared-memory live camera preview.
+Publishes a reduced copy of the newest camera frame into a shared-memory
+slot guarded by a sequence counter, for any number of preview clients.
+"""
+
+import math
+import threading
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+from .camera_buffer_service import CAMERA_FRAME_DTYPE, CameraFrameRing
+
+# Preview reduction modes: block averaging or keeping every factor-th pixel
+PREVIEW_BIN = "bin"
+PREVIEW_DECIMATE = "decimate"
+PREVIEW_MODES = (PREVIEW_BIN, PREVIEW_DECIMATE)
+
+# Default longest preview side in pixels
+DEFAULT_PREVIEW_MAX_SIZE = 512
+
+# Slot header: write counter (odd while a frame is being written), frame
+# sequence, then preview height, width and reduction factor
+PREVIEW_HEADER_FIELDS = 5
+PREVIEW_HEADER_BYTES = PREVIEW_HEADER_FIELDS * 8
+
+# Attempts to read a consistent preview before giving up on a busy writer
+PREVIEW_READ_ATTEMPTS = 8
+
+# Frame sequence stored before any frame was published
+NO_FRAME = -1
+
+
+def preview_factor(frame_shape: Tuple[int, int], max_size: int) -> int:
+    """Smallest integer reduction bringing the longest side within max_size."""
+    if max_size <= 0:
+        raise ValueError("max_size must be positive")
+    return max(1, math.ceil(max(frame_shape) / max_size))
+
+
+class CameraPreviewChannel:
+    """
+    Shared-memory latest-frame preview slot.
+    Single Responsibility: Serve the newest camera frame at preview resolution.
+
+    The slot holds one preview frame behind a sequence lock: the writer
+    makes the counter odd, writes the frame, and makes it even again, and
+    readers retry until they copy a frame with the same even counter on
+    both sides. Nothing runs on the capture path: publish_latest() reduces
+    the ring's newest frame straight into the slot when a client asks for
+    it, reading the full frame once, and does nothing if no new frame was
+    captured since. Slow clients simply see the newest frame and skip the
+    rest. Other processes attach to the slot by name and read it without
+    going through the controller.
+    """
+
+    def __init__(
+        self,
+        frame_shape: Tuple[int, int],
+        factor: int = 1,
+        mode: str = PREVIEW_BIN,
+        name: Optional[str] = None,
+        create: bool = True,
+    ):
+        """Create a preview slot for frames of frame_shape, or attach to one by name."""
+        if len(frame_shape) != 2 or min(frame_shape) <= 0:
+            raise ValueError("frame_shape must be a positive (height, width)")
+        if factor <= 0:
+            raise ValueError("factor must be positive")
+        if mode not in PREVIEW_MODES:
+            raise ValueError(f"mode must be one of {PREVIEW_MODES}")
+
+        self.frame_shape = tuple(frame_shape)
+        self.factor = factor
+        self.mode = mode
+        if mode == PREVIEW_BIN:
+            # Whole bins only; a partial edge bin is cropped
+            self.preview_shape = (
+                max(1, frame_shape[0] // factor),
+                max(1, frame_shape[1] // factor),
+            )
+        else:
+            self.preview_shape = (
+                -(-frame_shape[0] // factor),
+                -(-frame_shape[1] // factor),
+            )
+
+        size = (
+            PREVIEW_HEADER_BYTES
+            + int(np.prod(self.preview_shape)) * np.dtype(CAMERA_FRAME_DTYPE).itemsize
+        )
+        self._owner = create
+        self._shared = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self._header = np.ndarray(
+            (PREVIEW_HEADER_FIELDS,), dtype=np.int64, buffer=self._shared.buf
+        )
+        self._frame = np.ndarray(
+            self.preview_shape,
+            dtype=CAMERA_FRAME_DTYPE,
+            buffer=self._shared.buf,
+            offset=PREVIEW_HEADER_BYTES,
+        )
+        if create:
+            self._header[:] = (0, NO_FRAME, *self.preview_shape, factor)
+            self._frame.fill(0)
+            self._finalizer = weakref.finalize(self, self._shared.unlink)
+
+        # Block sums for binning, allocated and touched once
+        self._bins = None
+        if mode == PREVIEW_BIN and factor > 1:
+            self._bins = np.empty(self.preview_shape, dtype=np.uint32)
+            self._bins.fill(0)
+        self._publish_lock = threading.Lock()
+        self._frames_published = 0
+
+    @classmethod
+    def for_ring(
+        cls,
+        ring: CameraFrameRing,
+        max_size: int = DEFAULT_PREVIEW_MAX_SIZE,
+        mode: str = PREVIEW_BIN,
+    ) -> "CameraPreviewChannel":
+        """Preview slot for a ring's frames, reduced to at most max_size pixels."""
+        if not isinstance(ring, CameraFrameRing):
+            raise TypeError("ring must be a CameraFrameRing instance")
+        return cls(ring.frame_shape, preview_factor(ring.frame_shape, max_size), mode)
+
+    @classmethod
+    def attach(
+        cls,
+        name: str,
+        frame_shape: Tuple[int, int],
+        factor: int,
+        mode: str = PREVIEW_BIN,
+    ) -> "CameraPreviewChannel":
+        """Attach to an existing preview slot, e.g. from another process."""
+        return cls(frame_shape, factor, mode, name=name, create=False)
+
+    @property
+    def name(self) -> str:
+        """Shared memory name other processes attach to."""
+        return self._shared.name
+
+    @property
+    def sequence(self) -> int:
+        """Ring sequence of the frame in the slot, NO_FRAME before the first."""
+        return int(self._header[1])
+
+    def publish_latest(self, ring: CameraFrameRing) -> int:
+        """
+        Reduce the ring's newest frame into the slot if it is newer.
+
+        Returns the sequence of the frame in the slot afterwards.
+        """
+        with self._publish_lock:
+            header = self._header
+            if ring.published - 1 <= header[1]:
+                return int(header[1])
+
+            sequence = None
+            header[0] += 1
+            try:
+                sequence = ring.latest_into(self._frame, self._reduce)
+            finally:
+                # A frame lapped while reducing leaves no valid preview
+                header[1] = NO_FRAME if sequence is None else sequence
+                header[0] += 1
+
+            if sequence is not None:
+                self._frames_published += 1
+            return int(header[1])
+
+    def read(
+        self, out: Optional[np.ndarray] = None, after: Optional[int] = None
+    ) -> Tuple[Optional[int], Optional[np.ndarray]]:
+        """
+        Copy the preview out of the slot as (sequence, frame).
+
+        With after, returns (sequence, None) without copying unless the slot
+        holds a newer frame. The frame is None if no consistent copy could
+        be made while the writer kept updating the slot.
+        """
+        header = self._header
+        for _ in range(PREVIEW_READ_ATTEMPTS):
+            count = int(header[0])
+            sequence = int(header[1])
+            if count % 2:
+                continue
+            if sequence == NO_FRAME or (after is not None and sequence <= after):
+                return sequence, None
+
+            if out is None:
+                out = np.empty(self.preview_shape, dtype=CAMERA_FRAME_DTYPE)
+            np.copyto(out, self._frame)
+            if int(header[0]) == count:
+                return sequence, out
+
+        return None, None
+
+    def statistics(self) -> Dict[str, Any]:
+        """Preview shape, reduction and frames published into the slot."""
+        return {
+            "name": self.name,
+            "preview_shape": list(self.preview_shape),
+            "factor": self.factor,
+            "mode": self.mode,
+            "frame_sequence": self.sequence,
+            "frames_published": self._frames_published,
+        }
+
+    def close(self) -> None:
+        """Unmap the slot, removing it if this channel created it."""
+        self._header = None
+        self._frame = None
+        self._shared.close()
+        if self._owner:
+            self._finalizer()
+
+    def _reduce(self, frame: np.ndarray, out: np.ndarray) -> None:
+        """Reduce a full frame into out in a single pass over the frame."""
+        factor = self.factor
+        if factor == 1:
+            np.copyto(out, frame)
+        elif self.mode == PREVIEW_DECIMATE:
+            np.copyto(out, frame[::factor, ::factor])
+        else:
+            height, width = self.preview_shape
+            blocks = frame[: height * factor, : width * factor].reshape(
+                height, factor, width, factor
+            )
+            blocks.sum(axis=(1, 3), dtype=np.uint32, out=self._bins)
+            np.floor_divide(self._bins, factor * factor, out=out, casting="unsafe")
@@ -0,0 +1,467 @@
+# ISI-Core/src/services/camera_stack_service.py
+
+"""
+Chunked camera stack storage.
+Stores an acquisition's camera frames as losslessly compressed time x tile
+chunks with a chunk index and columnar per-frame timing in one file, so
+analysis reads only the time window and region of interest it needs.
+"""
+
+import os
+import json
+import struct
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+
+from .acquisition_writer_service import CameraFrameSink
+from .camera_buffer_service import CAMERA_FRAME_DTYPE, CameraFrameBatch
+
+# File extension of camera stack containers
+CAMERA_STACK_SUFFIX = ".isicam"
+
+# Container format identification
+CAMERA_STACK_MAGIC = b"ISICAM\0\0"
+CAMERA_STACK_VERSION = 1
+
+# Fixed preamble: magic, version, header length, header offset, chunk index
+# offset, timing offset, frame count. Offsets are filled in on close.
+STACK_PREAMBLE = struct.Struct("<8sIIQQQQ")
+
+# Chunk index record, one per (time chunk, tile row, tile column)
+CHUNK_INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u8")])
+
+# Columnar per-frame timing tables, stored in this order
+TIMING_COLUMNS = (
+    ("frame_numbers", np.dtype("<i8")),
+    ("timestamps", np.dtype("<f8")),
+    ("camera_timestamps", np.dtype("<f8")),
+)
+
+# Default chunk extent: frames per chunk and tile height x width
+DEFAULT_CHUNK_FRAMES = 8
+DEFAULT_TILE_SHAPE = (256, 256)
+
+# zlib level used at compression_quality 100; higher levels cost far more
+# time than they save on noisy camera data
+MAX_STACK_COMPRESSION_LEVEL = 6
+
+# Alignment of the index and timing tables inside the file
+TABLE_ALIGNMENT = 64
+
+
+def _align(offset: int, alignment: int) -> int:
+    """Round offset up to the next multiple of alignment."""
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def compression_level_for_quality(quality: int) -> int:
+    """zlib level of an AcquisitionParameters compression_quality (0-100)."""
+    if not 0 <= quality <= 100:
+        raise ValueError("compression quality must be between 0 and 100")
+    return round(quality * MAX_STACK_COMPRESSION_LEVEL / 100)
+
+
+def shuffle_bytes(pixels: np.ndarray) -> bytes:
+    """
+    Group the bytes of multi-byte pixels by significance.
+
+    The high bytes of 12- and 16-bit pixels vary slowly and become long
+    runs once separated from the noisy low bytes, so deflate compresses
+    them far better.
+    """
+    pixels = np.ascontiguousarray(pixels)
+    itemsize = pixels.dtype.itemsize
+    if itemsize == 1:
+        return pixels.tobytes()
+    return pixels.view(np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle_bytes(data: bytes, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    """Inverse of shuffle_bytes into a new array of dtype and shape."""
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(shape)
+
+
+class ChunkedStackSink(CameraFrameSink):
+    """
+    Chunked camera stack writer.
+    Single Responsibility: Write camera frames as compressed time x tile chunks.
+
+    Each batch is cut into chunks of chunk_frames frames by tile_shape
+    pixels, byte-shuffled and deflated on the calling writer thread, and
+    appended to the file; only the offset allocation is serialized. The
+    chunk index, the per-frame timing columns and a JSON header go after
+    the chunks on close, and the preamble is rewritten to point at them.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        frame_shape: Tuple[int, int],
+        dtype: Any = CAMERA_FRAME_DTYPE,
+        chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+        tile_shape: Tuple[int, int] = DEFAULT_TILE_SHAPE,
+        compression_level: int = MAX_STACK_COMPRESSION_LEVEL,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize writer creating a camera stack file at path."""
+        if len(frame_shape) != 2 or min(frame_shape) <= 0:
+            raise ValueError("frame_shape must be a positive (height, width)")
+        if chunk_frames <= 0:
+            raise ValueError("chunk_frames must be positive")
+        if len(tile_shape) != 2 or min(tile_shape) <= 0:
+            raise ValueError("tile_shape must be a positive (height, width)")
+        if not 0 <= compression_level <= 9:
+            raise ValueError("compression_level must be between 0 and 9")
+
+        self.path = Path(path)
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_frames = chunk_frames
+        self.tile_shape = (
+            min(tile_shape[0], frame_shape[0]),
+            min(tile_shape[1], frame_shape[1]),
+        )
+        self.compression_level = compression_level
+        self.metadata = metadata or {}
+        self.tile_grid = (
+            -(-self.frame_shape[0] // self.tile_shape[0]),
+            -(-self.frame_shape[1] // self.tile_shape[1]),
+        )
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+        self._lock = threading.Lock()
+        self._end = STACK_PREAMBLE.size
+        self._chunks: Dict[Tuple[int, int, int], Tuple[int, int]] = {}
+        self._timing: List[Tuple[int, int, List[np.ndarray]]] = []
+
+        # Placeholder preamble until the tables are written on close
+        os.pwrite(self._fd, bytes(STACK_PREAMBLE.size), 0)
+
+    def write_batch(self, frame_offset: int, batch: CameraFrameBatch) -> int:
+        """Compress and append the chunks of a chunk-aligned batch."""
+        if frame_offset % self.chunk_frames:
+            raise ValueError(
+                f"Batch at frame {frame_offset} is not aligned to "
+                f"{self.chunk_frames}-frame chunks"
+            )
+        if batch.frame_shape != self.frame_shape:
+            raise ValueError(
+                f"Batch frame shape {batch.frame_shape} does not match "
+                f"stack frame shape {self.frame_shape}"
+            )
+
+        written = 0
+        for start in range(0, batch.count, self.chunk_frames):
+            frames = batch.frames[start : min(start + self.chunk_frames, batch.count)]
+            time_chunk = (frame_offset + start) // self.chunk_frames
+            for (tile_row, tile_column), rows, columns in self._tiles():
+                payload = zlib.compress(
+                    shuffle_bytes(frames[:, rows, columns]), self.compression_level
+                )
+                self._append((time_chunk, tile_row, tile_column), payload)
+                written += len(payload)
+
+        timing = [
+            np.array(batch.frame_numbers[: batch.count]),
+            np.array(batch.timestamps[: batch.count]),
+            np.array(batch.camera_timestamps[: batch.count]),
+        ]
+        with self._lock:
+            self._timing.append((frame_offset, batch.count, timing))
+
+        return written
+
+    def close(self, frame_count: int) -> None:
+        """Write the chunk index, timing columns and header, then close."""
+        try:
+            time_chunks = -(-frame_count // self.chunk_frames)
+            index = np.zeros(
+                (time_chunks,) + self.tile_grid, dtype=CHUNK_INDEX_DTYPE
+            ).reshape(-1)
+            for (time_chunk, tile_row, tile_column), record in self._chunks.items():
+                # Chunks written past frame_count (after a failed batch) are dropped
+                if time_chunk >= time_chunks:
+                    continue
+                position = np.ravel_multi_index(
+                    (time_chunk, tile_row, tile_column),
+                    (time_chunks,) + self.tile_grid,
+                )
+                index[position] = record
+            missing = int(np.count_nonzero(index["length"] == 0))
+            if missing:
+                raise ValueError(
+                    f"Camera stack is missing {missing} of {len(index)} chunks"
+                )
+
+            columns = [
+                np.empty(frame_count, dtype=dtype) for _, dtype in TIMING_COLUMNS
+            ]
+            for frame_offset, count, values in self._timing:
+                kept = max(0, min(count, frame_count - frame_offset))
+                for column, value in zip(columns, values):
+                    column[frame_offset : frame_offset + kept] = value[:kept]
+
+            index_offset = _align(self._end, TABLE_ALIGNMENT)
+            self._pwrite(index.tobytes(), index_offset)
+
+            timing_offset = _align(index_offset + index.nbytes, TABLE_ALIGNMENT)
+            position = timing_offset
+            for column in columns:
+                self._pwrite(column.tobytes(), position)
+                position += column.nbytes
+
+            header = json.dumps(
+                {
+                    "frame_shape": list(self.frame_shape),
+                    "dtype": self.dtype.str,
+                    "chunk_frames": self.chunk_frames,
+                    "tile_shape": list(self.tile_shape),
+                    "tile_grid": list(self.tile_grid),
+                    "codec": {
+                        "name": "zlib",
+                        "shuffle": True,
+                        "level": self.compression_level,
+                    },
+                    "timing_columns": [name for name, _ in TIMING_COLUMNS],
+                    "created_at": datetime.now().isoformat(),
+                    "metadata": self.metadata,
+                },
+                default=str,
+            ).encode("utf-8")
+            header_offset = _align(position, TABLE_ALIGNMENT)
+            self._pwrite(header, header_offset)
+
+            preamble = STACK_PREAMBLE.pack(
+                CAMERA_STACK_MAGIC,
+                CAMERA_STACK_VERSION,
+                len(header),
+                header_offset,
+                index_offset,
+                timing_offset,
+                frame_count,
+            )
+            self._pwrite(preamble, 0)
+            os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+
+    def _tiles(self):
+        """Yield ((tile_row, tile_column), row slice, column slice) of every tile."""
+        height, width = self.frame_shape
+        tile_height, tile_width = self.tile_shape
+        for tile_row in range(self.tile_grid[0]):
+            rows = slice(
+                tile_row * tile_height, min((tile_row + 1) * tile_height, height)
+            )
+            for tile_column in range(self.tile_grid[1]):
+                columns = slice(
+                    tile_column * tile_width,
+                    min((tile_column + 1) * tile_width, width),
+                )
+                yield (tile_row, tile_column), rows, columns
+
+    def _append(self, key: Tuple[int, int, int], payload: bytes) -> None:
+        """Reserve space at the end of the file and write a chunk there."""
+        with self._lock:
+            offset = self._end
+            self._end += len(payload)
+            self._chunks[key] = (offset, len(payload))
+        self._pwrite(payload, offset)
+
+    def _pwrite(self, data: bytes, offset: int) -> None:
+        """Write all of data at offset."""
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            written += os.pwrite(self._fd, view[written:], offset + written)
+
+
+class CameraStackReader:
+    """
+    Chunked camera stack reader.
+    Single Responsibility: Read time windows and regions of a camera stack.
+
+    Timing columns are memory-mapped; pixel reads decompress only the
+    chunks overlapping the requested frames and region of interest.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Open a camera stack file."""
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Camera stack not found: {self.path}")
+
+        with open(self.path, "rb") as f:
+            preamble = f.read(STACK_PREAMBLE.size)
+            if len(preamble) != STACK_PREAMBLE.size:
+                raise ValueError(f"Truncated camera stack: {self.path}")
+
+            (
+                magic,
+                version,
+                header_length,
+                header_offset,
+                index_offset,
+                timing_offset,
+                frame_count,
+            ) = STACK_PREAMBLE.unpack(preamble)
+            if magic != CAMERA_STACK_MAGIC:
+                raise ValueError(f"Not a finished camera stack: {self.path}")
+            if version != CAMERA_STACK_VERSION:
+                raise ValueError(f"Unsupported camera stack version: {version}")
+
+            f.seek(header_offset)
+            self.header: Dict[str, Any] = json.loads(f.read(header_length))
+
+        self.frame_count = frame_count
+        self.frame_shape: Tuple[int, int] = tuple(self.header["frame_shape"])
+        self.dtype = np.dtype(self.header["dtype"])
+        self.chunk_frames: int = self.header["chunk_frames"]
+        self.tile_shape: Tuple[int, int] = tuple(self.header["tile_shape"])
+        self.tile_grid: Tuple[int, int] = tuple(self.header["tile_grid"])
+
+        time_chunks = -(-frame_count // self.chunk_frames)
+        self._index = self._map(
+            CHUNK_INDEX_DTYPE, index_offset, (time_chunks,) + self.tile_grid
+        )
+
+        self.columns: Dict[str, np.ndarray] = {}
+        position = timing_offset
+        for name, dtype in TIMING_COLUMNS:
+            self.columns[name] = self._map(dtype, position, (frame_count,))
+            position += frame_count * dtype.itemsize
+
+    def __len__(self) -> int:
+        """Number of frames in the stack."""
+        return self.frame_count
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Acquisition metadata stored with the stack."""
+        return self.header.get("metadata", {})
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        """Per-frame camera frame numbers."""
+        return self.columns["frame_numbers"]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Per-frame host timestamps in seconds."""
+        return self.columns["timestamps"]
+
+    @property
+    def camera_timestamps(self) -> np.ndarray:
+        """Per-frame camera-reported timestamps in seconds."""
+        return self.columns["camera_timestamps"]
+
+    def read(
+        self,
+        start: int = 0,
+        stop: Optional[int] = None,
+        roi: Optional[Tuple[slice, slice]] = None,
+    ) -> np.ndarray:
+        """
+        Frames [start, stop) cropped to roi, a (rows, columns) pair of slices.
+
+        Only chunks overlapping the window and region are decompressed.
+        """
+        stop = self.frame_count if stop is None else stop
+        if not 0 <= start <= stop <= self.frame_count:
+            raise ValueError(
+                f"Invalid frame range [{start}, {stop}) for {self.frame_count} frames"
+            )
+
+        rows, columns = roi or (slice(None), slice(None))
+        row_start, row_stop = self._bounds(rows, self.frame_shape[0])
+        column_start, column_stop = self._bounds(columns, self.frame_shape[1])
+
+        out = np.empty(
+            (stop - start, row_stop - row_start, column_stop - column_start),
+            dtype=self.dtype,
+        )
+        if out.size == 0:
+            return out
+
+        tile_height, tile_width = self.tile_shape
+        with open(self.path, "rb") as f:
+            for time_chunk in range(
+                start // self.chunk_frames, -(-stop // self.chunk_frames)
+            ):
+                chunk_start = time_chunk * self.chunk_frames
+                chunk_stop = min(chunk_start + self.chunk_frames, self.frame_count)
+                frames = slice(max(start, chunk_start), min(stop, chunk_stop))
+
+                for tile_row in range(
+                    row_start // tile_height, -(-row_stop // tile_height)
+                ):
+                    tile_top = tile_row * tile_height
+                    tile_rows = slice(
+                        tile_top, min(tile_top + tile_height, self.frame_shape[0])
+                    )
+                    for tile_column in range(
+                        column_start // tile_width, -(-column_stop // tile_width)
+                    ):
+                        tile_left = tile_column * tile_width
+                        tile_columns = slice(
+                            tile_left,
+                            min(tile_left + tile_width, self.frame_shape[1]),
+                        )
+                        tile = self._read_tile(
+                            f,
+                            (time_chunk, tile_row, tile_column),
+                            (
+                                chunk_stop - chunk_start,
+                                tile_rows.stop - tile_rows.start,
+                                tile_columns.stop - tile_columns.start,
+                            ),
+                        )
+
+                        # Overlap of the tile with the requested region
+                        top = max(row_start, tile_rows.start)
+                        bottom = min(row_stop, tile_rows.stop)
+                        left = max(column_start, tile_columns.start)
+                        right = min(column_stop, tile_columns.stop)
+                        out[
+                            frames.start - start : frames.stop - start,
+                            top - row_start : bottom - row_start,
+                            left - column_start : right - column_start,
+                        ] = tile[
+                            frames.start - chunk_start : frames.stop - chunk_start,
+                            top - tile_top : bottom - tile_top,
+                            left - tile_left : right - tile_left,
+                        ]
+
+        return out
+
+    def read_frame(self, index: int) -> np.ndarray:
+        """Single full frame at index."""
+        return self.read(index, index + 1)[0]
+
+    def _read_tile(self, f: Any, key: Tuple[int, int, int], shape: Tuple[int, ...]):
+        """Decompress one chunk tile."""
+        offset, length = self._index[key]
+        f.seek(int(offset))
+        data = zlib.decompress(f.read(int(length)))
+        return unshuffle_bytes(data, self.dtype, shape)
+
+    def _map(self, dtype: np.dtype, offset: int, shape: Tuple[int, ...]):
+        """Read-only memory map of a table; empty tables cannot be mapped."""
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    @staticmethod
+    def _bounds(selection: slice, size: int) -> Tuple[int, int]:
+        """Start and stop of a contiguous slice within size."""
+        start, stop, step = selection.indices(size)
+        if step != 1:
+            raise ValueError("Region of interest slices must be contiguous")
+        return start, max(start, stop)
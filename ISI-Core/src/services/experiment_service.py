@@ -10,7 +10,9 @@ import json
 import uuid
 import time
 import threading
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Deque, Dict, List, Any, Optional, Sequence, Tuple, Union
+from collections import OrderedDict, deque
+from collections.abc import Sequence as SequenceABC
 from datetime import datetime
 import numpy as np
 from pathlib import Path
@@ -19,19 +21,72 @@ from ..interfaces.experiment_interfaces import (
     ISetupManager,
     IStimulusGenerator,
     IAcquisitionController,
+    ICameraBackend,
     IFrameSynchronizer,
     IDataAnalyzer,
     IExperimentWorkflow,
     SetupParameters,
     StimulusParameters,
     StimulusFrame,
+    FrameFormat,
     AcquisitionParameters,
     CameraFrame,
     AnalysisParameters,
     AnalysisResult,
     ExperimentPhase,
+    RenderBudgetReport,
+    StimulusEncoding,
+    StimulusGenerationOptions,
 )
 from ..interfaces.data_interfaces import DataResponse
+from .stimulus_service import (
+    DEFAULT_CYCLE_CACHE_BYTES,
+    DerivedSweepSequence,
+    ParallelStimulusRenderer,
+    RemappedBarSequence,
+    StimulusFrameSequence,
+    StimulusSequence,
+    SphericalWarpEngine,
+    StimulusRenderer,
+    StimulusStream,
+    VISUAL_DEGREE_SPACE,
+    stimulus_geometry_key,
+)
+from .stimulus_storage_service import StimulusSequenceStore
+from .stimulus_cache_service import DEFAULT_STIMULUS_CACHE_BYTES, StimulusCache
+from .parametric_stimulus_service import ParametricBarSequence
+from .image_export_service import StimulusImageExporter
+from .stimulus_codec_service import DELTA_CODEC, RAW_CODEC
+from .render_profiling_service import DEFAULT_PROFILE_FRAMES, StimulusRenderProfiler
+from .camera_buffer_service import CameraFrameRing
+from .camera_preview_service import NO_FRAME, CameraPreviewChannel
+from .camera_backend_service import SimulatedCamera
+from .acquisition_writer_service import BatchedFrameWriter
+from .frame_scheduler_service import FrameScheduler
+from .camera_stack_service import (
+    CAMERA_STACK_SUFFIX,
+    DEFAULT_CHUNK_FRAMES,
+    ChunkedStackSink,
+    compression_level_for_quality,
+)
+
+# Stimulus geometries kept for appearance-only parameter changes; spherical
+# bars hold their packed mask cycle, so entries are bounded tightly
+GEOMETRY_CACHE_ENTRIES = 2
+
+# Rendered retinotopy sweeps kept to derive other directions from; opposite
+# directions derive by reversal, so two bases cover all four
+SWEEP_BASE_ENTRIES = 2
+
+# Subdirectories of a generator's cache directory
+STIMULUS_CACHE_SUBDIRECTORY = "stimuli"
+WARP_CACHE_SUBDIRECTORY = "warp_tables"
+
+# Budget for the packed mask cycle kept by each cached spherical bar geometry
+MASK_CYCLE_CACHE_BYTES = 256 * 1024 * 1024
+
+# Frames one preview may render, bounding the size of a preview response
+MAX_PREVIEW_FRAMES = 10
 
 
 class SetupManager(ISetupManager):
@@ -219,58 +274,234 @@ class StimulusGenerator(IStimulusGenerator):
     """
     Stimulus generator for creating visual stimuli.
     Single Responsibility: Generate stimulus frames based on parameters.
+
+    The geometry of recently generated stimuli is kept, so a change that only
+    touches colors, contrast or frame format restyles the cached renderer
+    and, for spherical bars, recolors the already rendered bar masks.
     """
 
-    def __init__(self):
-        """Initialize stimulus generator."""
-        pass
+    def __init__(
+        self,
+        render_workers: int = 1,
+        render_chunk_frames: Optional[int] = None,
+        cache_directory: Optional[Union[str, Path]] = None,
+        cache_bytes: int = DEFAULT_STIMULUS_CACHE_BYTES,
+    ):
+        """
+        Initialize stimulus generator.
+
+        render_workers > 1 renders long sequences on a process pool in chunks
+        of render_chunk_frames frames (default: one renderer block).
+        cache_directory holds the on-disk stimulus cache, within cache_bytes,
+        and the warp tables; without one nothing is cached on disk.
+        """
+        if render_workers <= 0:
+            raise ValueError("render_workers must be positive")
+        if render_chunk_frames is not None and render_chunk_frames <= 0:
+            raise ValueError("render_chunk_frames must be positive")
+
+        self.render_workers = render_workers
+        self.render_chunk_frames = render_chunk_frames
+        self._sequence_store = StimulusSequenceStore()
+        self._warp_engine = SphericalWarpEngine()
+        self._stimulus_cache: Optional[StimulusCache] = None
+        if cache_directory is not None:
+            cache_root = Path(cache_directory)
+            self._warp_engine = SphericalWarpEngine(
+                cache_directory=cache_root / WARP_CACHE_SUBDIRECTORY
+            )
+            self._stimulus_cache = StimulusCache(
+                cache_root / STIMULUS_CACHE_SUBDIRECTORY, max_bytes=cache_bytes
+            )
+        self._image_exporter = StimulusImageExporter()
+        self._geometry_cache: (
+            "OrderedDict[str, Tuple[StimulusRenderer, Optional[StimulusStream]]]"
+        ) = OrderedDict()
+        self._sweep_bases: "Deque[Tuple[StimulusRenderer, StimulusFrameSequence]]" = (
+            deque(maxlen=SWEEP_BASE_ENTRIES)
+        )
+        self._geometry_lock = threading.Lock()
+
+    @property
+    def stimulus_cache(self) -> Optional[StimulusCache]:
+        """On-disk cache of rendered stimulus sequences, if configured."""
+        return self._stimulus_cache
 
     def generate_stimulus_frames(
-        self, parameters: StimulusParameters, setup: SetupParameters
-    ) -> DataResponse[List[StimulusFrame]]:
-        """Generate complete stimulus sequence."""
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        options: Optional[StimulusGenerationOptions] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> DataResponse[StimulusFrameSequence]:
+        """
+        Generate a stimulus sequence with random frame access.
+
+        Items are StimulusFrameView objects; callers that need StimulusFrame
+        objects call to_list() on the sequence. Rendered sequences are lazy
+        streams that render frames as they are read; parametric sequences
+        store per-frame bar geometry and rasterize it on demand. With
+        options.cached and a cache directory the sequence is opened from the
+        stimulus cache and rendered into it on a miss; setting cancel
+        abandons that render. With options.derive_sweeps a retinotopy bar
+        sweep that is an exact view of an already generated direction is
+        derived from it instead of rendered.
+        """
         if not isinstance(parameters, StimulusParameters):
             raise TypeError("parameters must be a StimulusParameters instance")
         if not isinstance(setup, SetupParameters):
             raise TypeError("setup must be a SetupParameters instance")
+        if options is None:
+            options = StimulusGenerationOptions()
+        if not isinstance(options, StimulusGenerationOptions):
+            raise TypeError("options must be a StimulusGenerationOptions instance")
 
         try:
-            total_frames = int(parameters.duration * parameters.fps)
-            frames = []
+            if options.encoding == StimulusEncoding.PARAMETRIC:
+                sequence, metadata = self._generate_parametric(parameters, setup)
+            elif options.cached and self._stimulus_cache is not None:
+                sequence, metadata = self._generate_cached(
+                    parameters, setup, options.derive_sweeps, cancel
+                )
+            else:
+                sequence, metadata = self._generate_rendered(
+                    parameters, setup, options.derive_sweeps
+                )
 
-            for frame_num in range(total_frames):
-                timestamp = frame_num / parameters.fps
+            return DataResponse(
+                success=True,
+                data=sequence,
+                error_message="",
+                metadata={
+                    "total_frames": len(sequence),
+                    "cycle_frames": sequence.slot_count,
+                    "duration": parameters.duration,
+                    "encoding": options.encoding.value,
+                    **metadata,
+                },
+            )
 
-                # Generate frame based on stimulus type
-                frame_data = self._generate_frame(frame_num, parameters, setup)
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to generate stimulus frames: {e}",
+            )
 
-                # ARCHITECTURAL PURITY: No photodiode state (modern software sync)
-                # ARCHITECTURAL PURITY: Photodiode functionality eliminated from modern architecture
+    def get_cache_statistics(self) -> DataResponse[Dict[str, Any]]:
+        """Get stimulus cache hit/miss counters and occupancy."""
+        try:
+            return DataResponse(
+                success=True,
+                data=(
+                    self._stimulus_cache.statistics()
+                    if self._stimulus_cache is not None
+                    else {"enabled": False}
+                ),
+                error_message="",
+            )
 
-                stimulus_frame = StimulusFrame(
-                    frame_number=frame_num,
-                    timestamp=timestamp,
-                    frame_data=frame_data,
-                    metadata={
-                        "stimulus_type": parameters.stimulus_type,
-                        "frame_rate": parameters.fps,
-                    },
-                )
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to get cache statistics: {e}",
+            )
+
+    def profile_render_budget(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        frames: int = DEFAULT_PROFILE_FRAMES,
+    ) -> DataResponse[RenderBudgetReport]:
+        """
+        Measure whether a stimulus renders within its real-time frame budget.
+
+        Records per-frame render time, allocation and throughput, and
+        recommends streaming or pre-rendered presentation.
+        """
+        if not isinstance(parameters, StimulusParameters):
+            raise TypeError("parameters must be a StimulusParameters instance")
+        if not isinstance(setup, SetupParameters):
+            raise TypeError("setup must be a SetupParameters instance")
+        if frames <= 0:
+            raise ValueError("frames must be positive")
+
+        try:
+            profiler = StimulusRenderProfiler(warp_engine=self._warp_engine)
+            report = profiler.profile(parameters, setup, frames)
 
-                frames.append(stimulus_frame)
+            return DataResponse(
+                success=True,
+                data=report,
+                error_message="",
+                metadata={
+                    "realtime_capable": report.realtime_capable,
+                    "recommended_mode": report.recommended_mode,
+                },
+            )
+
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to profile render budget: {e}",
+            )
+
+    def render_frames(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        indices: Sequence[int],
+        downscale: int = 1,
+    ) -> DataResponse[Sequence[StimulusFrame]]:
+        """
+        Render arbitrary frames of a stimulus sequence by index.
+
+        Only the requested frames are rendered, every downscale-th row and
+        column of each; no prefix of the sequence is generated.
+        """
+        if not isinstance(parameters, StimulusParameters):
+            raise TypeError("parameters must be a StimulusParameters instance")
+        if not isinstance(setup, SetupParameters):
+            raise TypeError("setup must be a SetupParameters instance")
+        if downscale <= 0:
+            raise ValueError("downscale must be positive")
+
+        frame_numbers = np.asarray(indices, dtype=np.int64)
+        frame_count = int(parameters.duration * parameters.fps)
+        if frame_numbers.ndim != 1 or len(frame_numbers) == 0:
+            raise ValueError("indices must be a non-empty list of frame indices")
+        if frame_numbers.min() < 0 or frame_numbers.max() >= frame_count:
+            raise ValueError(f"Frame indices must be within [0, {frame_count})")
+
+        try:
+            renderer = StimulusRenderer(
+                parameters, setup, warp_engine=self._warp_engine, downscale=downscale
+            )
+            frames = StimulusSequence(
+                renderer.render_frames(frame_numbers),
+                frame_numbers,
+                renderer.timestamps(frame_numbers),
+                renderer.sequence_metadata(),
+            )
 
             return DataResponse(
                 success=True,
                 data=frames,
                 error_message="",
-                metadata={"total_frames": len(frames), "duration": parameters.duration},
+                metadata={
+                    "rendered_frames": len(frames),
+                    "frame_size": list(renderer.screen_shape),
+                    "downscale": downscale,
+                },
             )
 
         except Exception as e:
             return DataResponse(
                 success=False,
                 data=None,
-                error_message=f"Failed to generate stimulus frames: {e}",
+                error_message=f"Failed to render stimulus frames: {e}",
             )
 
     def preview_stimulus(
@@ -278,22 +509,60 @@ class StimulusGenerator(IStimulusGenerator):
         parameters: StimulusParameters,
         setup: SetupParameters,
         frame_count: int = 10,
+        frame_indices: Optional[Sequence[int]] = None,
+        downscale: int = 1,
     ) -> DataResponse[List[StimulusFrame]]:
-        """Generate preview frames for stimulus."""
+        """
+        Generate RGB preview frames for stimulus.
+
+        Previews the first frame_count frames, at most MAX_PREVIEW_FRAMES,
+        or exactly the frames at frame_indices, of which there may be no
+        more than MAX_PREVIEW_FRAMES. Every downscale-th row and column of
+        each frame is rendered.
+        """
         if not isinstance(parameters, StimulusParameters):
             raise TypeError("parameters must be a StimulusParameters instance")
         if not isinstance(setup, SetupParameters):
             raise TypeError("setup must be a SetupParameters instance")
         if frame_count <= 0:
             raise ValueError("frame_count must be positive")
+        if frame_indices is not None and len(frame_indices) > MAX_PREVIEW_FRAMES:
+            raise ValueError(
+                f"At most {MAX_PREVIEW_FRAMES} preview frames can be requested"
+            )
 
         try:
-            # Create preview parameters with limited duration
-            preview_duration = frame_count / parameters.fps
+            # Previews are displayed directly, so compact formats become RGB
             preview_params = parameters.copy()
-            preview_params.duration = preview_duration
+            preview_params.frame_format = FrameFormat.RGB
+            total_frames = int(parameters.duration * parameters.fps)
+            if frame_indices is None:
+                frame_indices = range(
+                    min(frame_count, MAX_PREVIEW_FRAMES, total_frames)
+                )
 
-            return self.generate_stimulus_frames(preview_params, setup)
+            # Sequences shorter than one frame have nothing to preview
+            frames: List[StimulusFrame] = []
+            metadata: Dict[str, Any] = {"downscale": downscale}
+            if len(frame_indices) > 0:
+                result = self.render_frames(
+                    preview_params, setup, frame_indices, downscale
+                )
+                if not result.success:
+                    return result
+                frames = result.data.to_list()
+                metadata["frame_size"] = result.metadata["frame_size"]
+
+            return DataResponse(
+                success=True,
+                data=frames,
+                error_message="",
+                metadata={
+                    "total_frames": len(frames),
+                    "duration": parameters.duration,
+                    **metadata,
+                },
+            )
 
         except Exception as e:
             return DataResponse(
@@ -303,56 +572,38 @@ class StimulusGenerator(IStimulusGenerator):
             )
 
     def save_stimulus_sequence(
-        self, frames: List[StimulusFrame], output_path: str
+        self, frames: Sequence[StimulusFrame], output_path: str, codec: str = "raw"
     ) -> DataResponse[bool]:
-        """Save stimulus sequence to disk."""
-        if not isinstance(frames, list):
-            raise TypeError("frames must be a list")
+        """
+        Save stimulus sequence to disk.
+
+        codec "raw" stores memory-mappable frames; "delta" stores keyframes
+        plus row deltas, far smaller for bar stimuli.
+        """
+        if not isinstance(frames, SequenceABC):
+            raise TypeError("frames must be a sequence")
         if not frames:
             raise ValueError("frames list cannot be empty")
         if not output_path or not output_path.strip():
             raise ValueError("output_path cannot be empty")
+        if codec not in (RAW_CODEC, DELTA_CODEC):
+            raise ValueError(f"Unsupported stimulus codec: {codec}")
 
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            # Prepare data for serialization
-            sequence_data = {
-                "frames": [
-                    {
-                        "frame_number": frame.frame_number,
-                        "timestamp": frame.timestamp,
-                        # ARCHITECTURAL PURITY: Photodiode legacy field removed
-                        "metadata": frame.metadata,
-                        # Frame data saved separately as binary files
-                        "frame_data_file": f"frame_{frame.frame_number:06d}.png",
-                    }
-                    for frame in frames
-                ],
-                "created_at": datetime.now().isoformat(),
-                "total_frames": len(frames),
-            }
-
-            # Save metadata
-            metadata_path = output_path.replace(".json", "_metadata.json")
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(sequence_data, f, indent=2)
-
-            # Save individual frame data
-            base_dir = os.path.dirname(output_path)
-            for frame in frames:
-                frame_path = os.path.join(
-                    base_dir, f"frame_{frame.frame_number:06d}.png"
-                )
-                with open(frame_path, "wb") as f:
-                    f.write(frame.frame_data)
+            # One single-file container instead of a file per frame
+            sequence_path = self._sequence_store.save(frames, output_path, codec=codec)
 
             return DataResponse(
                 success=True,
                 data=True,
                 error_message="",
-                metadata={"saved_frames": len(frames), "output_directory": base_dir},
+                metadata={
+                    "saved_frames": len(frames),
+                    "output_directory": str(sequence_path.parent),
+                    "output_path": str(sequence_path),
+                    "codec": codec,
+                    "file_bytes": sequence_path.stat().st_size,
+                },
             )
 
         except Exception as e:
@@ -362,43 +613,52 @@ class StimulusGenerator(IStimulusGenerator):
                 error_message=f"Failed to save stimulus sequence: {e}",
             )
 
-    def load_stimulus_sequence(
-        self, input_path: str
-    ) -> DataResponse[List[StimulusFrame]]:
-        """Load stimulus sequence from disk."""
-        if not input_path or not input_path.strip():
-            raise ValueError("input_path cannot be empty")
+    def export_stimulus_images(
+        self,
+        frames: Sequence[StimulusFrame],
+        output_directory: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> DataResponse[List[str]]:
+        """Export stimulus frames as compressed PNG files, one per frame."""
+        if not isinstance(frames, SequenceABC):
+            raise TypeError("frames must be a sequence")
+        if not frames:
+            raise ValueError("frames list cannot be empty")
+        if not output_directory or not output_directory.strip():
+            raise ValueError("output_directory cannot be empty")
 
         try:
-            # Load metadata
-            metadata_path = input_path.replace(".json", "_metadata.json")
-            if not os.path.exists(metadata_path):
-                raise FileNotFoundError(f"Metadata file not found: {metadata_path}")
-
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                sequence_data = json.load(f)
-
-            # Load frame data
-            frames = []
-            base_dir = os.path.dirname(input_path)
-
-            for frame_info in sequence_data["frames"]:
-                frame_path = os.path.join(base_dir, frame_info["frame_data_file"])
+            paths = self._image_exporter.export(
+                frames, output_directory, progress_callback=progress_callback
+            )
 
-                if not os.path.exists(frame_path):
-                    raise FileNotFoundError(f"Frame file not found: {frame_path}")
+            return DataResponse(
+                success=True,
+                data=[str(path) for path in paths],
+                error_message="",
+                metadata={
+                    "exported_frames": len(paths),
+                    "output_directory": output_directory,
+                    "total_bytes": sum(path.stat().st_size for path in paths),
+                },
+            )
 
-                with open(frame_path, "rb") as f:
-                    frame_data = f.read()
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to export stimulus images: {e}",
+            )
 
-                stimulus_frame = StimulusFrame(
-                    frame_number=frame_info["frame_number"],
-                    timestamp=frame_info["timestamp"],
-                    frame_data=frame_data,
-                    metadata=frame_info["metadata"],
-                )
+    def load_stimulus_sequence(
+        self, input_path: str
+    ) -> DataResponse[Sequence[StimulusFrame]]:
+        """Load stimulus sequence from disk as a memory-mapped sequence."""
+        if not input_path or not input_path.strip():
+            raise ValueError("input_path cannot be empty")
 
-                frames.append(stimulus_frame)
+        try:
+            frames = self._sequence_store.open(input_path)
 
             return DataResponse(
                 success=True,
@@ -414,41 +674,149 @@ class StimulusGenerator(IStimulusGenerator):
                 error_message=f"Failed to load stimulus sequence: {e}",
             )
 
-    def _generate_frame(
-        self, frame_num: int, parameters: StimulusParameters, setup: SetupParameters
-    ) -> bytes:
-        """Generate individual frame data."""
-        # Create a simple frame - in real implementation this would use the existing StimulusGenerator
-        width, height = setup.monitor_resolution
+    def _generate_rendered(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        derive_sweeps: bool,
+    ) -> Tuple[StimulusFrameSequence, Dict[str, Any]]:
+        """
+        Lazily rendered sequence and its generation metadata.
+
+        Opposite retinotopy sweeps traverse the same bar positions in
+        reverse, and perpendicular sweeps are transposes when the warp
+        tables allow, so a sweep that is an exact view of a kept base sweep
+        is derived from it. Rendered spherical bar sweeps become bases.
+        """
+        renderer, masks, geometry_reused = self._renderer_for(parameters, setup)
+        metadata: Dict[str, Any] = {
+            "geometry_reused": geometry_reused,
+            "sweep_source": None,
+        }
 
-        # Create blank frame with background color
-        frame = np.ones((height, width, 3), dtype=np.uint8)
-        frame[:, :] = parameters.background_color
+        if derive_sweeps:
+            derived = self._derive_sweep(renderer)
+            if derived is not None:
+                sequence, metadata["sweep_source"] = derived
+                return sequence, metadata
+
+        if masks is not None:
+            sequence = RemappedBarSequence(masks, renderer)
+        else:
+            sequence = self._make_stream(renderer)
+
+        if derive_sweeps and renderer.geometry_space == VISUAL_DEGREE_SPACE:
+            with self._geometry_lock:
+                self._sweep_bases.append((renderer, sequence))
+
+        return sequence, metadata
+
+    def _derive_sweep(
+        self, renderer: StimulusRenderer
+    ) -> Optional[Tuple[DerivedSweepSequence, float]]:
+        """Sweep derived from a kept base sweep and the base orientation, if exact."""
+        with self._geometry_lock:
+            bases = list(self._sweep_bases)
+
+        for base_renderer, base_sequence in reversed(bases):
+            derivation = renderer.sweep_derivation(base_renderer)
+            if derivation is not None:
+                return (
+                    DerivedSweepSequence(base_sequence, renderer, *derivation),
+                    base_renderer.parameters.orientation or 0.0,
+                )
 
-        # Add simple stimulus based on type
-        if (
-            parameters.stimulus_type == "drifting_bar"
-            and parameters.orientation is not None
-        ):
-            self._add_drifting_bar(frame, frame_num, parameters)
+        return None
 
-        # Convert frame to bytes without cv2 dependency
-        frame_bytes = frame.tobytes()
-        return frame_bytes
+    def _generate_cached(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        derive_sweeps: bool,
+        cancel: Optional[threading.Event],
+    ) -> Tuple[StimulusFrameSequence, Dict[str, Any]]:
+        """Cached sequence, rendered into the stimulus cache on a miss."""
+        sequence = self._stimulus_cache.get(parameters, setup)
+        cache_hit = sequence is not None
+
+        if not cache_hit:
+            rendered, _ = self._generate_rendered(parameters, setup, derive_sweeps)
+            sequence = self._stimulus_cache.put(
+                rendered, parameters, setup, cancel=cancel
+            )
 
-    def _add_drifting_bar(
-        self, frame: np.ndarray, frame_num: int, parameters: StimulusParameters
-    ) -> None:
-        """Add drifting bar to frame."""
-        height, width = frame.shape[:2]
+        return sequence, {"cache_hit": cache_hit, "cache_path": str(sequence.path)}
+
+    def _generate_parametric(
+        self, parameters: StimulusParameters, setup: SetupParameters
+    ) -> Tuple[StimulusFrameSequence, Dict[str, Any]]:
+        """Bar sequence stored as per-frame geometry, rasterized on demand."""
+        sequence = ParametricBarSequence.from_parameters(
+            parameters, setup, warp_engine=self._warp_engine
+        )
+        return sequence, {"encoded_bytes": sequence.nbytes}
+
+    def _make_stream(
+        self,
+        renderer: StimulusRenderer,
+        retain_cycle: bool = False,
+        cycle_cache_bytes: int = DEFAULT_CYCLE_CACHE_BYTES,
+    ) -> StimulusStream:
+        """Stream over a renderer, on the process pool when workers are configured."""
+        parallel = None
+        if self.render_workers > 1:
+            parallel = ParallelStimulusRenderer(
+                renderer,
+                workers=self.render_workers,
+                chunk_frames=self.render_chunk_frames,
+            )
+        return StimulusStream(
+            renderer,
+            cycle_cache_bytes=cycle_cache_bytes,
+            parallel=parallel,
+            retain_cycle=retain_cycle,
+        )
 
-        # Simple horizontal bar that moves vertically
-        if parameters.orientation == 0:  # Horizontal bar
-            bar_height = int(height * 0.1)  # 10% of screen height
-            position = int((frame_num * 2) % height)  # Move 2 pixels per frame
+    def _renderer_for(
+        self, parameters: StimulusParameters, setup: SetupParameters
+    ) -> Tuple[StimulusRenderer, Optional[StimulusStream], bool]:
+        """
+        Renderer, shared bar masks and whether cached geometry was reused.
+
+        Spherical bars render through a binary mask stream that keeps the
+        mask frames its passes render, within MASK_CYCLE_CACHE_BYTES; nothing
+        is rendered until frames are read. Other stimuli reuse the cached
+        renderer's geometry tables.
+        """
+        key = stimulus_geometry_key(parameters, setup)
+
+        with self._geometry_lock:
+            entry = self._geometry_cache.get(key)
+            if entry is not None:
+                self._geometry_cache.move_to_end(key)
+
+        if entry is not None:
+            base, masks = entry
+            return base.restyle(parameters), masks, True
+
+        renderer = StimulusRenderer(parameters, setup, warp_engine=self._warp_engine)
+        masks = None
+        if renderer.geometry_space == VISUAL_DEGREE_SPACE:
+            mask_renderer = renderer.restyle(
+                parameters.copy(update={"frame_format": FrameFormat.BINARY})
+            )
+            masks = self._make_stream(
+                mask_renderer,
+                retain_cycle=True,
+                cycle_cache_bytes=MASK_CYCLE_CACHE_BYTES,
+            )
+
+        with self._geometry_lock:
+            self._geometry_cache[key] = (renderer, masks)
+            while len(self._geometry_cache) > GEOMETRY_CACHE_ENTRIES:
+                self._geometry_cache.popitem(last=False)
 
-            if position + bar_height < height:
-                frame[position : position + bar_height, :] = (255, 255, 255)
+        return renderer, masks, False
 
     # ARCHITECTURAL PURITY: Photodiode removed (legacy hardware synchronization)
     # Modern software synchronization handled by ISI-Acquisition
@@ -459,15 +827,42 @@ class AcquisitionController(IAcquisitionController):
     """
     Acquisition controller for camera capture and stimulus display.
     Single Responsibility: Control data acquisition process.
+
+    Frames come from a pluggable ICameraBackend, a simulated camera unless
+    one is given; a recorded acquisition replays through a ReplayCamera.
+    Captured frames go into a ring of buffer_size preallocated frames,
+    capped by buffer_max_bytes and touched before capture starts; the
+    disk writer, preview and online analysis read it as independent
+    consumers, so capture never allocates per frame or waits on them.
+    With save_camera_frames, a batched writer streams each acquisition to
+    a chunked, compressed output_directory/<acquisition_id>.isicam stack on
+    background threads.
     """
 
-    def __init__(self):
-        """Initialize acquisition controller."""
+    def __init__(self, camera: Optional[ICameraBackend] = None):
+        """Initialize acquisition controller capturing from camera."""
+        if camera is not None and not isinstance(camera, ICameraBackend):
+            raise TypeError("camera must be an ICameraBackend instance")
+
         self._initialized = False
         self._acquisition_active = False
-        self._camera: Optional[Any] = None
+        # Without hardware, capture from a deterministic simulated camera
+        self._camera: ICameraBackend = camera or SimulatedCamera()
+        self._camera_info: Dict[str, Any] = {}
         self._acquisition_thread: Optional[threading.Thread] = None
         self._parameters: Optional[AcquisitionParameters] = None
+        self._frame_ring: Optional[CameraFrameRing] = None
+        self._preview: Optional[CameraPreviewChannel] = None
+        self._blank_preview: Optional[np.ndarray] = None
+        self._acquisition_id: Optional[str] = None
+        self._frame_writer: Optional[BatchedFrameWriter] = None
+        self._writer_statistics: Dict[str, Any] = {}
+        self._scheduler: Optional[FrameScheduler] = None
+
+    @property
+    def frame_ring(self) -> Optional[CameraFrameRing]:
+        """Ring buffer of captured camera frames, once initialized."""
+        return self._frame_ring
 
     def initialize_acquisition(
         self, parameters: AcquisitionParameters
@@ -479,14 +874,25 @@ class AcquisitionController(IAcquisitionController):
         try:
             self._parameters = parameters
 
-            # In a real implementation, would initialize camera
-            # For now, simulate successful initialization
-            self._camera = {
-                "device_id": parameters.camera_device_id,
-                "resolution": parameters.camera_resolution,
-                "fps": parameters.camera_fps,
-                "opened": True,
-            }
+            if self._camera.is_open:
+                self._camera.close()
+            opened = self._camera.open(parameters)
+            if not opened.success:
+                raise RuntimeError(opened.error_message)
+            self._camera_info = opened.data
+
+            # Frame storage is allocated once, before capture starts
+            self._frame_ring = CameraFrameRing.for_parameters(parameters)
+
+            # Previews are reduced from the ring into a shared-memory slot
+            if self._preview is not None:
+                self._preview.close()
+            self._preview = CameraPreviewChannel.for_ring(
+                self._frame_ring, parameters.preview_max_size, parameters.preview_mode
+            )
+            self._blank_preview = np.zeros(
+                self._preview.preview_shape, dtype=self._frame_ring.dtype
+            )
 
             # Create output directory
             os.makedirs(parameters.output_directory, exist_ok=True)
@@ -502,13 +908,13 @@ class AcquisitionController(IAcquisitionController):
             )
 
     def start_acquisition(
-        self, stimulus_frames: List[StimulusFrame]
+        self, stimulus_frames: Sequence[StimulusFrame]
     ) -> DataResponse[str]:
         """Start data acquisition with stimulus sequence."""
         if not self._initialized:
             raise RuntimeError("Acquisition not initialized")
-        if not isinstance(stimulus_frames, list):
-            raise TypeError("stimulus_frames must be a list")
+        if not isinstance(stimulus_frames, SequenceABC):
+            raise TypeError("stimulus_frames must be a sequence")
         if not stimulus_frames:
             raise ValueError("stimulus_frames cannot be empty")
 
@@ -518,6 +924,37 @@ class AcquisitionController(IAcquisitionController):
 
             # Generate acquisition ID
             acquisition_id = str(uuid.uuid4())
+            self._acquisition_id = acquisition_id
+
+            # Writer drains the ring from the first captured frame on
+            self._finish_writer()
+            if self._parameters.save_camera_frames:
+                sink = ChunkedStackSink(
+                    self._camera_stack_path(),
+                    self._frame_ring.frame_shape,
+                    self._frame_ring.dtype,
+                    chunk_frames=DEFAULT_CHUNK_FRAMES,
+                    compression_level=compression_level_for_quality(
+                        self._parameters.compression_quality
+                    ),
+                    metadata={
+                        "acquisition_id": acquisition_id,
+                        "parameters": self._parameters.dict(),
+                    },
+                )
+                # Whole chunks per batch, so every batch compresses on its own
+                self._frame_writer = BatchedFrameWriter(
+                    self._frame_ring, sink, batch_frames=DEFAULT_CHUNK_FRAMES
+                )
+                self._frame_writer.start()
+
+            # Frames are paced on absolute deadlines from the worker's start
+            self._scheduler = FrameScheduler(
+                self._parameters.camera_fps,
+                self._parameters.late_frame_policy,
+                frame_count=len(stimulus_frames),
+                paced=not self._camera.paces_capture,
+            )
 
             # Start acquisition in separate thread
             self._acquisition_active = True
@@ -543,16 +980,19 @@ class AcquisitionController(IAcquisitionController):
             )
 
     def stop_acquisition(self) -> DataResponse[bool]:
-        """Stop ongoing acquisition."""
-        try:
-            if not self._acquisition_active:
-                return DataResponse(success=True, data=True, error_message="")
+        """
+        Stop ongoing acquisition.
 
+        Also closes the frame writer of a run that already finished on its
+        own, reporting any write failure of that run.
+        """
+        try:
             self._acquisition_active = False
 
             if self._acquisition_thread and self._acquisition_thread.is_alive():
                 self._acquisition_thread.join(timeout=5.0)
 
+            self._finish_writer()
             return DataResponse(success=True, data=True, error_message="")
 
         except Exception as e:
@@ -568,9 +1008,17 @@ class AcquisitionController(IAcquisitionController):
             status = {
                 "initialized": self._initialized,
                 "active": self._acquisition_active,
-                "camera_connected": self._camera is not None
-                and self._camera.get("opened", False),
+                "camera_connected": self._camera.is_open,
+                "camera": self._camera.statistics(),
             }
+            if self._frame_ring is not None:
+                status["buffer"] = self._frame_ring.statistics()
+            if self._frame_writer is not None:
+                status["writer"] = self._frame_writer.statistics()
+            elif self._writer_statistics:
+                status["writer"] = self._writer_statistics
+            if self._scheduler is not None:
+                status["timing"] = self._scheduler.statistics()
 
             return DataResponse(success=True, data=status, error_message="")
 
@@ -581,22 +1029,59 @@ class AcquisitionController(IAcquisitionController):
                 error_message=f"Failed to get status: {e}",
             )
 
-    def get_camera_preview(self) -> DataResponse[bytes]:
-        """Get current camera frame for preview."""
-        if not self._initialized or self._camera is None:
+    def get_camera_preview(
+        self, after_sequence: Optional[int] = None
+    ) -> DataResponse[bytes]:
+        """
+        Get current camera frame for preview, if newer than after_sequence.
+
+        The newest captured frame is reduced to preview resolution once per
+        new frame, however many clients poll; frames captured between polls
+        are skipped, and counted in frames_skipped for clients that pass
+        after_sequence. Data is empty when nothing newer than after_sequence
+        was captured. Local clients can read the preview directly from the
+        shared-memory slot named in the metadata.
+        """
+        if not self._initialized or not self._camera.is_open:
             raise RuntimeError("Camera not initialized")
 
         try:
-            # Simulate camera frame capture
-            # In real implementation would capture from camera
-            width, height = (640, 480)
-            if self._parameters:
-                width, height = self._parameters.camera_resolution
+            preview = self._preview
+            sequence = preview.publish_latest(self._frame_ring)
+
+            if after_sequence is not None and sequence <= after_sequence:
+                data = b""
+            else:
+                frame = None
+                if sequence != NO_FRAME:
+                    copied, frame = preview.read()
+                    sequence = NO_FRAME if frame is None else copied
+                # Blank until a frame has been captured
+                data = (self._blank_preview if frame is None else frame).tobytes()
+
+            # Frames captured since the client's previous preview it never saw;
+            # only the client knows which frame that was
+            skipped = None
+            if after_sequence is not None:
+                skipped = 0
+                if data and sequence != NO_FRAME:
+                    skipped = max(0, sequence - after_sequence - 1)
 
-            dummy_frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
-            frame_bytes = dummy_frame.tobytes()
-
-            return DataResponse(success=True, data=frame_bytes, error_message="")
+            return DataResponse(
+                success=True,
+                data=data,
+                error_message="",
+                metadata={
+                    "frame_sequence": None if sequence == NO_FRAME else sequence,
+                    "frame_shape": list(preview.preview_shape),
+                    "dtype": self._blank_preview.dtype.name,
+                    "source_shape": list(preview.frame_shape),
+                    "preview_factor": preview.factor,
+                    "preview_mode": preview.mode,
+                    "frames_skipped": skipped,
+                    "shared_memory": preview.name,
+                },
+            )
 
         except Exception as e:
             return DataResponse(
@@ -611,9 +1096,38 @@ class AcquisitionController(IAcquisitionController):
             raise ValueError("output_path cannot be empty")
 
         try:
-            # Implementation would save captured frames and metadata
-            # For now, return success
-            return DataResponse(success=True, data=True, error_message="")
+            if self._acquisition_thread and self._acquisition_thread.is_alive():
+                raise RuntimeError("Acquisition still active")
+
+            # Frames were streamed during capture; flush the rest
+            self._finish_writer()
+
+            record = {
+                "acquisition_id": self._acquisition_id,
+                "parameters": self._parameters.dict() if self._parameters else None,
+                "camera_stack": (
+                    str(self._camera_stack_path())
+                    if self._acquisition_id and self._writer_statistics
+                    else None
+                ),
+                "frames_captured": (
+                    self._frame_ring.published if self._frame_ring else 0
+                ),
+                "writer": self._writer_statistics,
+                "saved_at": datetime.now().isoformat(),
+            }
+            with open(output_path, "w") as f:
+                json.dump(record, f, indent=2)
+
+            return DataResponse(
+                success=True,
+                data=True,
+                error_message="",
+                metadata={
+                    "camera_stack": record["camera_stack"],
+                    "frames_written": self._writer_statistics.get("frames_written", 0),
+                },
+            )
 
         except Exception as e:
             return DataResponse(
@@ -623,31 +1137,49 @@ class AcquisitionController(IAcquisitionController):
             )
 
     def _acquisition_worker(
-        self, stimulus_frames: List[StimulusFrame], acquisition_id: str
+        self, stimulus_frames: Sequence[StimulusFrame], acquisition_id: str
     ) -> None:
         """Worker thread for data acquisition."""
         try:
             # Implementation would handle stimulus display and camera capture
             # This is a simplified version
-            frame_count = 0
-            start_time = time.time()
+            ring = self._frame_ring
+            scheduler = self._scheduler
+            scheduler.start()
+
+            while self._acquisition_active and not scheduler.finished:
+                # Frame index is the stimulus frame due now; skipped frames
+                # leave gaps so camera and stimulus stay phase-locked
+                frame_index = scheduler.wait_next()
 
-            while self._acquisition_active and frame_count < len(stimulus_frames):
-                # Simulate camera frame capture
-                frame_count += 1
+                # Frames the camera dropped leave a gap in frame numbers
+                camera_timestamp = self._camera.grab(frame_index)
+                if camera_timestamp is None:
+                    continue
 
-                # Display stimulus frame (would need proper display handling)
-                # For now, just sleep to simulate frame timing
-                if self._parameters is not None:
-                    time.sleep(1.0 / self._parameters.camera_fps)
-                else:
-                    time.sleep(1.0 / 30)  # Default 30 FPS
+                # Capture in place into the next preallocated ring slot
+                self._camera.retrieve_into(ring.claim())
+                ring.publish(frame_index, time.time(), camera_timestamp)
 
         except Exception as e:
             print(f"Acquisition worker error: {e}")
         finally:
             self._acquisition_active = False
 
+    def _camera_stack_path(self) -> Path:
+        """Camera stack file the current acquisition's frames are written to."""
+        return Path(self._parameters.output_directory) / (
+            self._acquisition_id + CAMERA_STACK_SUFFIX
+        )
+
+    def _finish_writer(self) -> None:
+        """Flush and stop the frame writer, keeping its final statistics."""
+        if self._frame_writer is None:
+            return
+
+        writer, self._frame_writer = self._frame_writer, None
+        self._writer_statistics = writer.stop()
+
 
 class FrameSynchronizer(IFrameSynchronizer):
     """
@@ -660,13 +1192,15 @@ class FrameSynchronizer(IFrameSynchronizer):
         pass
 
     def synchronize_frames(
-        self, camera_frames: List[CameraFrame], stimulus_frames: List[StimulusFrame]
+        self,
+        camera_frames: Sequence[CameraFrame],
+        stimulus_frames: Sequence[StimulusFrame],
     ) -> DataResponse[List[Tuple[CameraFrame, StimulusFrame]]]:
         """Synchronize camera and stimulus frames."""
-        if not isinstance(camera_frames, list):
-            raise TypeError("camera_frames must be a list")
-        if not isinstance(stimulus_frames, list):
-            raise TypeError("stimulus_frames must be a list")
+        if not isinstance(camera_frames, SequenceABC):
+            raise TypeError("camera_frames must be a sequence")
+        if not isinstance(stimulus_frames, SequenceABC):
+            raise TypeError("stimulus_frames must be a sequence")
         if not camera_frames:
             raise ValueError("camera_frames cannot be empty")
         if not stimulus_frames:
@@ -675,23 +1209,26 @@ class FrameSynchronizer(IFrameSynchronizer):
         try:
             synchronized_pairs = []
 
-            # Simple timestamp-based synchronization
+            # Timestamp-based synchronization: nearest stimulus frame in time
             # In real implementation, would use photodiode detection
-            for camera_frame in camera_frames:
-                best_match = None
-                min_time_diff = float("inf")
-
-                for stimulus_frame in stimulus_frames:
-                    time_diff = abs(camera_frame.timestamp - stimulus_frame.timestamp)
-                    if time_diff < min_time_diff:
-                        min_time_diff = time_diff
-                        best_match = stimulus_frame
-
-                if best_match is not None:
-                    # Update camera frame with sync info
-                    camera_frame.synchronized_stimulus_frame = best_match.frame_number
-                    camera_frame.sync_confidence = max(0.0, 1.0 - min_time_diff)
-                    synchronized_pairs.append((camera_frame, best_match))
+            stimulus_times = self._stimulus_timestamps(stimulus_frames)
+            camera_times = np.fromiter(
+                (frame.timestamp for frame in camera_frames),
+                dtype=np.float64,
+                count=len(camera_frames),
+            )
+            matches = self._nearest_indices(stimulus_times, camera_times)
+            time_diffs = np.abs(camera_times - stimulus_times[matches])
+
+            for camera_frame, match, time_diff in zip(
+                camera_frames, matches.tolist(), time_diffs.tolist()
+            ):
+                best_match = stimulus_frames[match]
+
+                # Update camera frame with sync info
+                camera_frame.synchronized_stimulus_frame = best_match.frame_number
+                camera_frame.sync_confidence = max(0.0, 1.0 - time_diff)
+                synchronized_pairs.append((camera_frame, best_match))
 
             return DataResponse(
                 success=True,
@@ -707,6 +1244,46 @@ class FrameSynchronizer(IFrameSynchronizer):
                 error_message=f"Failed to synchronize frames: {e}",
             )
 
+    def _stimulus_timestamps(
+        self, stimulus_frames: Sequence[StimulusFrame]
+    ) -> np.ndarray:
+        """Timestamp column of a stimulus sequence."""
+        if isinstance(stimulus_frames, StimulusFrameSequence):
+            return np.asarray(stimulus_frames.index_columns()[1], dtype=np.float64)
+
+        return np.fromiter(
+            (frame.timestamp for frame in stimulus_frames),
+            dtype=np.float64,
+            count=len(stimulus_frames),
+        )
+
+    def _nearest_indices(
+        self, stimulus_times: np.ndarray, camera_times: np.ndarray
+    ) -> np.ndarray:
+        """
+        Index of the nearest stimulus timestamp for every camera timestamp.
+
+        Ties resolve to the earliest stimulus frame in sequence order.
+        """
+        order = np.argsort(stimulus_times, kind="stable")
+        sorted_times = stimulus_times[order]
+        last = len(sorted_times) - 1
+
+        after = np.minimum(np.searchsorted(sorted_times, camera_times), last)
+        before = np.maximum(after - 1, 0)
+
+        # First occurrence of each candidate's timestamp among duplicates
+        before = np.searchsorted(sorted_times, sorted_times[before])
+        after = np.searchsorted(sorted_times, sorted_times[after])
+
+        before_diff = np.abs(camera_times - sorted_times[before])
+        after_diff = np.abs(camera_times - sorted_times[after])
+        take_after = (after_diff < before_diff) | (
+            (after_diff == before_diff) & (order[after] < order[before])
+        )
+
+        return order[np.where(take_after, after, before)]
+
     def detect_photodiode_signals(
         self, camera_frames: List[CameraFrame]
     ) -> DataResponse[List[float]]:
@@ -740,6 +1317,45 @@ class FrameSynchronizer(IFrameSynchronizer):
                 error_message=f"Failed to detect photodiode signals: {e}",
             )
 
+    def calculate_timing_accuracy(
+        self, synchronized_frames: List[Tuple[CameraFrame, StimulusFrame]]
+    ) -> DataResponse[Dict[str, float]]:
+        """Calculate software synchronization accuracy."""
+        if not isinstance(synchronized_frames, list):
+            raise TypeError("synchronized_frames must be a list")
+        if not synchronized_frames:
+            raise ValueError("synchronized_frames cannot be empty")
+
+        try:
+            # Signed camera - stimulus offsets in milliseconds
+            offsets_ms = (
+                np.array(
+                    [
+                        camera_frame.timestamp - stimulus_frame.timestamp
+                        for camera_frame, stimulus_frame in synchronized_frames
+                    ],
+                    dtype=np.float64,
+                )
+                * 1000.0
+            )
+
+            accuracy_metrics = {
+                "mean_offset_ms": float(offsets_ms.mean()),
+                "mean_abs_offset_ms": float(np.abs(offsets_ms).mean()),
+                "max_abs_offset_ms": float(np.abs(offsets_ms).max()),
+                "offset_std_ms": float(offsets_ms.std()),
+                "total_synchronized": len(synchronized_frames),
+            }
+
+            return DataResponse(success=True, data=accuracy_metrics, error_message="")
+
+        except Exception as e:
+            return DataResponse(
+                success=False,
+                data=None,
+                error_message=f"Failed to calculate timing accuracy: {e}",
+            )
+
     def calculate_sync_quality(
         self, synchronized_frames: List[Tuple[CameraFrame, StimulusFrame]]
     ) -> DataResponse[Dict[str, float]]:
@@ -0,0 +1,186 @@
+# ISI-Core/src/services/frame_scheduler_service.py
+
+"""
+Deadline-based frame pacing.
+Schedules acquisition frames on absolute monotonic deadlines so timing
+errors never accumulate, and accounts for late wakeups and dropped frames.
+"""
+
+import math
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..interfaces.experiment_interfaces import LateFramePolicy
+
+# Nanoseconds per second
+NS_PER_SECOND = 1_000_000_000
+
+# Wakeups later than this past their deadline count as missed deadlines
+DEFAULT_DEADLINE_TOLERANCE_NS = 1_000_000
+
+# Time before a deadline at which sleeping gives way to yielding, absorbing
+# the OS sleep overshoot
+SPIN_MARGIN_NS = 500_000
+
+
+def sleep_until(
+    deadline_ns: int,
+    clock: Callable[[], int] = time.perf_counter_ns,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """Sleep, then yield, until a clock() deadline; returns the wakeup time."""
+    remaining = deadline_ns - clock() - SPIN_MARGIN_NS
+    if remaining > 0:
+        sleep(remaining / NS_PER_SECOND)
+
+    now = clock()
+    while now < deadline_ns:
+        sleep(0)
+        now = clock()
+    return now
+
+
+class FrameScheduler:
+    """
+    Absolute-deadline frame scheduler.
+    Single Responsibility: Pace frames on a fixed monotonic time grid.
+
+    Frame n is due at start + n / fps on time.perf_counter_ns(), computed
+    exactly in integer nanoseconds, so loop overhead and sleep overshoot
+    never drift the grid and frame n stays locked to stimulus frame n. A
+    late wakeup either catches up, issuing the overdue frames back to back,
+    or skips to the newest due frame and counts the passed ones as dropped.
+    Lateness statistics are running sums, so long runs allocate nothing.
+
+    An unpaced scheduler issues consecutive frames without waiting, for
+    sources that pace themselves or should run as fast as possible. The
+    clock and sleep functions can be replaced, e.g. by a simulated clock.
+    """
+
+    def __init__(
+        self,
+        fps: int,
+        late_policy: LateFramePolicy = LateFramePolicy.SKIP,
+        tolerance_ns: int = DEFAULT_DEADLINE_TOLERANCE_NS,
+        frame_count: Optional[int] = None,
+        paced: bool = True,
+        clock: Callable[[], int] = time.perf_counter_ns,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """Initialize scheduler for fps frames per second, frame_count at most."""
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        if frame_count is not None and frame_count <= 0:
+            raise ValueError("frame_count must be positive")
+        if tolerance_ns < 0:
+            raise ValueError("tolerance_ns cannot be negative")
+
+        self.fps = fps
+        self.late_policy = LateFramePolicy(late_policy)
+        self.tolerance_ns = tolerance_ns
+        self.frame_count = frame_count
+        self.paced = paced
+        self._clock = clock
+        self._sleep = sleep
+
+        self._start_ns: Optional[int] = None
+        self._next_index = 0
+        self._last_index = -1
+        self._last_lateness_ns = 0
+
+        self._frames = 0
+        self._missed_deadlines = 0
+        self._dropped_frames = 0
+        self._lateness_sum_ns = 0
+        self._lateness_square_sum = 0.0
+        self._max_lateness_ns = 0
+
+    @property
+    def start_ns(self) -> Optional[int]:
+        """Clock time of frame 0, once started."""
+        return self._start_ns
+
+    @property
+    def finished(self) -> bool:
+        """Whether all frame_count frames were issued or dropped."""
+        return self.frame_count is not None and self._next_index >= self.frame_count
+
+    @property
+    def period_ns(self) -> float:
+        """Nominal frame period in nanoseconds."""
+        return NS_PER_SECOND / self.fps
+
+    def start(self, start_ns: Optional[int] = None) -> None:
+        """Anchor frame 0 at start_ns, by default now."""
+        self._start_ns = self._clock() if start_ns is None else start_ns
+        self._next_index = 0
+        self._last_index = -1
+
+    def deadline_ns(self, index: int) -> int:
+        """Absolute deadline of frame index."""
+        if self._start_ns is None:
+            raise RuntimeError("Scheduler not started")
+        return self._start_ns + index * NS_PER_SECOND // self.fps
+
+    def wait_next(self) -> int:
+        """
+        Wait for the next frame's deadline and return its index.
+
+        Indices are consecutive unless the skip policy dropped frames after
+        a late wakeup; the gap is counted in dropped_frames.
+        """
+        if self.finished:
+            raise RuntimeError("All frames were scheduled")
+
+        index = self._next_index
+        deadline = self.deadline_ns(index)
+        now = self._clock()
+
+        if not self.paced:
+            deadline = now
+        elif now < deadline:
+            now = sleep_until(deadline, self._clock, self._sleep)
+        elif self.late_policy is LateFramePolicy.SKIP:
+            # Newest frame whose deadline has passed; older ones are dropped
+            newest = (now - self._start_ns) * self.fps // NS_PER_SECOND
+            if self.frame_count is not None:
+                newest = min(newest, self.frame_count - 1)
+            if newest > index:
+                self._dropped_frames += newest - index
+                index = newest
+                deadline = self.deadline_ns(index)
+
+        self._record(now - deadline)
+        self._last_index = index
+        self._next_index = index + 1
+        return index
+
+    def statistics(self) -> Dict[str, Any]:
+        """Jitter, missed deadlines, dropped frames and current drift."""
+        frames = self._frames
+        mean = self._lateness_sum_ns / frames if frames else 0.0
+        variance = self._lateness_square_sum / frames - mean**2 if frames else 0.0
+
+        return {
+            "fps": self.fps,
+            "late_policy": self.late_policy.value,
+            "paced": self.paced,
+            "frames_scheduled": frames,
+            "last_frame_index": self._last_index,
+            "missed_deadlines": self._missed_deadlines,
+            "dropped_frames": self._dropped_frames,
+            "mean_jitter_ms": mean / 1e6,
+            "jitter_std_ms": math.sqrt(max(variance, 0.0)) / 1e6,
+            "max_jitter_ms": self._max_lateness_ns / 1e6,
+            "drift_ms": self._last_lateness_ns / 1e6,
+        }
+
+    def _record(self, lateness_ns: int) -> None:
+        """Accumulate the lateness of an issued frame."""
+        self._frames += 1
+        self._last_lateness_ns = lateness_ns
+        self._lateness_sum_ns += lateness_ns
+        self._lateness_square_sum += float(lateness_ns) ** 2
+        self._max_lateness_ns = max(self._max_lateness_ns, lateness_ns)
+        if lateness_ns > self.tolerance_ns:
+            self._missed_deadlines += 1
@@ -0,0 +1,211 @@
+# ISI-Core/src/services/image_export_service.py
+
+"""
+Lossless image export of stimulus sequences.
+Encodes stimulus frames as compressed PNG files on a thread pool, writing
+them in frame order for external tools.
+"""
+
+import os
+import struct
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from ..interfaces.experiment_interfaces import FrameFormat, StimulusFrame
+from .stimulus_service import StimulusFrameSequence, StimulusSequence, frame_shape_for
+
+# PNG file signature and chunk framing
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IHDR = struct.Struct(">IIBBBBB")
+
+# PNG color types used for the stimulus frame formats
+PNG_GRAYSCALE = 0
+PNG_TRUECOLOR = 2
+PNG_INDEXED = 3
+
+# PNG "Up" row filter: repeated rows filter to zeros and compress to nothing
+PNG_FILTER_UP = 2
+
+# Default zlib level balancing export speed against file size
+DEFAULT_PNG_COMPRESSION_LEVEL = 6
+
+# Encoded frames in flight per worker before completed frames are written
+PENDING_FRAMES_PER_WORKER = 4
+
+# Encoded slots of a periodic sequence kept for reuse by later frames
+ENCODED_SLOT_CACHE_ENTRIES = 256
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Length-prefixed, CRC-terminated PNG chunk."""
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def encode_png(
+    pixels: np.ndarray,
+    metadata: Dict[str, Any],
+    compression_level: int = DEFAULT_PNG_COMPRESSION_LEVEL,
+) -> bytes:
+    """
+    Encode one stored frame as a PNG image.
+
+    metadata is the sequence metadata carrying frame_format, frame_size and
+    palette. RGB frames become truecolor images, luminance frames grayscale
+    images, and packed binary frames 1-bit indexed images with the stimulus
+    palette, so no format is expanded before compression.
+    """
+    frame_format = FrameFormat(metadata.get("frame_format", FrameFormat.RGB))
+    height, width = metadata["frame_size"]
+    rows = np.ascontiguousarray(pixels, dtype=np.uint8).reshape(height, -1)
+
+    palette_chunk = b""
+    if frame_format is FrameFormat.RGB:
+        bit_depth, color_type = 8, PNG_TRUECOLOR
+    elif frame_format is FrameFormat.LUMINANCE:
+        bit_depth, color_type = 8, PNG_GRAYSCALE
+    else:
+        bit_depth, color_type = 1, PNG_INDEXED
+        palette = np.asarray(metadata["palette"], dtype=np.uint8)
+        palette_chunk = _png_chunk(b"PLTE", palette.tobytes())
+
+    # Filter every row against the row above it
+    filtered = np.empty((height, rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = PNG_FILTER_UP
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+
+    header = PNG_IHDR.pack(width, height, bit_depth, color_type, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + _png_chunk(b"IHDR", header)
+        + palette_chunk
+        + _png_chunk(b"IDAT", zlib.compress(filtered.tobytes(), compression_level))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+class StimulusImageExporter:
+    """
+    Parallel PNG exporter for stimulus sequences.
+    Single Responsibility: Write stimulus frames as lossless PNG files.
+
+    Frames are encoded on a thread pool (zlib releases the GIL while
+    compressing) and written in frame order as they complete, with a
+    bounded number of frames in flight so lazily rendered sequences stay
+    lazy. Frames of a periodic sequence that share a stored slot are
+    encoded once while the slot stays among the most recently used; a
+    slot is dropped after the last frame that uses it.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        compression_level: int = DEFAULT_PNG_COMPRESSION_LEVEL,
+        slot_cache_entries: int = ENCODED_SLOT_CACHE_ENTRIES,
+    ):
+        """Initialize exporter with a worker count (default: CPU count)."""
+        if workers is not None and workers <= 0:
+            raise ValueError("workers must be positive")
+        if not 0 <= compression_level <= 9:
+            raise ValueError("compression_level must be between 0 and 9")
+        if slot_cache_entries < 0:
+            raise ValueError("slot_cache_entries cannot be negative")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.compression_level = compression_level
+        self.slot_cache_entries = slot_cache_entries
+
+    def export(
+        self,
+        frames: Sequence[StimulusFrame],
+        output_directory: Union[str, Path],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Path]:
+        """
+        Write frame_XXXXXX.png for every frame, named by frame number.
+
+        progress_callback(written, total) is called after each file in order.
+        Returns the written paths in frame order.
+        """
+        if len(frames) == 0:
+            raise ValueError("frames cannot be empty")
+
+        sequence = self._as_sequence(frames)
+        metadata = sequence.metadata
+        frame_shape = frame_shape_for(
+            metadata.get("frame_format", FrameFormat.RGB), *metadata["frame_size"]
+        )
+
+        directory = Path(output_directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        total = len(sequence)
+        reuse_slots = sequence.slot_count < total
+        encoded_slots: "OrderedDict[int, Future[bytes]]" = OrderedDict()
+        last_use = self._last_uses(sequence) if reuse_slots else None
+        pending: Deque[Tuple[Path, "Future[bytes]"]] = deque()
+        paths: List[Path] = []
+
+        def write_completed(limit: int) -> None:
+            while len(pending) > limit:
+                path, future = pending.popleft()
+                path.write_bytes(future.result())
+                paths.append(path)
+                if progress_callback is not None:
+                    progress_callback(len(paths), total)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for index in range(total):
+                slot = sequence.frame_slot(index)
+                future = encoded_slots.get(slot)
+                if future is None:
+                    pixels = sequence.frame_pixels(index).reshape(frame_shape)
+                    future = pool.submit(
+                        encode_png, pixels, metadata, self.compression_level
+                    )
+                    if reuse_slots:
+                        encoded_slots[slot] = future
+                        if len(encoded_slots) > self.slot_cache_entries:
+                            encoded_slots.popitem(last=False)
+                elif last_use is not None:
+                    encoded_slots.move_to_end(slot)
+
+                # The pending queue keeps the future alive until it is written
+                if last_use is not None and last_use[slot] == index:
+                    encoded_slots.pop(slot, None)
+
+                frame_number, _ = sequence.frame_timing(index)
+                pending.append((directory / f"frame_{frame_number:06d}.png", future))
+                write_completed(self.workers * PENDING_FRAMES_PER_WORKER)
+
+            write_completed(0)
+
+        return paths
+
+    def _last_uses(self, sequence: StimulusFrameSequence) -> np.ndarray:
+        """Index of the last frame using each slot of a sequence."""
+        slots = sequence.index_columns()[2]
+        reversed_slots, first_reversed = np.unique(slots[::-1], return_index=True)
+        last_use = np.full(sequence.slot_count, -1, dtype=np.int64)
+        last_use[reversed_slots] = len(slots) - 1 - first_reversed
+        return last_use
+
+    def _as_sequence(self, frames: Sequence[StimulusFrame]) -> StimulusFrameSequence:
+        """Pixel-backed view of frames; StimulusFrame lists are stacked once."""
+        if isinstance(frames, StimulusFrameSequence):
+            sequence = frames
+        else:
+            sequence = StimulusSequence.from_frames(frames)
+
+        if "frame_size" not in sequence.metadata:
+            raise ValueError("Frame metadata must include frame_size for image export")
+        return sequence
@@ -0,0 +1,189 @@
+# ISI-Core/src/services/parametric_stimulus_service.py
+
+"""
+Parametric bar stimulus encoding.
+Represents a bar stimulus by its per-frame bar geometry instead of rasters
+and rasterizes frames on demand through the block renderer.
+"""
+
+import json
+import struct
+from typing import Any, Dict, Iterator, Optional, Tuple
+import numpy as np
+
+from ..interfaces.experiment_interfaces import SetupParameters, StimulusParameters
+from .stimulus_service import (
+    BAR_GEOMETRY_DTYPE,
+    SphericalWarpEngine,
+    StimulusFrameSequence,
+    StimulusRenderer,
+)
+
+# Encoded parametric sequence identification
+PARAMETRIC_MAGIC = b"ISIBAR\0\0"
+PARAMETRIC_VERSION = 1
+
+# Fixed preamble: magic, version, header length
+PARAMETRIC_PREAMBLE = struct.Struct("<8sII")
+
+
+class ParametricBarSequence(StimulusFrameSequence):
+    """
+    Parametric bar stimulus sequence.
+    Single Responsibility: Serve bar stimulus frames from per-frame geometry.
+
+    Stores one bar geometry record per frame of the stimulus cycle (a few
+    kilobytes per session) and rasterizes frames from those records with
+    the same renderer code as the raster path, so frames are byte-identical
+    to it. The renderer only supplies the per-pixel tables and colors; a
+    decoded sequence never recomputes the geometry it was sent.
+    """
+
+    def __init__(
+        self, renderer: StimulusRenderer, geometry: Optional[np.ndarray] = None
+    ):
+        """Initialize sequence from a bar renderer and its cycle's geometry."""
+        if not isinstance(renderer, StimulusRenderer):
+            raise TypeError("renderer must be a StimulusRenderer instance")
+        if not renderer.is_bar_stimulus:
+            raise ValueError("Parametric encoding supports drifting bar stimuli only")
+
+        if geometry is None:
+            geometry = renderer.bar_geometry(np.arange(renderer.period))
+        elif not isinstance(geometry, np.ndarray):
+            raise TypeError("geometry must be a numpy array")
+        elif geometry.dtype != BAR_GEOMETRY_DTYPE or geometry.ndim != 1:
+            raise ValueError("geometry must be a 1-D array of BAR_GEOMETRY_DTYPE")
+        elif not 0 < len(geometry) <= max(renderer.frame_count, 1):
+            raise ValueError(
+                f"geometry must hold 1 to {renderer.frame_count} frame records"
+            )
+
+        self.renderer = renderer
+        self.geometry = geometry
+
+    @classmethod
+    def from_parameters(
+        cls,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        warp_engine: Optional[SphericalWarpEngine] = None,
+    ) -> "ParametricBarSequence":
+        """Create parametric sequence for a stimulus on a setup."""
+        return cls(StimulusRenderer(parameters, setup, warp_engine=warp_engine))
+
+    @classmethod
+    def decode(
+        cls, data: bytes, warp_engine: Optional[SphericalWarpEngine] = None
+    ) -> "ParametricBarSequence":
+        """
+        Rebuild a sequence from encode() output, e.g. in the display process.
+
+        Frames are rasterized from the encoded geometry; the parameters and
+        setup only rebuild the renderer's per-pixel tables and colors.
+        """
+        if len(data) < PARAMETRIC_PREAMBLE.size:
+            raise ValueError("Truncated parametric stimulus")
+
+        magic, version, header_length = PARAMETRIC_PREAMBLE.unpack_from(data)
+        if magic != PARAMETRIC_MAGIC:
+            raise ValueError("Not a parametric stimulus encoding")
+        if version != PARAMETRIC_VERSION:
+            raise ValueError(f"Unsupported parametric encoding version: {version}")
+
+        header_end = PARAMETRIC_PREAMBLE.size + header_length
+        header = json.loads(data[PARAMETRIC_PREAMBLE.size : header_end])
+        if (len(data) - header_end) % BAR_GEOMETRY_DTYPE.itemsize:
+            raise ValueError("Truncated parametric stimulus geometry")
+
+        renderer = StimulusRenderer(
+            StimulusParameters(**header["parameters"]),
+            SetupParameters(**header["setup"]),
+            warp_engine=warp_engine,
+        )
+        if header["geometry_space"] != renderer.geometry_space:
+            raise ValueError(
+                f"Encoded geometry space {header['geometry_space']} does not "
+                f"match the renderer's {renderer.geometry_space}"
+            )
+
+        geometry = np.frombuffer(data, dtype=BAR_GEOMETRY_DTYPE, offset=header_end)
+        return cls(renderer, geometry)
+
+    def encode(self) -> bytes:
+        """Compact self-describing encoding: parameters, setup and geometry."""
+        header = json.dumps(
+            {
+                "parameters": json.loads(self.renderer.parameters.json()),
+                "setup": json.loads(self.renderer.setup.json()),
+                "geometry_space": self.renderer.geometry_space,
+            }
+        ).encode("utf-8")
+
+        return (
+            PARAMETRIC_PREAMBLE.pack(PARAMETRIC_MAGIC, PARAMETRIC_VERSION, len(header))
+            + header
+            + self.geometry.tobytes()
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of bar geometry held by the sequence."""
+        return self.geometry.nbytes
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single rasterized frame."""
+        return self.renderer.frame_shape
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame of the sequence."""
+        metadata = self.renderer.sequence_metadata()
+        metadata["encoding"] = "parametric_bar"
+        metadata["geometry_space"] = self.renderer.geometry_space
+        return metadata
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return self.renderer.frame_count
+
+    @property
+    def slot_count(self) -> int:
+        """One geometry record per frame of the stimulus cycle."""
+        return len(self.geometry)
+
+    def frame_slot(self, index: int) -> int:
+        """Frames share the geometry of their position within the cycle."""
+        return index % len(self.geometry)
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) for all frames."""
+        frame_numbers = np.arange(len(self), dtype=np.int64)
+        return (
+            frame_numbers,
+            self.renderer.timestamps(frame_numbers),
+            frame_numbers % len(self.geometry),
+        )
+
+    def frame_geometry(self, index: int) -> np.void:
+        """Bar geometry record of the frame at index."""
+        return self.geometry[self.frame_slot(index)]
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """Rasterize the frame at index."""
+        slot = self.frame_slot(index)
+        return self.renderer.render_geometry(self.geometry[slot : slot + 1])[0]
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """Frame numbers equal indices; timestamps follow the frame rate."""
+        return index, index / self.renderer.parameters.fps
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Rasterize the stimulus cycle in renderer-sized blocks."""
+        block_size = self.renderer.block_size
+        for start in range(0, len(self.geometry), block_size):
+            block = self.renderer.render_geometry(
+                self.geometry[start : start + block_size]
+            )
+            yield from block
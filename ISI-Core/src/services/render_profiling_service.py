@@ -0,0 +1,332 @@
+# ISI-Core/src/services/render_profiling_service.py
+
+"""
+Stimulus render-budget profiling.
+Measures per-frame render time, memory and throughput of stimuli against
+their real-time frame budget, and benchmarks resolution x fps x stimulus
+type sweeps to choose between streaming and pre-rendered presentation.
+
+Benchmark command (from the directory containing the package):
+    python -m <package>.src.services.render_profiling_service --frames 60
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from ..interfaces.experiment_interfaces import (
+    FrameFormat,
+    RenderBudgetReport,
+    SetupParameters,
+    StimulusParameters,
+)
+from .stimulus_service import SphericalWarpEngine, StimulusRenderer
+
+# Frames rendered and timed per profile
+DEFAULT_PROFILE_FRAMES = 120
+
+# Share of the frame interval rendering may use; the rest is left for
+# presentation, so a stimulus is real-time capable if its 95th percentile
+# frame renders within this fraction of 1/fps
+REALTIME_BUDGET_FRACTION = 0.5
+
+# Presentation modes recommended by a profile
+STREAMING_MODE = "streaming"
+PRE_RENDERED_MODE = "pre_rendered"
+
+# Default benchmark sweep
+BENCHMARK_RESOLUTIONS: Tuple[Tuple[int, int], ...] = (
+    (1280, 720),
+    (1920, 1080),
+    (2560, 1440),
+)
+BENCHMARK_FRAME_RATES: Tuple[int, ...] = (30, 60, 120)
+
+# Named stimulus presets swept by the benchmark
+BENCHMARK_STIMULI: Dict[str, Dict[str, Any]] = {
+    "drifting_bar": {
+        "stimulus_type": "drifting_bar",
+        "orientation": 0.0,
+    },
+    "spherical_bar": {
+        "stimulus_type": "drifting_bar",
+        "retinotopy_mode": "bar",
+        "orientation": 0.0,
+        "width": 20.0,
+        "speed": 9.0,
+    },
+    "grating": {
+        "stimulus_type": "grating",
+        "orientation": 0.0,
+        "spatial_frequency": 0.04,
+        "temporal_frequency": 2.0,
+    },
+    "checkerboard": {
+        "stimulus_type": "checkerboard",
+        "orientation": 0.0,
+        "spatial_frequency": 0.04,
+        "temporal_frequency": 2.0,
+        "square_wave": True,
+    },
+}
+
+# Monitor resolution at which presets are checked against a frame format
+BENCHMARK_PROBE_RESOLUTION = (16, 9)
+
+# Representative rig used by the benchmark command
+BENCHMARK_SETUP = SetupParameters(
+    monitor_size=(60.0, 34.0),
+    monitor_resolution=(1920, 1080),
+    monitor_distance=10.0,
+    monitor_elevation=20.0,
+    monitor_rotation=0.0,
+    mouse_eye_height=5.0,
+    mouse_visual_field_vertical=120.0,
+    mouse_visual_field_horizontal=270.0,
+    table_width=50.0,
+    table_depth=30.0,
+    table_height=10.0,
+)
+
+
+class StimulusRenderProfiler:
+    """
+    Stimulus render-budget profiler.
+    Single Responsibility: Measure real-time rendering cost of stimuli.
+
+    Renders frames one at a time, as a real-time display loop would, and
+    times each render. Allocation is measured separately with tracemalloc
+    on a single frame so its overhead does not distort the timings.
+    """
+
+    def __init__(
+        self,
+        warp_engine: Optional[SphericalWarpEngine] = None,
+        budget_fraction: float = REALTIME_BUDGET_FRACTION,
+    ):
+        """Initialize profiler sharing a warp engine across profiles."""
+        if not 0 < budget_fraction <= 1:
+            raise ValueError("budget_fraction must be in (0, 1]")
+
+        self.warp_engine = warp_engine or SphericalWarpEngine()
+        self.budget_fraction = budget_fraction
+
+    def profile(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        frames: int = DEFAULT_PROFILE_FRAMES,
+    ) -> RenderBudgetReport:
+        """Render and time frames of a stimulus against its frame budget."""
+        if not isinstance(parameters, StimulusParameters):
+            raise TypeError("parameters must be a StimulusParameters instance")
+        if not isinstance(setup, SetupParameters):
+            raise TypeError("setup must be a SetupParameters instance")
+        if frames <= 0:
+            raise ValueError("frames must be positive")
+
+        setup_start = time.perf_counter()
+        renderer = StimulusRenderer(parameters, setup, warp_engine=self.warp_engine)
+        setup_ms = (time.perf_counter() - setup_start) * 1000
+
+        frame_numbers = np.arange(min(frames, renderer.frame_count))
+        if len(frame_numbers) == 0:
+            raise ValueError("Stimulus has no frames to profile")
+
+        # Warm up once so first-touch page faults are not attributed to frame 0
+        renderer.render_frames(frame_numbers[:1])
+
+        durations = np.empty(len(frame_numbers))
+        for position, frame_number in enumerate(frame_numbers):
+            start = time.perf_counter()
+            renderer.render_frames(frame_numbers[position : position + 1])
+            durations[position] = time.perf_counter() - start
+
+        tracemalloc.start()
+        try:
+            renderer.render_frames(frame_numbers[-1:])
+            _, peak_allocation = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        total_seconds = float(durations.sum())
+        frames_per_second = len(durations) / total_seconds if total_seconds else 0.0
+        frame_budget_ms = 1000.0 / parameters.fps
+        p95_frame_ms = float(np.percentile(durations, 95)) * 1000
+        realtime_capable = p95_frame_ms <= frame_budget_ms * self.budget_fraction
+
+        width, height = setup.monitor_resolution
+        return RenderBudgetReport(
+            stimulus_type=parameters.stimulus_type,
+            retinotopy_mode=parameters.retinotopy_mode,
+            resolution=(width, height),
+            fps=parameters.fps,
+            frame_format=renderer.frame_format,
+            frame_bytes=renderer.frame_nbytes,
+            frames_profiled=len(durations),
+            setup_ms=setup_ms,
+            frame_budget_ms=frame_budget_ms,
+            mean_frame_ms=float(durations.mean()) * 1000,
+            p95_frame_ms=p95_frame_ms,
+            max_frame_ms=float(durations.max()) * 1000,
+            frames_per_second=frames_per_second,
+            megabytes_per_second=frames_per_second * renderer.frame_nbytes / 1e6,
+            peak_frame_allocation_bytes=peak_allocation,
+            realtime_capable=realtime_capable,
+            recommended_mode=STREAMING_MODE if realtime_capable else PRE_RENDERED_MODE,
+        )
+
+    def benchmark(
+        self,
+        setup: SetupParameters = BENCHMARK_SETUP,
+        resolutions: Sequence[Tuple[int, int]] = BENCHMARK_RESOLUTIONS,
+        frame_rates: Sequence[int] = BENCHMARK_FRAME_RATES,
+        stimuli: Sequence[str] = tuple(BENCHMARK_STIMULI),
+        frames: int = DEFAULT_PROFILE_FRAMES,
+        frame_format: FrameFormat = FrameFormat.RGB,
+    ) -> List[RenderBudgetReport]:
+        """
+        Profile every resolution x frame rate x stimulus preset combination.
+
+        Presets that cannot be rendered in frame_format are skipped; see
+        unsupported_stimuli.
+        """
+        unsupported = self.unsupported_stimuli(setup, stimuli, frame_format)
+
+        reports = []
+        for resolution in resolutions:
+            resolution_setup = setup.copy(update={"monitor_resolution": resolution})
+            for fps in frame_rates:
+                for name in stimuli:
+                    if name in unsupported:
+                        continue
+                    parameters = StimulusParameters(
+                        duration=max(1.0, frames / fps),
+                        fps=fps,
+                        frame_format=frame_format,
+                        **BENCHMARK_STIMULI[name],
+                    )
+                    reports.append(self.profile(parameters, resolution_setup, frames))
+
+        return reports
+
+    def unsupported_stimuli(
+        self,
+        setup: SetupParameters = BENCHMARK_SETUP,
+        stimuli: Sequence[str] = tuple(BENCHMARK_STIMULI),
+        frame_format: FrameFormat = FrameFormat.RGB,
+    ) -> Dict[str, str]:
+        """Presets that cannot be rendered in frame_format, with the reason."""
+        unknown = [name for name in stimuli if name not in BENCHMARK_STIMULI]
+        if unknown:
+            raise ValueError(f"Unknown benchmark stimuli: {', '.join(unknown)}")
+
+        # The frame format is checked when a renderer is built, so a tiny
+        # monitor finds unsupported presets without rendering anything
+        probe_setup = setup.copy(
+            update={"monitor_resolution": BENCHMARK_PROBE_RESOLUTION}
+        )
+        unsupported = {}
+        for name in stimuli:
+            parameters = StimulusParameters(
+                duration=1.0, frame_format=frame_format, **BENCHMARK_STIMULI[name]
+            )
+            try:
+                StimulusRenderer(parameters, probe_setup, warp_engine=self.warp_engine)
+            except ValueError as e:
+                unsupported[name] = str(e)
+        return unsupported
+
+
+def format_reports(reports: Sequence[RenderBudgetReport]) -> str:
+    """Tabulate profile reports for the benchmark command."""
+    lines = [
+        f"{'stimulus':<20}{'resolution':>12}{'fps':>5}{'budget_ms':>11}"
+        f"{'mean_ms':>9}{'p95_ms':>9}{'frames/s':>10}{'MB/s':>9}  mode"
+    ]
+    for report in reports:
+        name = report.stimulus_type
+        if report.retinotopy_mode:
+            name = f"{name}/{report.retinotopy_mode}"
+        width, height = report.resolution
+        lines.append(
+            f"{name:<20}{f'{width}x{height}':>12}"
+            f"{report.fps:>5}{report.frame_budget_ms:>11.2f}"
+            f"{report.mean_frame_ms:>9.2f}{report.p95_frame_ms:>9.2f}"
+            f"{report.frames_per_second:>10.1f}{report.megabytes_per_second:>9.1f}"
+            f"  {report.recommended_mode}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Benchmark command sweeping resolution x fps x stimulus type."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark real-time stimulus rendering against the frame budget."
+    )
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        default=[f"{w}x{h}" for w, h in BENCHMARK_RESOLUTIONS],
+        help="Monitor resolutions as WIDTHxHEIGHT",
+    )
+    parser.add_argument(
+        "--fps", nargs="+", type=int, default=list(BENCHMARK_FRAME_RATES)
+    )
+    parser.add_argument(
+        "--stimuli",
+        nargs="+",
+        default=list(BENCHMARK_STIMULI),
+        choices=list(BENCHMARK_STIMULI),
+    )
+    parser.add_argument("--frames", type=int, default=DEFAULT_PROFILE_FRAMES)
+    parser.add_argument(
+        "--frame-format",
+        default=FrameFormat.RGB.value,
+        choices=[frame_format.value for frame_format in FrameFormat],
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON reports")
+    args = parser.parse_args(argv)
+
+    try:
+        resolutions = [
+            tuple(int(value) for value in resolution.lower().split("x"))
+            for resolution in args.resolutions
+        ]
+        profiler = StimulusRenderProfiler()
+        frame_format = FrameFormat(args.frame_format)
+        unsupported = profiler.unsupported_stimuli(
+            stimuli=args.stimuli, frame_format=frame_format
+        )
+        for name, reason in unsupported.items():
+            print(f"Skipping {name}: {reason}", file=sys.stderr)
+        if len(unsupported) == len(args.stimuli):
+            print(
+                f"No benchmark stimulus supports {frame_format.value} frames",
+                file=sys.stderr,
+            )
+            return 1
+
+        reports = profiler.benchmark(
+            resolutions=resolutions,
+            frame_rates=args.fps,
+            stimuli=args.stimuli,
+            frames=args.frames,
+            frame_format=frame_format,
+        )
+    except ValueError as e:
+        print(f"Benchmark failed: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print("[" + ",\n".join(report.json() for report in reports) + "]")
+    else:
+        print(format_reports(reports))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,232 @@
+# ISI-Core/src/services/stimulus_cache_service.py
+
+"""
+Content-addressed stimulus sequence cache.
+Stores rendered sequences under a canonical hash of the parameters that
+determine their pixels, so identical stimuli are rendered once per rig.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from ..interfaces.experiment_interfaces import (
+    SetupParameters,
+    StimulusParameters,
+    StimulusFrame,
+)
+from .stimulus_service import canonical_hash, render_setup_fields
+from .stimulus_storage_service import (
+    MappedStimulusSequence,
+    StimulusSequenceStore,
+    STIMULUS_SEQUENCE_SUFFIX,
+)
+
+# Default size budget of the stimulus cache
+DEFAULT_STIMULUS_CACHE_BYTES = 20 * 1024 * 1024 * 1024
+
+# Bumped whenever rendering output changes for identical parameters
+STIMULUS_CACHE_VERSION = 3
+
+# Subdirectory entries are rendered into before being moved into the cache
+STIMULUS_CACHE_STAGING_DIRECTORY = ".rendering"
+
+# Interval at which a put waiting on another render of its key checks cancel
+IN_FLIGHT_POLL_SECONDS = 0.1
+
+
+def stimulus_cache_key(parameters: StimulusParameters, setup: SetupParameters) -> str:
+    """Canonical hash of the parameters that determine a stimulus's pixels."""
+    if not isinstance(parameters, StimulusParameters):
+        raise TypeError("parameters must be a StimulusParameters instance")
+    if not isinstance(setup, SetupParameters):
+        raise TypeError("setup must be a SetupParameters instance")
+
+    return canonical_hash(
+        {
+            "version": STIMULUS_CACHE_VERSION,
+            "stimulus": parameters.dict(),
+            "setup": render_setup_fields(setup),
+        }
+    )
+
+
+class StimulusCache:
+    """
+    On-disk stimulus sequence cache.
+    Single Responsibility: Store and reuse rendered stimulus sequences.
+
+    Entries are single-file containers named by the hash of the stimulus
+    parameters and the render-relevant setup fields. Reads refresh an
+    entry's modification time, and writes evict the least recently used
+    entries until the cache fits its size budget.
+
+    Entries are rendered into a staging directory without holding the
+    cache lock, so lookups, statistics and renders of other stimuli never
+    wait on a render; the lock only covers moving the finished entry in
+    and evicting. A second put of a stimulus already being rendered waits
+    for that render instead of repeating it.
+    """
+
+    def __init__(
+        self,
+        cache_directory: Union[str, Path],
+        max_bytes: int = DEFAULT_STIMULUS_CACHE_BYTES,
+    ):
+        """Initialize cache over a directory with a size budget in bytes."""
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+
+        self.cache_directory = Path(cache_directory)
+        self.max_bytes = max_bytes
+        self._store = StimulusSequenceStore()
+        self._lock = threading.Lock()
+        self._rendered = threading.Condition(self._lock)
+        self._in_flight: Set[str] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, parameters: StimulusParameters, setup: SetupParameters) -> str:
+        """Canonical cache key of a stimulus on a setup."""
+        return stimulus_cache_key(parameters, setup)
+
+    def entry_path(self, key: str) -> Path:
+        """Container path of a cache entry."""
+        return self.cache_directory / f"{key}{STIMULUS_SEQUENCE_SUFFIX}"
+
+    def contains(self, parameters: StimulusParameters, setup: SetupParameters) -> bool:
+        """Whether a stimulus has a cache entry, without counting a lookup."""
+        return self.entry_path(self.key(parameters, setup)).exists()
+
+    def get(
+        self, parameters: StimulusParameters, setup: SetupParameters
+    ) -> Optional[MappedStimulusSequence]:
+        """Open a cached sequence, or None on a miss."""
+        path = self.entry_path(self.key(parameters, setup))
+
+        with self._lock:
+            try:
+                sequence = self._store.open(path)
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            except (OSError, ValueError):
+                # Unreadable entries are dropped and re-rendered
+                path.unlink(missing_ok=True)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return sequence
+
+    def put(
+        self,
+        frames: Sequence[StimulusFrame],
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        cancel: Optional[threading.Event] = None,
+    ) -> MappedStimulusSequence:
+        """
+        Store a sequence, evict to the size budget and open the stored entry.
+
+        Setting cancel abandons the write with RuntimeError, caching nothing.
+        """
+        key = self.key(parameters, setup)
+        path = self.entry_path(key)
+
+        with self._rendered:
+            while key in self._in_flight:
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError("Stimulus sequence save cancelled")
+                self._rendered.wait(IN_FLIGHT_POLL_SECONDS)
+
+            # Rendered by the put this one waited for
+            if path.exists():
+                try:
+                    sequence = self._store.open(path)
+                    os.utime(path)
+                    return sequence
+                except (OSError, ValueError):
+                    path.unlink(missing_ok=True)
+
+            self._in_flight.add(key)
+
+        try:
+            staged = self._store.save(frames, self._staging_path(key), cancel=cancel)
+
+            with self._lock:
+                os.replace(staged, path)
+                self._evict(keep=path)
+                return self._store.open(path)
+        finally:
+            with self._rendered:
+                self._in_flight.discard(key)
+                self._rendered.notify_all()
+
+    def statistics(self) -> Dict[str, Any]:
+        """Hit/miss counters and current cache occupancy."""
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": sum(size for _, _, size in entries),
+                "max_bytes": self.max_bytes,
+                "enabled": True,
+                "cache_directory": str(self.cache_directory),
+            }
+
+    def clear(self) -> None:
+        """Remove every cached sequence."""
+        with self._lock:
+            for path, _, _ in self._entries():
+                path.unlink(missing_ok=True)
+
+    def _staging_path(self, key: str) -> Path:
+        """
+        Path an entry is rendered to before it joins the cache.
+
+        In-flight tracking only covers this process, so the name carries the
+        process id and concurrent renders from other processes never collide.
+        """
+        staging = self.cache_directory / STIMULUS_CACHE_STAGING_DIRECTORY
+        return staging / f"{key}-{os.getpid()}{STIMULUS_SEQUENCE_SUFFIX}"
+
+    def _entries(self) -> List[Tuple[Path, int, int]]:
+        """(path, mtime, size) of every entry, least recently used first."""
+        if not self.cache_directory.exists():
+            return []
+
+        entries = []
+        for path in self.cache_directory.glob(f"*{STIMULUS_SEQUENCE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime_ns, stat.st_size))
+
+        entries.sort(key=lambda entry: entry[1])
+        return entries
+
+    def _evict(self, keep: Path) -> None:
+        """Remove least recently used entries until the budget is met."""
+        entries = self._entries()
+        total = sum(size for _, _, size in entries)
+
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
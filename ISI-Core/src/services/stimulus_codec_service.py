@@ -0,0 +1,118 @@
+# ISI-Core/src/services/stimulus_codec_service.py
+
+"""
+Lossless stimulus frame codecs.
+Encodes consecutive stimulus frames as periodic keyframes plus row-level
+XOR deltas, exploiting that successive bar frames differ in a few rows.
+"""
+
+import struct
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+import numpy as np
+
+# Codec names stored in container headers
+RAW_CODEC = "raw"
+DELTA_CODEC = "delta"
+
+# Default distance between keyframes, bounding random-access decode work
+DEFAULT_KEYFRAME_INTERVAL = 32
+
+# Default zlib level of keyframes and deltas
+DEFAULT_DELTA_COMPRESSION_LEVEL = 6
+
+# Per-slot record of the encoded payload table
+DELTA_SLOT_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u8")])
+
+# Delta payload prefix: number of changed rows
+DELTA_ROW_COUNT = struct.Struct("<I")
+
+
+class DeltaFrameCodec:
+    """
+    Keyframe + row XOR delta codec.
+    Single Responsibility: Encode and decode fixed-shape frames losslessly.
+
+    Every keyframe_interval-th slot is stored whole; the slots in between
+    store the indices of the rows that changed since the previous slot and
+    those rows XORed with their previous contents. Both are deflated, which
+    run-length encodes the mostly-zero XOR rows. Any slot decodes from its
+    keyframe in at most keyframe_interval - 1 delta applications.
+    """
+
+    def __init__(
+        self,
+        frame_shape: Tuple[int, ...],
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+        compression_level: int = DEFAULT_DELTA_COMPRESSION_LEVEL,
+    ):
+        """Initialize codec for frames of a fixed shape."""
+        if len(frame_shape) == 0 or int(np.prod(frame_shape)) == 0:
+            raise ValueError("frame_shape must describe a non-empty frame")
+        if keyframe_interval <= 0:
+            raise ValueError("keyframe_interval must be positive")
+        if not 0 <= compression_level <= 9:
+            raise ValueError("compression_level must be between 0 and 9")
+
+        self.frame_shape = tuple(frame_shape)
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+
+        # Frames are diffed as rows of bytes along the first axis
+        self._row_shape = (self.frame_shape[0], -1)
+
+    def is_keyframe(self, slot: int) -> bool:
+        """Whether a slot is stored as a keyframe."""
+        return slot % self.keyframe_interval == 0
+
+    def keyframe_for(self, slot: int) -> int:
+        """Keyframe slot a slot decodes from."""
+        return slot - slot % self.keyframe_interval
+
+    def encode(self, frames: Iterable[np.ndarray]) -> Iterator[bytes]:
+        """Yield one encoded payload per frame, in order."""
+        previous: Optional[np.ndarray] = None
+
+        for slot, pixels in enumerate(frames):
+            rows = self._rows(pixels)
+            if previous is None or self.is_keyframe(slot):
+                payload = rows.tobytes()
+            else:
+                delta = np.bitwise_xor(rows, previous)
+                changed = np.flatnonzero(delta.any(axis=1))
+                payload = (
+                    DELTA_ROW_COUNT.pack(len(changed))
+                    + changed.astype("<u4").tobytes()
+                    + delta[changed].tobytes()
+                )
+
+            yield zlib.compress(payload, self.compression_level)
+            previous = rows.copy()
+
+    def decode_keyframe(self, payload: bytes) -> np.ndarray:
+        """Decode a keyframe payload into a new writable frame."""
+        data = zlib.decompress(payload)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.frame_shape).copy()
+
+    def apply_delta(self, frame: np.ndarray, payload: bytes) -> None:
+        """Advance a frame in place by one delta payload."""
+        data = zlib.decompress(payload)
+        (count,) = DELTA_ROW_COUNT.unpack_from(data)
+
+        rows = self._rows(frame)
+        indices = np.frombuffer(
+            data, dtype="<u4", count=count, offset=DELTA_ROW_COUNT.size
+        )
+        changes = np.frombuffer(
+            data, dtype=np.uint8, offset=DELTA_ROW_COUNT.size + 4 * count
+        ).reshape(count, rows.shape[1])
+        rows[indices] ^= changes
+
+    def _rows(self, pixels: np.ndarray) -> np.ndarray:
+        """View a frame as rows of bytes."""
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        if pixels.size != int(np.prod(self.frame_shape)):
+            raise ValueError(
+                f"Frame has {pixels.size} bytes, expected shape {self.frame_shape}"
+            )
+        return pixels.reshape(self._row_shape)
@@ -0,0 +1,235 @@
+# ISI-Core/src/services/stimulus_pregeneration_service.py
+
+"""
+Speculative stimulus pre-generation.
+Renders the stimulus the user is expected to generate into the stimulus
+cache in the background while setup and stimulus parameters are edited.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..interfaces.experiment_interfaces import (
+    IStimulusGenerator,
+    SetupParameters,
+    StimulusGenerationOptions,
+    StimulusParameters,
+)
+from .stimulus_cache_service import stimulus_cache_key
+
+# Seconds parameters must stay unchanged before rendering starts
+DEFAULT_SETTLE_SECONDS = 1.0
+
+# Pre-generation states
+IDLE = "idle"
+WAITING = "waiting"
+RENDERING = "rendering"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class StimulusPregenerator:
+    """
+    Background stimulus pre-generator.
+    Single Responsibility: Render the expected stimulus into the cache ahead of use.
+
+    Every parameter update replaces the expected stimulus. Rendering starts
+    once the parameters have been stable for the settle time, and a change
+    while rendering cancels the stale render and restarts the timer. A
+    foreground generate waits for a matching render that is in progress,
+    so it finds the sequence already cached or finishes the partial work.
+    Pre-generation needs a generator with a stimulus cache; without one
+    every render fails.
+    """
+
+    def __init__(
+        self,
+        generator: IStimulusGenerator,
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+    ):
+        """Initialize pre-generator rendering through a generator's cache."""
+        if not isinstance(generator, IStimulusGenerator):
+            raise TypeError("generator must be an IStimulusGenerator instance")
+        if settle_seconds < 0:
+            raise ValueError("settle_seconds cannot be negative")
+
+        self.generator = generator
+        self.settle_seconds = settle_seconds
+
+        self._condition = threading.Condition()
+        self._key: Optional[str] = None
+        self._pending: Optional[Tuple[StimulusParameters, SetupParameters]] = None
+        self._changed_at = 0.0
+        self._cancel: Optional[threading.Event] = None
+        self._state = IDLE
+        self._error = ""
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+    def update(self, parameters: StimulusParameters, setup: SetupParameters) -> None:
+        """Record the currently expected stimulus, restarting on a change."""
+        key = stimulus_cache_key(parameters, setup)
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Pre-generator is closed")
+            if key == self._key and self._state != FAILED:
+                return
+
+            self._cancel_render()
+            self._key = key
+            self._pending = (parameters, setup)
+            self._changed_at = time.monotonic()
+            self._state = WAITING
+            self._error = ""
+
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+            self._condition.notify_all()
+
+    def wait_for(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Wait until the stimulus has been pre-generated.
+
+        A matching stimulus still settling starts rendering immediately. A
+        different expected stimulus is stale and cancelled. Returns whether
+        the stimulus is now in the cache.
+        """
+        key = stimulus_cache_key(parameters, setup)
+
+        with self._condition:
+            if key != self._key:
+                self._cancel_render()
+                self._key = None
+                self._pending = None
+                self._state = IDLE
+                self._condition.notify_all()
+                return False
+
+            # Skip the settle time, the user is asking for this stimulus now
+            self._changed_at = -float("inf")
+            self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: self._key != key or self._state not in (WAITING, RENDERING),
+                timeout=timeout,
+            )
+            return self._key == key and self._state == DONE
+
+    def cancel(self) -> None:
+        """Drop the expected stimulus and cancel any render in progress."""
+        with self._condition:
+            self._cancel_render()
+            self._key = None
+            self._pending = None
+            self._state = IDLE
+            self._condition.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        """State of the expected stimulus: idle, waiting, rendering, done, ..."""
+        with self._condition:
+            return {
+                "state": self._state,
+                "cache_key": self._key,
+                "error": self._error,
+                "settle_seconds": self.settle_seconds,
+            }
+
+    def close(self) -> None:
+        """Cancel pending work and stop the background thread."""
+        with self._condition:
+            self._cancel_render()
+            self._closed = True
+            if self._state in (WAITING, RENDERING):
+                self._state = CANCELLED
+            self._condition.notify_all()
+            worker = self._worker
+
+        if worker is not None:
+            worker.join()
+
+    def __enter__(self) -> "StimulusPregenerator":
+        """Use as a context manager that closes the pre-generator."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close the pre-generator."""
+        self.close()
+
+    def _cancel_render(self) -> None:
+        """Signal the render in progress to stop; caller holds the condition."""
+        if self._cancel is not None:
+            self._cancel.set()
+            self._cancel = None
+
+    def _run(self) -> None:
+        """Worker loop starting renders once parameters have settled."""
+        while True:
+            with self._condition:
+                job = self._next_job()
+                if job is None:
+                    return
+
+            key, parameters, setup, cancel = job
+            state, error = self._render(parameters, setup, cancel)
+
+            with self._condition:
+                # A newer update owns the state once this render went stale
+                if self._key == key and self._cancel is cancel:
+                    self._cancel = None
+                    self._state = state
+                    self._error = error
+                self._condition.notify_all()
+
+    def _next_job(
+        self,
+    ) -> Optional[Tuple[str, StimulusParameters, SetupParameters, threading.Event]]:
+        """Block until a settled stimulus is pending; None once closed."""
+        while not self._closed:
+            if self._pending is None:
+                self._condition.wait()
+                continue
+
+            remaining = self._changed_at + self.settle_seconds - time.monotonic()
+            if remaining > 0:
+                self._condition.wait(remaining)
+                continue
+
+            parameters, setup = self._pending
+            self._pending = None
+            self._cancel = threading.Event()
+            self._state = RENDERING
+            return self._key, parameters, setup, self._cancel
+
+        return None
+
+    def _render(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        cancel: threading.Event,
+    ) -> Tuple[str, str]:
+        """Render a stimulus into the cache; returns (state, error message)."""
+        # Without a cache the generator only opens a lazy stream, so nothing
+        # would be rendered ahead of use
+        statistics = self.generator.get_cache_statistics()
+        if not statistics.success:
+            return FAILED, statistics.error_message
+        if not statistics.data.get("enabled", False):
+            return FAILED, "No cache directory configured"
+
+        result = self.generator.generate_stimulus_frames(
+            parameters, setup, StimulusGenerationOptions(cached=True), cancel=cancel
+        )
+        if result.success:
+            return DONE, ""
+        if cancel.is_set():
+            return CANCELLED, ""
+        return FAILED, result.error_message
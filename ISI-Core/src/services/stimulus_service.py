@@ -0,0 +1,1798 @@
+# ISI-Core/src/services/stimulus_service.py
+
+"""
+Vectorized stimulus rendering engine.
+Renders whole blocks of stimulus frames with broadcast index arithmetic,
+using cached spherical warp tables for visual-field stimuli, and serves
+them lazily as pixel-backed frame sequences.
+"""
+
+import os
+import copy
+import json
+import math
+import queue
+import weakref
+import hashlib
+import threading
+from abc import abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from collections.abc import Sequence as SequenceABC
+from fractions import Fraction
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from ..interfaces.experiment_interfaces import (
+    FrameFormat,
+    SetupParameters,
+    StimulusParameters,
+    StimulusFrame,
+)
+
+# Default upper bound on the size of a single rendered block (T x H x W x C)
+DEFAULT_MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Default number of blocks a stream renders ahead of its consumer
+DEFAULT_PREFETCH_BLOCKS = 2
+
+# Default budget for keeping one rendered stimulus cycle in memory
+DEFAULT_CYCLE_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Vertical motion of the pixel drifting bar per frame
+BAR_STEP_PIXELS = 2
+
+# Label values used in the broadcastable label field
+BACKGROUND_LABEL = 0
+BAR_LABEL = 1
+
+# Periodic stimuli rendered from a per-pixel spatial phase table
+GRATING_STIMULI = ("grating", "checkerboard")
+
+# Quantized phase steps per grating cycle, the size of the phase -> color LUT
+GRATING_PHASE_STEPS = 1024
+
+# Largest temporal frequency denominator kept when deriving exact periods
+TEMPORAL_FREQUENCY_DENOMINATOR = 1000
+
+# Per-frame bar geometry: center (visual degrees) or top row (pixels) of the
+# band, its width in the same units, orientation in degrees and visibility
+BAR_GEOMETRY_DTYPE = np.dtype(
+    [
+        ("position", "<f8"),
+        ("width", "<f8"),
+        ("orientation", "<f4"),
+        ("visible", "?"),
+    ]
+)
+
+# Coordinate spaces of bar geometry
+PIXEL_ROW_SPACE = "pixel_rows"
+VISUAL_DEGREE_SPACE = "visual_degrees"
+
+# Retinotopy sweep directions and their bar orientations
+SWEEP_DIRECTIONS: Dict[str, float] = {
+    "up": 0.0,
+    "down": 180.0,
+    "right": 90.0,
+    "left": 270.0,
+}
+
+# StimulusParameters fields that only change colors, not stimulus geometry
+APPEARANCE_FIELDS = ("background_color", "bar_color", "contrast", "frame_format")
+
+# SetupParameters fields that determine how stimuli map onto the screen
+RENDER_SETUP_FIELDS = (
+    "monitor_size",
+    "monitor_resolution",
+    "monitor_distance",
+    "monitor_elevation",
+    "monitor_rotation",
+)
+
+# Bumped whenever the warp table computation changes
+WARP_TABLE_VERSION = 1
+
+# Warp table planes
+AZIMUTH_PLANE = 0
+ELEVATION_PLANE = 1
+
+
+def frame_shape_for(
+    frame_format: FrameFormat, height: int, width: int
+) -> Tuple[int, ...]:
+    """Stored shape of one frame in a frame format."""
+    frame_format = FrameFormat(frame_format)
+    if frame_format is FrameFormat.LUMINANCE:
+        return (height, width)
+    if frame_format is FrameFormat.BINARY:
+        return (height, (width + 7) // 8)
+    return (height, width, 3)
+
+
+def expand_to_rgb(pixels: np.ndarray, metadata: Dict[str, Any]) -> np.ndarray:
+    """
+    Expand stored pixels (one frame or a block) to H x W x 3 RGB.
+
+    metadata is the sequence metadata carrying frame_format, palette and
+    frame_size; RGB pixels are returned unchanged.
+    """
+    frame_format = FrameFormat(metadata.get("frame_format", FrameFormat.RGB))
+    if frame_format is FrameFormat.RGB:
+        return pixels
+    if frame_format is FrameFormat.LUMINANCE:
+        return np.repeat(pixels[..., np.newaxis], 3, axis=-1)
+
+    _, width = metadata["frame_size"]
+    bits = np.unpackbits(pixels, axis=-1, count=width)
+    palette = np.asarray(metadata["palette"], dtype=np.uint8)
+    return np.take(palette, bits, axis=0)
+
+
+def orient_frame(
+    pixels: np.ndarray, transpose: bool, flip_axes: Tuple[int, ...] = ()
+) -> np.ndarray:
+    """View of a frame with rows and columns swapped and then flipped."""
+    if transpose:
+        pixels = np.swapaxes(pixels, 0, 1)
+    for axis in flip_axes:
+        pixels = np.flip(pixels, axis=axis)
+    return pixels
+
+
+def canonical_hash(payload: Dict[str, Any]) -> str:
+    """Stable SHA-256 hash of a JSON-serializable payload."""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=list)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def render_setup_fields(setup: SetupParameters) -> Dict[str, Any]:
+    """The render-relevant subset of setup parameters."""
+    return {field: getattr(setup, field) for field in RENDER_SETUP_FIELDS}
+
+
+def stimulus_geometry_key(
+    parameters: StimulusParameters, setup: SetupParameters
+) -> str:
+    """Hash of everything but APPEARANCE_FIELDS that determines stimulus frames."""
+    return canonical_hash(
+        {
+            "stimulus": parameters.dict(exclude=set(APPEARANCE_FIELDS)),
+            "setup": render_setup_fields(setup),
+        }
+    )
+
+
+class SphericalWarpEngine:
+    """
+    Spherical-correction warp tables.
+    Single Responsibility: Map screen pixels to visual-field coordinates.
+
+    The per-pixel azimuth and elevation depend only on the monitor geometry,
+    so they are computed once per geometry hash and cached in memory and,
+    given a cache directory, on disk; a restarted process with the same rig
+    geometry then memory-maps them.
+    """
+
+    def __init__(
+        self,
+        cache_directory: Optional[Union[str, Path]] = None,
+        max_memory_entries: int = 4,
+    ):
+        """Initialize warp engine with an optional on-disk cache directory."""
+        if max_memory_entries <= 0:
+            raise ValueError("max_memory_entries must be positive")
+
+        self.cache_directory = Path(cache_directory) if cache_directory else None
+        self.max_memory_entries = max_memory_entries
+        self._tables: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def geometry_key(self, setup: SetupParameters) -> str:
+        """Cache key of a setup's monitor geometry."""
+        if not isinstance(setup, SetupParameters):
+            raise TypeError("setup must be a SetupParameters instance")
+
+        return canonical_hash(
+            {"version": WARP_TABLE_VERSION, "geometry": render_setup_fields(setup)}
+        )
+
+    def coordinate_tables(self, setup: SetupParameters) -> np.ndarray:
+        """
+        Read-only (2, H, W) float32 tables of azimuth and elevation in degrees.
+
+        Planes are indexed by AZIMUTH_PLANE and ELEVATION_PLANE.
+        """
+        key = self.geometry_key(setup)
+
+        with self._lock:
+            tables = self._tables.get(key)
+            if tables is not None:
+                self._tables.move_to_end(key)
+                return tables
+
+            tables = self._load_from_disk(key)
+            if tables is None:
+                tables = self._compute_tables(setup)
+                self._save_to_disk(key, tables)
+
+            self._tables[key] = tables
+            while len(self._tables) > self.max_memory_entries:
+                self._tables.popitem(last=False)
+
+            return tables
+
+    def _compute_tables(self, setup: SetupParameters) -> np.ndarray:
+        """Project every pixel center onto the eye-centered visual field."""
+        width_px, height_px = setup.monitor_resolution
+        width_cm, height_cm = setup.monitor_size
+
+        # Pixel centers in cm on the screen plane, origin at the screen center
+        u = ((np.arange(width_px) + 0.5) / width_px - 0.5) * width_cm
+        v = (0.5 - (np.arange(height_px) + 0.5) / height_px) * height_cm
+        u, v = np.meshgrid(u, v)
+
+        # Rotation of the monitor around the viewing axis
+        rotation = np.radians(setup.monitor_rotation)
+        u, v = (
+            u * np.cos(rotation) - v * np.sin(rotation),
+            u * np.sin(rotation) + v * np.cos(rotation),
+        )
+
+        # Screen plane perpendicular to a line of sight tilted by the elevation
+        elevation = np.radians(setup.monitor_elevation)
+        distance = setup.monitor_distance
+        x = u
+        y = distance * np.sin(elevation) + v * np.cos(elevation)
+        z = distance * np.cos(elevation) - v * np.sin(elevation)
+
+        tables = np.empty((2, height_px, width_px), dtype=np.float32)
+        tables[AZIMUTH_PLANE] = np.degrees(np.arctan2(x, z))
+        tables[ELEVATION_PLANE] = np.degrees(np.arctan2(y, np.hypot(x, z)))
+        tables.flags.writeable = False
+        return tables
+
+    def _table_path(self, key: str) -> Optional[Path]:
+        """On-disk path of a cached table."""
+        if self.cache_directory is None:
+            return None
+        return self.cache_directory / f"{key}.npy"
+
+    def _load_from_disk(self, key: str) -> Optional[np.ndarray]:
+        """Memory-map a cached table, or None when absent or unreadable."""
+        path = self._table_path(key)
+        if path is None or not path.exists():
+            return None
+
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def _save_to_disk(self, key: str, tables: np.ndarray) -> None:
+        """Persist a table atomically; caching failures are not fatal."""
+        path = self._table_path(key)
+        if path is None:
+            return
+
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(temporary, tables)
+            os.replace(temporary, path)
+        except OSError:
+            temporary.unlink(missing_ok=True)
+
+
+class StimulusRenderer:
+    """
+    Block renderer for stimulus sequences.
+    Single Responsibility: Rasterize stimulus frames in vectorized blocks.
+
+    Each frame is described by a label field that only spans the axes it
+    depends on (a horizontal bar only varies along the rows), so a block is
+    produced by one broadcast assignment of the color table instead of a
+    per-frame Python loop. Bar stimuli are rasterized from their per-frame
+    bar geometry, so parametric sequences that only store the geometry
+    reproduce the raster path exactly. Spherically corrected bars
+    (retinotopy_mode "bar") compare a per-pixel visual-field offset table
+    against the band edges, two comparisons per pixel. Gratings and
+    counter-phase checkerboards gather each frame from a per-pixel spatial
+    phase table through a color LUT rotated by the frame's temporal phase.
+
+    Labels are encoded in the stimulus frame format: RGB, single-channel
+    luminance, or a 1-bit mask packed along the rows. A downscale factor
+    samples every n-th screen row and column, so thumbnails cost only the
+    pixels they contain while keeping full-resolution stimulus geometry.
+    """
+
+    def __init__(
+        self,
+        parameters: StimulusParameters,
+        setup: SetupParameters,
+        max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+        warp_engine: Optional[SphericalWarpEngine] = None,
+        downscale: int = 1,
+    ):
+        """Initialize renderer for a stimulus and setup configuration."""
+        if not isinstance(parameters, StimulusParameters):
+            raise TypeError("parameters must be a StimulusParameters instance")
+        if not isinstance(setup, SetupParameters):
+            raise TypeError("setup must be a SetupParameters instance")
+        if max_block_bytes <= 0:
+            raise ValueError("max_block_bytes must be positive")
+        if downscale <= 0:
+            raise ValueError("downscale must be positive")
+
+        self.parameters = parameters
+        self.setup = setup
+        self.max_block_bytes = max_block_bytes
+        self.downscale = downscale
+
+        # Full-resolution display and the sampled screen grid actually rendered
+        width, height = setup.monitor_resolution
+        self.display_shape: Tuple[int, int] = (height, width)
+        self._sample_rows = np.arange(0, height, downscale)
+        self._sample_columns = np.arange(0, width, downscale)
+        self.screen_shape: Tuple[int, int] = (
+            len(self._sample_rows),
+            len(self._sample_columns),
+        )
+
+        self.frame_count = int(parameters.duration * parameters.fps)
+        self._apply_appearance()
+
+        # Per-pixel sweep offsets and sweep length of a spherically corrected bar
+        self.warp_engine = warp_engine
+        self._sweep: Optional[Tuple[np.ndarray, int]] = None
+        if self._is_spherical_bar():
+            self.warp_engine = warp_engine or SphericalWarpEngine()
+            self._sweep = self._build_spherical_sweep(self.warp_engine)
+
+        # Per-pixel spatial phase steps of a grating or checkerboard
+        self._phase: Optional[np.ndarray] = None
+        if self.is_grating_stimulus:
+            self.warp_engine = warp_engine or SphericalWarpEngine()
+            self._phase = self._build_phase_table(self.warp_engine)
+
+    def restyle(self, parameters: StimulusParameters) -> "StimulusRenderer":
+        """
+        Renderer for parameters that differ only in APPEARANCE_FIELDS.
+
+        The copy shares this renderer's geometry (sweep offsets, phase table
+        and warp engine), so only the color tables are rebuilt.
+        """
+        if not isinstance(parameters, StimulusParameters):
+            raise TypeError("parameters must be a StimulusParameters instance")
+        if stimulus_geometry_key(parameters, self.setup) != stimulus_geometry_key(
+            self.parameters, self.setup
+        ):
+            raise ValueError(
+                "Restyled parameters may only change " + ", ".join(APPEARANCE_FIELDS)
+            )
+
+        restyled = copy.copy(self)
+        restyled.parameters = parameters
+        restyled._apply_appearance()
+        return restyled
+
+    @property
+    def frame_nbytes(self) -> int:
+        """Size of a single rendered frame in bytes."""
+        return int(np.prod(self.frame_shape))
+
+    @property
+    def palette(self) -> np.ndarray:
+        """Label -> RGB color table used to expand compact frames."""
+        return self._color_table
+
+    def sequence_metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame rendered by this renderer."""
+        return {
+            "stimulus_type": self.parameters.stimulus_type,
+            "frame_rate": self.parameters.fps,
+            "frame_format": self.frame_format.value,
+            "frame_size": list(self.screen_shape),
+            "palette": self.palette.tolist(),
+        }
+
+    @property
+    def block_size(self) -> int:
+        """Number of frames rendered per block within the memory budget."""
+        return max(1, min(self.frame_count, self.max_block_bytes // self.frame_nbytes))
+
+    @property
+    def period(self) -> int:
+        """
+        Frames after which the sequence repeats exactly.
+
+        Equals frame_count for stimuli that do not repeat within the sequence.
+        """
+        frame_count = max(self.frame_count, 1)
+
+        if self._sweep is not None:
+            return min(frame_count, self._sweep[1])
+
+        if self._phase is not None:
+            # Whole temporal cycles fit in fps / temporal_frequency frames,
+            # e.g. 3 frames of 60 fps hold 1 cycle at 20 Hz, 2 cycles at 40 Hz
+            frequency = self._temporal_frequency()
+            if frequency == 0:
+                return 1
+            return min(frame_count, (self.parameters.fps / frequency).numerator)
+
+        if self._is_horizontal_bar():
+            # Bar position is (step * frame) mod height
+            height, _ = self.display_shape
+            return min(frame_count, height // math.gcd(BAR_STEP_PIXELS, height))
+
+        if self.parameters.stimulus_type != "drifting_bar":
+            return frame_count
+
+        # Drifting bar without a rendered orientation is a static background
+        return 1
+
+    def timestamps(self, frame_numbers: np.ndarray) -> np.ndarray:
+        """Presentation timestamps in seconds for the given frame numbers."""
+        return np.asarray(frame_numbers, dtype=np.float64) / self.parameters.fps
+
+    def render_block(self, start: int, stop: int) -> np.ndarray:
+        """Render frames [start, stop) as a contiguous T x H x W x C array."""
+        if start < 0 or stop > self.frame_count or start > stop:
+            raise ValueError(
+                f"Invalid frame range [{start}, {stop}) for {self.frame_count} frames"
+            )
+
+        return self.render_frames(np.arange(start, stop))
+
+    def render_frames(
+        self, frame_numbers: Union[Sequence[int], np.ndarray]
+    ) -> np.ndarray:
+        """Render an arbitrary set of frame numbers as a T x H x W x C array."""
+        frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+        if frame_numbers.ndim != 1:
+            raise ValueError("frame_numbers must be one-dimensional")
+
+        frame_numbers = frame_numbers % self.period
+        if self._phase is not None:
+            return self._render_phase_frames(frame_numbers)
+        return self._encode_labels(self._label_field(frame_numbers))
+
+    def iter_blocks(
+        self, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (first_frame_number, block) pairs covering [start, stop)."""
+        if stop is None:
+            stop = self.frame_count
+
+        for block_start in range(start, stop, self.block_size):
+            block_stop = min(block_start + self.block_size, stop)
+            yield block_start, self.render_block(block_start, block_stop)
+
+    @property
+    def is_bar_stimulus(self) -> bool:
+        """Whether frames are fully described by per-frame bar geometry."""
+        return (
+            self.parameters.stimulus_type == "drifting_bar" or self._is_spherical_bar()
+        )
+
+    @property
+    def is_grating_stimulus(self) -> bool:
+        """Whether frames are a color LUT applied to a shifted spatial phase."""
+        return self.parameters.stimulus_type in GRATING_STIMULI
+
+    @property
+    def geometry_space(self) -> str:
+        """Coordinate space of bar geometry positions and widths."""
+        if self._sweep is not None:
+            return VISUAL_DEGREE_SPACE
+        return PIXEL_ROW_SPACE
+
+    def bar_geometry(
+        self, frame_numbers: Union[Sequence[int], np.ndarray]
+    ) -> np.ndarray:
+        """Per-frame bar geometry records (BAR_GEOMETRY_DTYPE) for frame numbers."""
+        if not self.is_bar_stimulus:
+            raise ValueError(f"{self.parameters.stimulus_type} is not a bar stimulus")
+
+        frame_numbers = np.asarray(frame_numbers, dtype=np.int64) % self.period
+        geometry = np.zeros(len(frame_numbers), dtype=BAR_GEOMETRY_DTYPE)
+        geometry["orientation"] = self.parameters.orientation or 0.0
+
+        if self._sweep is not None:
+            # Leading edge advances `speed / fps` degrees per frame from the
+            # first visible pixel; positions are band centers
+            width = self.parameters.width
+            step = self.parameters.speed / self.parameters.fps
+            sweep_index = frame_numbers
+            if self._is_reversed_sweep():
+                sweep_index = self._sweep[1] - 1 - frame_numbers
+            geometry["position"] = sweep_index * step - width / 2
+            geometry["width"] = width
+            geometry["visible"] = True
+        elif self._is_horizontal_bar():
+            height, _ = self.display_shape
+            bar_height = int(height * 0.1)  # 10% of screen height
+            positions = (frame_numbers * BAR_STEP_PIXELS) % height
+            geometry["position"] = positions
+            geometry["width"] = bar_height
+            # Bars that would wrap past the bottom edge are not drawn
+            geometry["visible"] = (positions + bar_height) < height
+
+        return geometry
+
+    def render_geometry(self, geometry: np.ndarray) -> np.ndarray:
+        """Rasterize bar geometry records into a T x H x W x C block."""
+        if not self.is_bar_stimulus:
+            raise ValueError(f"{self.parameters.stimulus_type} is not a bar stimulus")
+
+        return self._encode_labels(self._geometry_labels(geometry))
+
+    def sweep_derivation(
+        self, base: "StimulusRenderer"
+    ) -> Optional[Tuple[bool, bool, Tuple[int, ...]]]:
+        """
+        How this spherical bar sweep derives from another renderer's sweep.
+
+        Returns (reverse, transpose, flip_axes) such that every frame of this
+        sweep equals the base frame at the mirrored cycle position when
+        reverse is set, with rows and columns swapped when transpose is set
+        and then flipped along flip_axes. Returns None when the frames are
+        not an exact view of the base, e.g. for perpendicular sweeps on
+        non-square monitors whose azimuth and elevation tables differ.
+        """
+        if not isinstance(base, StimulusRenderer):
+            raise TypeError("base must be a StimulusRenderer instance")
+        if self._sweep is None or base._sweep is None:
+            return None
+
+        same_stimulus = (
+            self.parameters.dict(exclude={"orientation"})
+            == base.parameters.dict(exclude={"orientation"})
+            and render_setup_fields(self.setup) == render_setup_fields(base.setup)
+            and self.downscale == base.downscale
+        )
+        # Reversal mirrors whole sweeps, so both must hold a complete cycle
+        complete_sweeps = (
+            self.period == self._sweep[1] and base.period == base._sweep[1]
+        )
+        if not same_stimulus or not complete_sweeps:
+            return None
+
+        reverse = self._is_reversed_sweep() != base._is_reversed_sweep()
+        offsets, base_offsets = self._sweep[0], base._sweep[0]
+        if (self.parameters.orientation or 0.0) % 180 == (
+            base.parameters.orientation or 0.0
+        ) % 180:
+            return reverse, False, ()
+
+        # Packed binary rows cannot be transposed as a view
+        if self.frame_format == FrameFormat.BINARY:
+            return None
+
+        for flip_axes in ((), (0,), (1,), (0, 1)):
+            candidate = orient_frame(base_offsets, True, flip_axes)
+            if candidate.shape == offsets.shape and np.array_equal(candidate, offsets):
+                return reverse, True, flip_axes
+
+        return None
+
+    def remap_masks(self, masks: np.ndarray) -> np.ndarray:
+        """Encode a block of packed binary bar masks in this frame format."""
+        if self.frame_format is FrameFormat.BINARY:
+            return masks
+
+        _, width = self.screen_shape
+        return self._encode_labels(np.unpackbits(masks, axis=-1, count=width))
+
+    def _apply_appearance(self) -> None:
+        """Build the frame format and color tables of the current parameters."""
+        self.frame_format = FrameFormat(self.parameters.frame_format)
+        self.frame_shape = frame_shape_for(self.frame_format, *self.screen_shape)
+        self._color_table = self._build_color_table()
+        self._pixel_table = self._build_pixel_table()
+
+        # Whole encoded rows per label, so row-constant labels gather contiguous rows
+        self._row_table: Optional[np.ndarray] = None
+        if not self.is_grating_stimulus:
+            self._row_table = self._build_row_table()
+
+    def _encode_labels(self, labels: np.ndarray) -> np.ndarray:
+        """Encode a label field broadcastable to (T, H, W) in the frame format."""
+        height, _ = self.screen_shape
+        frames = len(labels)
+        block = np.empty((frames,) + self.frame_shape, dtype=np.uint8)
+
+        if labels.shape[2] == 1:
+            # Row-constant labels: copy pre-encoded rows at memory bandwidth
+            row_labels = np.broadcast_to(labels[:, :, 0], (frames, height))
+            block.reshape(frames, height, -1)[...] = self._row_table[row_labels]
+        elif self.frame_format is FrameFormat.BINARY:
+            # One bit per pixel, packed along each row
+            full_labels = np.broadcast_to(labels, (frames,) + self.screen_shape)
+            block[...] = np.packbits(full_labels, axis=-1)
+        else:
+            # Gather encoded pixels for the full (T, H, W) label field
+            full_labels = np.broadcast_to(labels, (frames,) + self.screen_shape)
+            np.take(self._pixel_table, full_labels, axis=0, out=block)
+
+        return block
+
+    def _render_phase_frames(self, frame_numbers: np.ndarray) -> np.ndarray:
+        """Render grating frames by rotating the LUT over the phase table."""
+        block = np.empty((len(frame_numbers),) + self.frame_shape, dtype=np.uint8)
+
+        # Rolling the LUT by the temporal phase moves every pixel's phase at
+        # once, so each frame is one gather without per-pixel arithmetic
+        for frame, step in zip(block, self._phase_steps(frame_numbers)):
+            lut = np.roll(self._pixel_table, step, axis=0)
+            np.take(lut, self._phase, axis=0, out=frame)
+
+        return block
+
+    def _temporal_frequency(self) -> Fraction:
+        """Temporal frequency as an exact fraction of cycles per second."""
+        frequency = Fraction(self.parameters.temporal_frequency or 0.0)
+        return frequency.limit_denominator(TEMPORAL_FREQUENCY_DENOMINATOR)
+
+    def _phase_steps(self, frame_numbers: np.ndarray) -> np.ndarray:
+        """Quantized temporal phase, 2*pi*tf*t - phase_shift, of frames."""
+        cycles = frame_numbers * (
+            float(self._temporal_frequency()) / self.parameters.fps
+        ) - (self.parameters.phase_shift or 0.0) / (2 * np.pi)
+        steps = np.rint(cycles * GRATING_PHASE_STEPS).astype(np.int64)
+        return steps % GRATING_PHASE_STEPS
+
+    def _build_color_table(self) -> np.ndarray:
+        """Build the label -> RGB color table."""
+        bar_color = self.parameters.bar_color or (255, 255, 255)
+        if self.is_grating_stimulus:
+            return self._build_grating_lut(bar_color)
+
+        table = np.empty((2, 3), dtype=np.uint8)
+        table[BACKGROUND_LABEL] = self.parameters.background_color
+        table[BAR_LABEL] = bar_color
+        return table
+
+    def _build_grating_lut(self, peak_color: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Build the phase step -> RGB LUT of one grating cycle.
+
+        Colors swing from the background (mean) color towards peak_color and
+        away from it by the contrast, as a sine or, for square_wave, its sign.
+        """
+        phases = np.arange(GRATING_PHASE_STEPS) * (2 * np.pi / GRATING_PHASE_STEPS)
+        if self.parameters.square_wave:
+            wave = np.where(phases < np.pi, 1.0, -1.0)
+        else:
+            wave = np.sin(phases)
+
+        background = np.asarray(self.parameters.background_color, dtype=np.float64)
+        amplitude = self.parameters.contrast * (np.asarray(peak_color) - background)
+        colors = background + wave[:, np.newaxis] * amplitude
+        return np.clip(np.rint(colors), 0, 255).astype(np.uint8)
+
+    def _build_pixel_table(self) -> np.ndarray:
+        """Build the label -> stored pixel table for the frame format."""
+        if self.frame_format is FrameFormat.RGB:
+            return self._color_table
+
+        if self.frame_format is FrameFormat.LUMINANCE:
+            if not (self._color_table == self._color_table[:, :1]).all():
+                raise ValueError("Luminance frames require gray stimulus colors")
+            return np.ascontiguousarray(self._color_table[:, 0])
+
+        # Binary masks store the label itself as one bit
+        if len(self._color_table) > 2:
+            raise ValueError(
+                f"Binary frames cannot represent {self.parameters.stimulus_type} stimuli"
+            )
+        return np.arange(len(self._color_table), dtype=np.uint8)
+
+    def _build_row_table(self) -> np.ndarray:
+        """Build the label -> encoded constant row table."""
+        _, width = self.screen_shape
+        label_rows = np.repeat(
+            np.arange(len(self._color_table), dtype=np.uint8)[:, np.newaxis],
+            width,
+            axis=1,
+        )
+
+        if self.frame_format is FrameFormat.BINARY:
+            return np.packbits(label_rows, axis=-1)
+        return self._pixel_table[label_rows].reshape(len(label_rows), -1)
+
+    def _build_phase_table(self, warp_engine: SphericalWarpEngine) -> np.ndarray:
+        """
+        Per-pixel spatial phase in steps of GRATING_PHASE_STEPS per cycle.
+
+        Gratings vary along the orientation (0 up in elevation, 90 right in
+        azimuth, as spherical bars sweep) at spatial_frequency cycles per
+        degree of visual field, and drift that way as the temporal phase
+        grows. Checkerboard checks are half a cycle wide along and across
+        the orientation and sit at phase 0 or half a cycle, so the shared
+        LUT reverses their contrast in counter-phase.
+        """
+        spatial_frequency = self.parameters.spatial_frequency
+        if spatial_frequency is None:
+            raise ValueError(
+                f"{self.parameters.stimulus_type} requires spatial_frequency"
+            )
+
+        tables = warp_engine.coordinate_tables(self.setup)
+        sample = np.ix_(self._sample_rows, self._sample_columns)
+        azimuth = tables[AZIMUTH_PLANE][sample].astype(np.float64)
+        elevation = tables[ELEVATION_PLANE][sample].astype(np.float64)
+
+        angle = np.deg2rad(self.parameters.orientation or 0.0)
+        along = (
+            elevation * np.cos(angle) + azimuth * np.sin(angle)
+        ) * spatial_frequency
+
+        if self.parameters.stimulus_type == "checkerboard":
+            across = (
+                azimuth * np.cos(angle) - elevation * np.sin(angle)
+            ) * spatial_frequency
+            parity = (np.floor(2 * along) + np.floor(2 * across)) % 2
+            steps = parity * (GRATING_PHASE_STEPS // 2)
+        else:
+            steps = np.rint(along * GRATING_PHASE_STEPS) % GRATING_PHASE_STEPS
+
+        # Native index dtype, so np.take does not convert indices every frame
+        return steps.astype(np.intp)
+
+    def _is_spherical_bar(self) -> bool:
+        """
+        Whether the stimulus is a spherically corrected retinotopy bar.
+
+        Gratings and checkerboards keep their own pattern under a bar
+        retinotopy mode, so they never build a sweep.
+        """
+        return self.parameters.retinotopy_mode == "bar" and not self.is_grating_stimulus
+
+    def _is_reversed_sweep(self) -> bool:
+        """Whether a spherical bar runs its sweep axis backwards (180/270)."""
+        return (self.parameters.orientation or 0.0) % 360 >= 180
+
+    def _is_horizontal_bar(self) -> bool:
+        """Whether the stimulus is the horizontal pixel drifting bar."""
+        return (
+            self.parameters.stimulus_type == "drifting_bar"
+            and self.parameters.orientation == 0
+            and not self._is_spherical_bar()
+        )
+
+    def _build_spherical_sweep(
+        self, warp_engine: SphericalWarpEngine
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Per-pixel sweep offsets in degrees and sweep length in frames.
+
+        Orientation 0/180 sweeps a horizontal bar up/down in elevation and
+        90/270 a vertical bar right/left in azimuth, from fully off-screen on
+        one side to fully off-screen on the other at `speed` degrees/second.
+        Offsets are measured from the lowest coordinate on the sweep axis;
+        180 and 270 play the 0 and 90 sweeps backwards in time.
+        """
+        orientation = self.parameters.orientation or 0.0
+        width = self.parameters.width
+        speed = self.parameters.speed
+        if orientation % 90 != 0:
+            raise ValueError("Spherical bar orientation must be a multiple of 90")
+        if width is None or speed is None:
+            raise ValueError("Spherical bar requires width and speed")
+
+        tables = warp_engine.coordinate_tables(self.setup)
+        plane = ELEVATION_PLANE if orientation % 180 == 0 else AZIMUTH_PLANE
+        coordinates = tables[plane].astype(np.float64)
+        offsets = (coordinates - coordinates.min()).astype(np.float32)
+
+        step = speed / self.parameters.fps
+        sweep_frames = int(np.floor((float(offsets.max()) + width) / step)) + 1
+
+        sampled = offsets[np.ix_(self._sample_rows, self._sample_columns)]
+        return sampled, sweep_frames
+
+    def _label_field(self, frame_numbers: np.ndarray) -> np.ndarray:
+        """Compute a label field broadcastable to (T, H, W) for the frames."""
+        if self.is_bar_stimulus:
+            return self._geometry_labels(self.bar_geometry(frame_numbers))
+
+        return np.full((len(frame_numbers), 1, 1), BACKGROUND_LABEL, dtype=np.intp)
+
+    def _geometry_labels(self, geometry: np.ndarray) -> np.ndarray:
+        """Label field of the bands described by bar geometry records."""
+        visible = geometry["visible"][:, np.newaxis, np.newaxis]
+
+        if self._sweep is not None:
+            offsets, _ = self._sweep
+            half_width = geometry["width"] / 2
+            lower = (geometry["position"] - half_width).astype(np.float32)
+            upper = (geometry["position"] + half_width).astype(np.float32)
+            in_bar = (
+                (lower[:, np.newaxis, np.newaxis] <= offsets)
+                & (offsets <= upper[:, np.newaxis, np.newaxis])
+                & visible
+            )
+            return in_bar.view(np.uint8)
+
+        # Row bands [position, position + width) at the sampled rows
+        rows = self._sample_rows[np.newaxis, :, np.newaxis]
+        top = geometry["position"][:, np.newaxis, np.newaxis]
+        bottom = top + geometry["width"][:, np.newaxis, np.newaxis]
+        in_bar = (rows >= top) & (rows < bottom) & visible
+
+        return in_bar.astype(np.intp)
+
+
+# Renderer rebuilt once per parallel render worker process
+_worker_renderer: Optional[StimulusRenderer] = None
+
+
+def _initialize_render_worker(
+    parameters: StimulusParameters,
+    setup: SetupParameters,
+    max_block_bytes: int,
+    warp_cache_directory: Optional[Path],
+    downscale: int = 1,
+) -> None:
+    """Rebuild the renderer inside a worker process."""
+    global _worker_renderer
+    warp_engine = SphericalWarpEngine(cache_directory=warp_cache_directory)
+    _worker_renderer = StimulusRenderer(
+        parameters,
+        setup,
+        max_block_bytes=max_block_bytes,
+        warp_engine=warp_engine,
+        downscale=downscale,
+    )
+
+
+def _render_worker_chunk(
+    target: Tuple[Any, ...], range_start: int, range_stop: int, start: int, stop: int
+) -> int:
+    """Worker task: render one chunk with the process-wide renderer."""
+    return _render_chunk_into(
+        _worker_renderer, target, range_start, range_stop, start, stop
+    )
+
+
+def _render_chunk_into(
+    renderer: StimulusRenderer,
+    target: Tuple[Any, ...],
+    range_start: int,
+    range_stop: int,
+    start: int,
+    stop: int,
+) -> int:
+    """
+    Render frames [start, stop) into the shared output of [range_start, range_stop).
+
+    target is ("shm", name) for a shared-memory block or ("file", path,
+    offset) for a region of a file; returns the number of frames written.
+    """
+    shape = (range_stop - range_start,) + renderer.frame_shape
+    shared = None
+
+    if target[0] == "shm":
+        shared = shared_memory.SharedMemory(name=target[1])
+        output = np.ndarray(shape, dtype=np.uint8, buffer=shared.buf)
+    else:
+        output = np.memmap(
+            target[1], dtype=np.uint8, mode="r+", offset=target[2], shape=shape
+        )
+
+    try:
+        for block_start, block in renderer.iter_blocks(start, stop):
+            offset = block_start - range_start
+            output[offset : offset + len(block)] = block
+
+        if isinstance(output, np.memmap):
+            output.flush()
+    finally:
+        del output
+        if shared is not None:
+            shared.close()
+
+    return stop - start
+
+
+class ParallelStimulusRenderer:
+    """
+    Multi-process block renderer.
+    Single Responsibility: Split stimulus frame ranges across a process pool.
+
+    Workers rebuild the renderer from its parameters and write their chunks
+    straight into a shared-memory block or a memory-mapped file region, so
+    no pixels are pickled back to the parent process.
+    """
+
+    def __init__(
+        self,
+        renderer: StimulusRenderer,
+        workers: Optional[int] = None,
+        chunk_frames: Optional[int] = None,
+    ):
+        """Initialize parallel renderer; defaults to all cores and block-sized chunks."""
+        if not isinstance(renderer, StimulusRenderer):
+            raise TypeError("renderer must be a StimulusRenderer instance")
+        if workers is not None and workers <= 0:
+            raise ValueError("workers must be positive")
+        if chunk_frames is not None and chunk_frames <= 0:
+            raise ValueError("chunk_frames must be positive")
+
+        self.renderer = renderer
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_frames = chunk_frames or renderer.block_size
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._finalizer: Optional[weakref.finalize] = None
+
+    # Duck-typed renderer surface used by streams
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single rendered frame."""
+        return self.renderer.frame_shape
+
+    @property
+    def frame_count(self) -> int:
+        """Number of frames in the sequence."""
+        return self.renderer.frame_count
+
+    @property
+    def block_size(self) -> int:
+        """Frames rendered per parallel round (one chunk per worker)."""
+        return self.workers * self.chunk_frames
+
+    def render_block(self, start: int, stop: int) -> np.ndarray:
+        """Render frames [start, stop) across the pool into a private array."""
+        if start < 0 or stop > self.frame_count or start > stop:
+            raise ValueError(
+                f"Invalid frame range [{start}, {stop}) for {self.frame_count} frames"
+            )
+
+        if stop - start <= self.chunk_frames or self.workers == 1:
+            return self.renderer.render_block(start, stop)
+
+        shape = (stop - start,) + self.frame_shape
+        block = np.empty(shape, dtype=np.uint8)
+        shared = shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+        try:
+            self._run(("shm", shared.name), start, stop)
+            output = np.ndarray(shape, dtype=np.uint8, buffer=shared.buf)
+            block[...] = output
+            del output
+        finally:
+            shared.close()
+            shared.unlink()
+
+        return block
+
+    def render_into_file(
+        self, path: Union[str, Path], offset: int, start: int, stop: int
+    ) -> None:
+        """
+        Render frames [start, stop) into a file region starting at offset.
+
+        The file must already be at least offset + (stop - start) frames long.
+        """
+        if start < 0 or stop > self.frame_count or start > stop:
+            raise ValueError(
+                f"Invalid frame range [{start}, {stop}) for {self.frame_count} frames"
+            )
+        if start == stop:
+            return
+
+        if self.workers == 1:
+            target = ("file", str(path), offset)
+            _render_chunk_into(self.renderer, target, start, stop, start, stop)
+            return
+
+        self._run(("file", str(path), offset), start, stop)
+
+    def iter_blocks(
+        self, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (first_frame_number, block) pairs rendered one round at a time."""
+        if stop is None:
+            stop = self.frame_count
+
+        for block_start in range(start, stop, self.block_size):
+            block_stop = min(block_start + self.block_size, stop)
+            yield block_start, self.render_block(block_start, block_stop)
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._executor = None
+        self._finalizer = None
+
+    def __enter__(self) -> "ParallelStimulusRenderer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _run(self, target: Tuple[Any, ...], start: int, stop: int) -> None:
+        """Render [start, stop) into target as chunk tasks and wait for all."""
+        executor = self._pool()
+        futures = [
+            executor.submit(
+                _render_worker_chunk,
+                target,
+                start,
+                stop,
+                chunk_start,
+                min(chunk_start + self.chunk_frames, stop),
+            )
+            for chunk_start in range(start, stop, self.chunk_frames)
+        ]
+
+        written = sum(future.result() for future in futures)
+        if written != stop - start:
+            raise RuntimeError(
+                f"Parallel render wrote {written} of {stop - start} frames"
+            )
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Worker pool, started on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                warp_engine = self.renderer.warp_engine
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_initialize_render_worker,
+                    initargs=(
+                        self.renderer.parameters,
+                        self.renderer.setup,
+                        self.renderer.max_block_bytes,
+                        warp_engine.cache_directory if warp_engine else None,
+                        self.renderer.downscale,
+                    ),
+                )
+                self._finalizer = weakref.finalize(
+                    self, self._executor.shutdown, wait=False, cancel_futures=True
+                )
+            return self._executor
+
+
+class StimulusFrameSequence(SequenceABC):
+    """
+    Base class for pixel-backed stimulus sequences.
+    Single Responsibility: Present frame pixels as a sequence of StimulusFrame.
+
+    Subclasses provide pixel access and timing. Indexing and iteration hand
+    out lightweight frame views, while bulk consumers (storage, export,
+    synchronization) read pixels and index columns without per-frame objects.
+    """
+
+    @property
+    @abstractmethod
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single frame's pixel array."""
+        pass
+
+    @property
+    @abstractmethod
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame of the sequence."""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        pass
+
+    @abstractmethod
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """Pixel array of the frame at a non-negative index."""
+        pass
+
+    @abstractmethod
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """(frame_number, timestamp) of the frame at a non-negative index."""
+        pass
+
+    @property
+    def slot_count(self) -> int:
+        """Number of distinct frames backing the sequence."""
+        return len(self)
+
+    def frame_slot(self, index: int) -> int:
+        """Distinct-frame slot holding the pixels of the frame at index."""
+        return index
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) for all frames."""
+        frame_numbers = np.empty(len(self), dtype=np.int64)
+        timestamps = np.empty(len(self), dtype=np.float64)
+        slots = np.empty(len(self), dtype=np.int64)
+
+        for index in range(len(self)):
+            frame_numbers[index], timestamps[index] = self.frame_timing(index)
+            slots[index] = self.frame_slot(index)
+
+        return frame_numbers, timestamps, slots
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """
+        Yield the pixels of slots 0..slot_count-1 in order.
+
+        Slots are numbered in order of first appearance, so the first frame
+        using each slot supplies its pixels.
+        """
+        next_slot = 0
+        for index in range(len(self)):
+            if next_slot == self.slot_count:
+                return
+            if self.frame_slot(index) == next_slot:
+                yield self.frame_pixels(index)
+                next_slot += 1
+
+    def iter_pixels(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yield (frame_number, timestamp, pixels) for every frame in order."""
+        for index in range(len(self)):
+            frame_number, timestamp = self.frame_timing(index)
+            yield frame_number, timestamp, self.frame_pixels(index)
+
+    @property
+    def frame_format(self) -> FrameFormat:
+        """Stored frame representation."""
+        return FrameFormat(self.metadata.get("frame_format", FrameFormat.RGB))
+
+    def rgb_pixels(self, index: int) -> np.ndarray:
+        """H x W x 3 RGB pixels of the frame at index, expanded for display."""
+        return expand_to_rgb(self.frame_pixels(index), self.metadata)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        """Frame view at index (or a list of frame views for a slice)."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Frame index {index} out of range")
+
+        frame_number, timestamp = self.frame_timing(index)
+        return StimulusFrameView(
+            frame_number, timestamp, self.frame_pixels(index), self
+        )
+
+    def __iter__(self) -> Iterator["StimulusFrameView"]:
+        """Yield lightweight frame views in order."""
+        for frame_number, timestamp, frame_pixels in self.iter_pixels():
+            yield StimulusFrameView(frame_number, timestamp, frame_pixels, self)
+
+    def to_list(self) -> List[StimulusFrame]:
+        """Materialize the whole sequence as StimulusFrame objects."""
+        return [frame.to_frame() for frame in self]
+
+
+class StimulusFrameView:
+    """
+    Lightweight stimulus frame.
+    Single Responsibility: Expose one frame of a sequence without copying it.
+
+    Has the attributes of StimulusFrame, but holds a pixel view and a
+    reference to the sequence's shared metadata instead of a validated
+    model with its own bytes and metadata dict.
+    """
+
+    __slots__ = ("frame_number", "timestamp", "pixels", "_sequence")
+
+    def __init__(
+        self,
+        frame_number: int,
+        timestamp: float,
+        pixels: np.ndarray,
+        sequence: StimulusFrameSequence,
+    ):
+        """Initialize view of one frame of a sequence."""
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.pixels = pixels
+        self._sequence = sequence
+
+    @property
+    def frame_data(self) -> bytes:
+        """Frame pixels as bytes."""
+        return self.pixels.tobytes()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared with every frame of the sequence."""
+        return self._sequence.metadata
+
+    def to_frame(self) -> StimulusFrame:
+        """Copy into a standalone StimulusFrame."""
+        return StimulusFrame(
+            frame_number=self.frame_number,
+            timestamp=self.timestamp,
+            frame_data=self.frame_data,
+            metadata=self.metadata,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"StimulusFrameView(frame_number={self.frame_number}, "
+            f"timestamp={self.timestamp})"
+        )
+
+
+class StimulusSequence(StimulusFrameSequence):
+    """
+    In-memory columnar stimulus sequence.
+    Single Responsibility: Hold stimulus frames as columns and one pixel buffer.
+
+    Frame numbers, timestamps and pixel slots are contiguous arrays, the
+    metadata is stored once, and the pixels of all distinct frames live in
+    one contiguous (slots x frame_shape) buffer.
+    """
+
+    def __init__(
+        self,
+        frames: np.ndarray,
+        frame_numbers: Union[Sequence[int], np.ndarray],
+        timestamps: Union[Sequence[float], np.ndarray],
+        metadata: Optional[Dict[str, Any]] = None,
+        slots: Optional[Union[Sequence[int], np.ndarray]] = None,
+    ):
+        """Initialize sequence from a frame buffer and per-frame columns."""
+        frames = np.ascontiguousarray(frames, dtype=np.uint8)
+        frame_numbers = np.ascontiguousarray(frame_numbers, dtype=np.int64)
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.float64)
+        if frames.ndim < 2:
+            raise ValueError("frames must be a (slots, ...) array")
+        if frame_numbers.ndim != 1 or frame_numbers.shape != timestamps.shape:
+            raise ValueError("frame_numbers and timestamps must be equal-length 1-D")
+
+        if slots is None:
+            slots = np.arange(len(frame_numbers), dtype=np.int64)
+        slots = np.ascontiguousarray(slots, dtype=np.int64)
+        if slots.shape != frame_numbers.shape:
+            raise ValueError("slots must have one entry per frame")
+        if len(slots) and (slots.min() < 0 or slots.max() >= len(frames)):
+            raise ValueError("slots must index the frame buffer")
+
+        self._frames = frames
+        self._frame_numbers = frame_numbers
+        self._timestamps = timestamps
+        self._slots = slots
+        self._metadata = dict(metadata or {})
+
+    @classmethod
+    def from_frames(cls, frames: Sequence[StimulusFrame]) -> "StimulusSequence":
+        """Build a columnar sequence from any frame sequence or StimulusFrame list."""
+        if isinstance(frames, StimulusSequence):
+            return frames
+
+        if isinstance(frames, StimulusFrameSequence):
+            frame_numbers, timestamps, slots = frames.index_columns()
+            buffer = np.empty(
+                (frames.slot_count,) + tuple(frames.frame_shape), np.uint8
+            )
+            for slot, pixels in enumerate(frames.iter_slot_pixels()):
+                buffer[slot] = pixels
+            return cls(buffer, frame_numbers, timestamps, frames.metadata, slots)
+
+        if len(frames) == 0:
+            raise ValueError("frames cannot be empty")
+
+        frame_nbytes = len(frames[0].frame_data)
+        if any(len(frame.frame_data) != frame_nbytes for frame in frames):
+            raise ValueError("frames must have a fixed frame_data size")
+
+        buffer = np.frombuffer(
+            b"".join(frame.frame_data for frame in frames), dtype=np.uint8
+        ).reshape(len(frames), frame_nbytes)
+        return cls(
+            buffer,
+            [frame.frame_number for frame in frames],
+            [frame.timestamp for frame in frames],
+            frames[0].metadata,
+        )
+
+    @property
+    def frames(self) -> np.ndarray:
+        """Contiguous (slots x frame_shape) pixel buffer."""
+        return self._frames
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        """Frame numbers of all frames."""
+        return self._frame_numbers
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Timestamps of all frames in seconds."""
+        return self._timestamps
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single frame's pixel array."""
+        return self._frames.shape[1:]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame of the sequence."""
+        return self._metadata
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return len(self._frame_numbers)
+
+    @property
+    def slot_count(self) -> int:
+        """Number of distinct frames in the buffer."""
+        return len(self._frames)
+
+    def frame_slot(self, index: int) -> int:
+        """Buffer slot of the frame at index."""
+        return int(self._slots[index])
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots)."""
+        return self._frame_numbers, self._timestamps, self._slots
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Yield views of the distinct frames in buffer order."""
+        yield from self._frames
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """View of the pixels of the frame at index."""
+        return self._frames[self._slots[index]]
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """(frame_number, timestamp) of the frame at index."""
+        return int(self._frame_numbers[index]), float(self._timestamps[index])
+
+
+class StimulusStream(StimulusFrameSequence):
+    """
+    Lazy stimulus frame source.
+    Single Responsibility: Serve stimulus frames on demand from a renderer.
+
+    Supports len() and random access by frame index. Iteration renders ahead
+    on a background thread into a bounded queue, so peak memory is a few
+    blocks regardless of sequence length. Periodic stimuli render a single
+    cycle; when it fits the cycle cache budget, frames rendered in cycle
+    order are kept as they arrive and serve every later frame by index
+    modulo the period. The cycle fills block by block from iteration and
+    sequential reads, so stopping an iteration stops rendering, and an
+    isolated random read renders only its own frame. With a parallel
+    renderer, bulk renders (iteration, saving) run on its pool.
+    retain_cycle keeps rendered frames even when the cycle plays only once,
+    for streams whose frames are reused by other sequences.
+    """
+
+    def __init__(
+        self,
+        renderer: StimulusRenderer,
+        prefetch_blocks: int = DEFAULT_PREFETCH_BLOCKS,
+        cycle_cache_bytes: int = DEFAULT_CYCLE_CACHE_BYTES,
+        parallel: Optional[ParallelStimulusRenderer] = None,
+        retain_cycle: bool = False,
+    ):
+        """Initialize stream over a renderer."""
+        if not isinstance(renderer, StimulusRenderer):
+            raise TypeError("renderer must be a StimulusRenderer instance")
+        if parallel is not None and parallel.renderer is not renderer:
+            raise ValueError("parallel renderer must wrap the stream's renderer")
+        if prefetch_blocks <= 0:
+            raise ValueError("prefetch_blocks must be positive")
+        if cycle_cache_bytes < 0:
+            raise ValueError("cycle_cache_bytes cannot be negative")
+
+        self.renderer = renderer
+        self.parallel = parallel
+        self.prefetch_blocks = prefetch_blocks
+        self.cycle_cache_bytes = cycle_cache_bytes
+        self.retain_cycle = retain_cycle
+
+        # Rendered cycle when kept; only its first _cycle_frames frames are filled
+        self._cycle: Optional[np.ndarray] = None
+        self._cycle_frames = 0
+
+        # Most recently rendered frames and last slot read, for random access
+        self._cached_block_start = -1
+        self._cached_block: Optional[np.ndarray] = None
+        self._last_slot: Optional[int] = None
+        self._cache_lock = threading.Lock()
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single rendered frame."""
+        return self.renderer.frame_shape
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame of the stream."""
+        return self.renderer.sequence_metadata()
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return self.renderer.frame_count
+
+    @property
+    def slot_count(self) -> int:
+        """One slot per frame of the stimulus cycle."""
+        return self.renderer.period
+
+    def frame_slot(self, index: int) -> int:
+        """Frames share the slot of their position within the cycle."""
+        return index % self.renderer.period
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) for all frames."""
+        frame_numbers = np.arange(len(self), dtype=np.int64)
+        return (
+            frame_numbers,
+            self.renderer.timestamps(frame_numbers),
+            frame_numbers % self.renderer.period,
+        )
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """Pixels of the frame at index from the kept cycle or a render."""
+        slot = self.frame_slot(index)
+        if slot < self._cycle_frames:
+            return self._cycle[slot]
+        return self._render_slot(slot)
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """Frame numbers equal indices; timestamps follow the frame rate."""
+        return index, index / self.renderer.parameters.fps
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Yield the pixels of one stimulus cycle in order."""
+        for _, _, frame_pixels in self._iter_rendered(self.slot_count):
+            yield frame_pixels
+
+    def iter_pixels(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yield frame pixels in order, serving repeats from the kept cycle."""
+        if not self._keeps_cycle():
+            yield from self._iter_rendered(len(self))
+            return
+
+        period = self.renderer.period
+        yield from self._iter_rendered(min(period, len(self)))
+        for index in range(period, len(self)):
+            yield self.frame_timing(index) + (self._cycle[self.frame_slot(index)],)
+
+    def _keeps_cycle(self) -> bool:
+        """Whether the cycle repeats (or is retained) and fits the budget."""
+        period = self.renderer.period
+        repeats = period < len(self) or self.retain_cycle
+        return repeats and period * self.renderer.frame_nbytes <= self.cycle_cache_bytes
+
+    def _keep_cycle_frames(self, start: int, block: np.ndarray) -> None:
+        """Keep rendered frames continuing the filled cycle; caller holds the lock."""
+        filled = self._cycle_frames
+        stop = min(start + len(block), self.renderer.period)
+        if not start <= filled < stop or not self._keeps_cycle():
+            return
+
+        if self._cycle is None:
+            self._cycle = np.empty(
+                (self.renderer.period,) + block.shape[1:], dtype=block.dtype
+            )
+        self._cycle[filled:stop] = block[filled - start : stop - start]
+        self._cycle_frames = stop
+
+    def _iter_rendered(self, stop: int) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yield frames [0, stop): kept cycle frames, then rendered ahead."""
+        kept = min(self._cycle_frames, stop)
+        for index in range(kept):
+            yield self.frame_timing(index) + (self._cycle[index],)
+        if kept == stop:
+            return
+
+        blocks: "queue.Queue[Any]" = queue.Queue(maxsize=self.prefetch_blocks)
+        halt = threading.Event()
+        producer = threading.Thread(
+            target=self._render_ahead, args=(blocks, halt, kept, stop), daemon=True
+        )
+        producer.start()
+
+        try:
+            while True:
+                item = blocks.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+
+                block_start, block = item
+                with self._cache_lock:
+                    self._keep_cycle_frames(block_start, block)
+                for offset, frame_pixels in enumerate(block):
+                    yield self.frame_timing(block_start + offset) + (frame_pixels,)
+        finally:
+            halt.set()
+            producer.join()
+
+    @property
+    def _bulk_renderer(self) -> Union[StimulusRenderer, ParallelStimulusRenderer]:
+        """Renderer used for cycles and sequential passes."""
+        return self.parallel or self.renderer
+
+    @property
+    def _stride(self) -> int:
+        """Frames per cached random-access block."""
+        return self.renderer.block_size
+
+    def _render_slot(self, slot: int) -> np.ndarray:
+        """Pixels of a cycle slot, rendering a block ahead for sequential reads."""
+        with self._cache_lock:
+            block_start = self._cached_block_start
+            block = self._cached_block
+            if block is None or not block_start <= slot < block_start + len(block):
+                # An isolated read renders its frame only
+                sequential = self._last_slot is not None and slot == self._last_slot + 1
+                block_stop = (
+                    min(slot + self._stride, self.renderer.period)
+                    if sequential
+                    else slot + 1
+                )
+                block = self.renderer.render_block(slot, block_stop)
+                block_start = slot
+                self._cached_block = block
+                self._cached_block_start = block_start
+                self._keep_cycle_frames(block_start, block)
+
+            self._last_slot = slot
+            return block[slot - block_start]
+
+    def _render_ahead(
+        self,
+        blocks: "queue.Queue[Any]",
+        stop: threading.Event,
+        frame_start: int,
+        frame_stop: int,
+    ) -> None:
+        """Producer loop rendering blocks of [frame_start, frame_stop) into the queue."""
+        try:
+            for item in self._bulk_renderer.iter_blocks(frame_start, frame_stop):
+                if not self._put_until_stopped(blocks, item, stop):
+                    return
+        except Exception as e:
+            self._put_until_stopped(blocks, e, stop)
+            return
+
+        self._put_until_stopped(blocks, None, stop)
+
+    def _put_until_stopped(
+        self, blocks: "queue.Queue[Any]", item: Any, stop: threading.Event
+    ) -> bool:
+        """Block on a full queue until there is room or the consumer stops."""
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class DerivedSweepSequence(StimulusFrameSequence):
+    """
+    Bar sweep derived from another rendered sweep.
+    Single Responsibility: Serve a sweep direction as a view of a base sweep.
+
+    Opposite directions traverse the same bar positions in reverse order, and
+    perpendicular directions on geometrically symmetric screens are the base
+    frames with rows and columns swapped. Frames are served as time-reversed,
+    transposed or flipped numpy views of the base sequence's pixels, so a set
+    of sweeps renders only the directions that cannot be derived.
+    """
+
+    def __init__(
+        self,
+        base: StimulusFrameSequence,
+        renderer: StimulusRenderer,
+        reverse: bool = False,
+        transpose: bool = False,
+        flip_axes: Tuple[int, ...] = (),
+    ):
+        """Initialize sequence serving renderer's sweep from base frames."""
+        if not isinstance(base, StimulusFrameSequence):
+            raise TypeError("base must be a StimulusFrameSequence instance")
+        if not isinstance(renderer, StimulusRenderer):
+            raise TypeError("renderer must be a StimulusRenderer instance")
+        if base.slot_count != renderer.period:
+            raise ValueError("base sweep cycle does not match the derived sweep")
+
+        oriented_shape = orient_frame(
+            np.empty(base.frame_shape, dtype=np.uint8), transpose, flip_axes
+        ).shape
+        if oriented_shape != renderer.frame_shape:
+            raise ValueError(
+                f"Derived frame shape {oriented_shape} does not match "
+                f"{renderer.frame_shape}"
+            )
+
+        self.base = base
+        self.renderer = renderer
+        self.reverse = reverse
+        self.transpose = transpose
+        self.flip_axes = tuple(flip_axes)
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single derived frame."""
+        return self.renderer.frame_shape
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata of the derived sweep."""
+        return self.renderer.sequence_metadata()
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return self.renderer.frame_count
+
+    @property
+    def slot_count(self) -> int:
+        """One slot per frame of the sweep cycle."""
+        return self.renderer.period
+
+    def frame_slot(self, index: int) -> int:
+        """Frames share the slot of their position within the cycle."""
+        return index % self.renderer.period
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) for all frames."""
+        frame_numbers = np.arange(len(self), dtype=np.int64)
+        return (
+            frame_numbers,
+            self.renderer.timestamps(frame_numbers),
+            frame_numbers % self.renderer.period,
+        )
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """View of the base frame this frame derives from."""
+        return self._derive(self.base.frame_pixels(self._base_slot(index)))
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """Frame numbers equal indices; timestamps follow the frame rate."""
+        return index, index / self.renderer.parameters.fps
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Yield the derived cycle, reading reversed sweeps back to front."""
+        if not self.reverse:
+            for pixels in self.base.iter_slot_pixels():
+                yield self._derive(pixels)
+            return
+
+        for slot in range(self.slot_count):
+            yield self.frame_pixels(slot)
+
+    def _base_slot(self, index: int) -> int:
+        """Base cycle slot holding the pixels of the frame at index."""
+        slot = self.frame_slot(index)
+        if self.reverse:
+            return self.slot_count - 1 - slot
+        return slot
+
+    def _derive(self, pixels: np.ndarray) -> np.ndarray:
+        """Orient base frame pixels into this sweep's frame."""
+        return orient_frame(pixels, self.transpose, self.flip_axes)
+
+
+class RemappedBarSequence(StimulusFrameSequence):
+    """
+    Bar sequence colored from geometry-only masks.
+    Single Responsibility: Serve bar frames by mapping shared masks through colors.
+
+    Bar frames are fully described by which pixels the bar covers. The masks
+    are rendered as packed 1-bit frames by a shared mask sequence, so
+    sequences differing only in colors, contrast or frame format remap the
+    same masks through their color table instead of rasterizing the bar
+    geometry again. Masks are unpacked and colored a block at a time: the
+    cycle in blocks, sequential reads a block ahead, isolated reads their
+    own frame.
+    """
+
+    def __init__(self, masks: StimulusFrameSequence, renderer: StimulusRenderer):
+        """Initialize sequence coloring binary masks with a renderer's colors."""
+        if not isinstance(masks, StimulusFrameSequence):
+            raise TypeError("masks must be a StimulusFrameSequence instance")
+        if not isinstance(renderer, StimulusRenderer):
+            raise TypeError("renderer must be a StimulusRenderer instance")
+        if not renderer.is_bar_stimulus:
+            raise ValueError("Mask remapping supports bar stimuli only")
+        if masks.frame_format is not FrameFormat.BINARY:
+            raise ValueError("masks must be stored in the binary frame format")
+        if len(masks) != renderer.frame_count or masks.slot_count != renderer.period:
+            raise ValueError("masks do not match the renderer's frames")
+        if masks.frame_shape != frame_shape_for(
+            FrameFormat.BINARY, *renderer.screen_shape
+        ):
+            raise ValueError("masks do not match the renderer's screen")
+
+        self.masks = masks
+        self.renderer = renderer
+
+        # Most recently colored frames and last slot read, for random access
+        self._cached_block_start = -1
+        self._cached_block: Optional[np.ndarray] = None
+        self._last_slot: Optional[int] = None
+        self._cache_lock = threading.Lock()
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single colored frame."""
+        return self.renderer.frame_shape
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata of the colored sequence."""
+        return self.renderer.sequence_metadata()
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return self.renderer.frame_count
+
+    @property
+    def slot_count(self) -> int:
+        """One slot per frame of the stimulus cycle."""
+        return self.renderer.period
+
+    def frame_slot(self, index: int) -> int:
+        """Frames share the slot of their position within the cycle."""
+        return index % self.renderer.period
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) for all frames."""
+        return self.masks.index_columns()
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """Frame colored from the mask of its cycle slot."""
+        slot = self.frame_slot(index)
+        with self._cache_lock:
+            block_start = self._cached_block_start
+            block = self._cached_block
+            if block is None or not block_start <= slot < block_start + len(block):
+                # An isolated read colors its frame only
+                sequential = self._last_slot is not None and slot == self._last_slot + 1
+                block_stop = (
+                    min(slot + self.renderer.block_size, self.slot_count)
+                    if sequential
+                    else slot + 1
+                )
+                block = self.renderer.remap_masks(
+                    np.stack(
+                        [self.masks.frame_pixels(s) for s in range(slot, block_stop)]
+                    )
+                )
+                block_start = slot
+                self._cached_block = block
+                self._cached_block_start = block_start
+
+            self._last_slot = slot
+            return block[slot - block_start]
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """Frame numbers equal indices; timestamps follow the frame rate."""
+        return index, index / self.renderer.parameters.fps
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Yield the colored cycle, coloring the masks a block at a time."""
+        block_size = self.renderer.block_size
+        masks = np.empty((block_size,) + self.masks.frame_shape, dtype=np.uint8)
+        count = 0
+        for mask in self.masks.iter_slot_pixels():
+            masks[count] = mask
+            count += 1
+            if count == block_size:
+                yield from self.renderer.remap_masks(masks)
+                # Binary frames are the masks themselves, so never refill them
+                masks = np.empty_like(masks)
+                count = 0
+
+        if count:
+            yield from self.renderer.remap_masks(masks[:count])
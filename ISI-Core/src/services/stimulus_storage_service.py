@@ -0,0 +1,561 @@
+# ISI-Core/src/services/stimulus_storage_service.py
+
+"""
+Single-file stimulus sequence storage.
+Stores a sequence as one fixed-stride frame blob with a compact header and
+frame index, and reopens it as a memory-mapped, zero-copy frame sequence.
+"""
+
+import os
+import json
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from ..interfaces.experiment_interfaces import FrameFormat, StimulusFrame
+from .stimulus_service import StimulusFrameSequence, StimulusStream, frame_shape_for
+from .stimulus_codec_service import (
+    DEFAULT_KEYFRAME_INTERVAL,
+    DELTA_CODEC,
+    DELTA_SLOT_DTYPE,
+    RAW_CODEC,
+    DeltaFrameCodec,
+)
+
+# File extension of stimulus sequence containers
+STIMULUS_SEQUENCE_SUFFIX = ".isistim"
+
+# Container format identification; version 1 containers are raw-only
+CONTAINER_MAGIC = b"ISISTIM\0"
+CONTAINER_VERSION = 2
+SUPPORTED_CONTAINER_VERSIONS = (1, 2)
+
+# Fixed preamble: magic, version, header length, frame count, slot count,
+# frame stride, index offset, data offset
+PREAMBLE = struct.Struct("<8sIIQQQQQ")
+
+# Frame index record: frame number, timestamp and blob slot per frame
+INDEX_DTYPE = np.dtype([("frame_number", "<i8"), ("timestamp", "<f8"), ("slot", "<i8")])
+
+# Alignment of the index and the frame blob inside the file
+INDEX_ALIGNMENT = 64
+DATA_ALIGNMENT = 4096
+
+
+def _align(offset: int, alignment: int) -> int:
+    """Round offset up to the next multiple of alignment."""
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _read_container(path: Path) -> Tuple[Dict[str, int], Dict[str, Any]]:
+    """Read and validate the preamble fields and JSON header of a container."""
+    if not path.exists():
+        raise FileNotFoundError(f"Stimulus sequence not found: {path}")
+
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            raise ValueError(f"Truncated stimulus sequence: {path}")
+
+        (
+            magic,
+            version,
+            header_length,
+            frame_count,
+            slot_count,
+            frame_nbytes,
+            index_offset,
+            data_offset,
+        ) = PREAMBLE.unpack(preamble)
+
+        if magic != CONTAINER_MAGIC:
+            raise ValueError(f"Not a stimulus sequence container: {path}")
+        if version not in SUPPORTED_CONTAINER_VERSIONS:
+            raise ValueError(f"Unsupported container version: {version}")
+
+        header: Dict[str, Any] = json.loads(f.read(header_length))
+
+    if int(np.prod(header["frame_shape"])) != frame_nbytes:
+        raise ValueError("Frame shape does not match frame stride")
+
+    fields = {
+        "frame_count": frame_count,
+        "slot_count": slot_count,
+        "frame_nbytes": frame_nbytes,
+        "index_offset": index_offset,
+        "data_offset": data_offset,
+    }
+    return fields, header
+
+
+def _container_codec(header: Dict[str, Any]) -> Dict[str, Any]:
+    """Codec description of a container header; raw when absent."""
+    return header.get("codec", {"name": RAW_CODEC})
+
+
+def _check_cancelled(cancel: Optional[threading.Event]) -> None:
+    """Abort a save whose cancel event has been set."""
+    if cancel is not None and cancel.is_set():
+        raise RuntimeError("Stimulus sequence save cancelled")
+
+
+class MappedStimulusSequence(StimulusFrameSequence):
+    """
+    Memory-mapped stimulus sequence.
+    Single Responsibility: Serve frames of a stored sequence without copying.
+
+    Opening only reads the header and index; frame pixels are paged in by
+    the operating system when a frame view is first touched.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Open a raw stimulus sequence container."""
+        self.path = Path(path)
+        fields, self.header = _read_container(self.path)
+        if _container_codec(self.header)["name"] != RAW_CODEC:
+            raise ValueError(
+                f"Container holds encoded frames, open it with "
+                f"StimulusSequenceStore.open: {self.path}"
+            )
+
+        self._frame_shape = tuple(self.header["frame_shape"])
+        self._index = np.memmap(
+            self.path,
+            dtype=INDEX_DTYPE,
+            mode="r",
+            offset=fields["index_offset"],
+            shape=(fields["frame_count"],),
+        )
+        self._frames = np.memmap(
+            self.path,
+            dtype=np.uint8,
+            mode="r",
+            offset=fields["data_offset"],
+            shape=(fields["slot_count"],) + self._frame_shape,
+        )
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single stored frame."""
+        return self._frame_shape
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame of the sequence."""
+        return self.header["metadata"]
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        """Frame numbers of all frames (memory-mapped column)."""
+        return self._index["frame_number"]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Timestamps of all frames (memory-mapped column)."""
+        return self._index["timestamp"]
+
+    @property
+    def slot_count(self) -> int:
+        """Number of distinct frames stored in the blob."""
+        return len(self._frames)
+
+    def frame_slot(self, index: int) -> int:
+        """Blob slot of the frame at index."""
+        return int(self._index["slot"][index])
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) straight from the index."""
+        return (
+            np.asarray(self._index["frame_number"]),
+            np.asarray(self._index["timestamp"]),
+            np.asarray(self._index["slot"]),
+        )
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Yield zero-copy views of the stored distinct frames."""
+        for slot in range(self.slot_count):
+            yield self._frames[slot]
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return len(self._index)
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """Zero-copy view of the frame at index."""
+        return self._frames[self._index["slot"][index]]
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """(frame_number, timestamp) of the frame at index."""
+        record = self._index[index]
+        return int(record["frame_number"]), float(record["timestamp"])
+
+
+class DeltaStimulusSequence(StimulusFrameSequence):
+    """
+    Delta-encoded stimulus sequence.
+    Single Responsibility: Serve frames of a keyframe + delta encoded container.
+
+    Opening maps the frame index, the per-slot payload table and the
+    payloads. A frame decodes from the nearest keyframe at or before its
+    slot, continuing from the last decoded slot when that is closer, so
+    sequential playback applies one delta per frame.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Open a delta-encoded stimulus sequence container."""
+        self.path = Path(path)
+        fields, self.header = _read_container(self.path)
+        codec = _container_codec(self.header)
+        if codec["name"] != DELTA_CODEC:
+            raise ValueError(f"Container is not delta encoded: {self.path}")
+
+        self._frame_shape = tuple(self.header["frame_shape"])
+        self.codec = DeltaFrameCodec(
+            tuple(codec["frame_shape"]), codec["keyframe_interval"]
+        )
+
+        slot_count = fields["slot_count"]
+        self._index = np.memmap(
+            self.path,
+            dtype=INDEX_DTYPE,
+            mode="r",
+            offset=fields["index_offset"],
+            shape=(fields["frame_count"],),
+        )
+        self._slots = np.memmap(
+            self.path,
+            dtype=DELTA_SLOT_DTYPE,
+            mode="r",
+            offset=fields["data_offset"],
+            shape=(slot_count,),
+        )
+        self._payloads = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+        # Most recently decoded slot, the starting point of the next decode
+        self._decoded_slot = -1
+        self._decoded: Optional[np.ndarray] = None
+        self._decode_lock = threading.Lock()
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Shape of a single decoded frame."""
+        return self._frame_shape
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata shared by every frame of the sequence."""
+        return self.header["metadata"]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of encoded frame payloads."""
+        return int(self._slots["length"].sum())
+
+    @property
+    def slot_count(self) -> int:
+        """Number of distinct encoded frames."""
+        return len(self._slots)
+
+    def frame_slot(self, index: int) -> int:
+        """Encoded slot of the frame at index."""
+        return int(self._index["slot"][index])
+
+    def index_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columnar (frame_numbers, timestamps, slots) straight from the index."""
+        return (
+            np.asarray(self._index["frame_number"]),
+            np.asarray(self._index["timestamp"]),
+            np.asarray(self._index["slot"]),
+        )
+
+    def __len__(self) -> int:
+        """Total number of frames in the sequence."""
+        return len(self._index)
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """Decoded pixels of the frame at index."""
+        return self.slot_pixels(self.frame_slot(index))
+
+    def slot_pixels(self, slot: int) -> np.ndarray:
+        """Decode a slot into a new read-only frame."""
+        if not 0 <= slot < self.slot_count:
+            raise IndexError(f"Slot {slot} out of range for {self.slot_count} slots")
+
+        with self._decode_lock:
+            keyframe = self.codec.keyframe_for(slot)
+            if not keyframe <= self._decoded_slot <= slot:
+                self._decoded = self.codec.decode_keyframe(self._payload(keyframe))
+                self._decoded_slot = keyframe
+
+            for delta_slot in range(self._decoded_slot + 1, slot + 1):
+                self.codec.apply_delta(self._decoded, self._payload(delta_slot))
+            self._decoded_slot = slot
+
+            pixels = self._decoded.reshape(self._frame_shape).copy()
+
+        pixels.flags.writeable = False
+        return pixels
+
+    def frame_timing(self, index: int) -> Tuple[int, float]:
+        """(frame_number, timestamp) of the frame at index."""
+        record = self._index[index]
+        return int(record["frame_number"]), float(record["timestamp"])
+
+    def iter_slot_pixels(self) -> Iterator[np.ndarray]:
+        """Decode the distinct frames in order, one delta per frame."""
+        for slot in range(self.slot_count):
+            yield self.slot_pixels(slot)
+
+    def _payload(self, slot: int) -> memoryview:
+        """Encoded payload bytes of a slot."""
+        record = self._slots[slot]
+        start = int(record["offset"])
+        return memoryview(self._payloads[start : start + int(record["length"])])
+
+
+class StimulusSequenceStore:
+    """
+    Stimulus sequence container store.
+    Single Responsibility: Write and open single-file stimulus sequences.
+
+    Layout: fixed preamble, JSON header, frame index (frame number,
+    timestamp, blob slot) and a page-aligned blob of fixed-stride frames.
+    Periodic sequences store one cycle; later frames index its slots. The
+    delta codec replaces the blob with a slot payload table followed by
+    keyframe and row-delta payloads.
+    """
+
+    def sequence_path(self, path: Union[str, Path]) -> Path:
+        """Container path for a requested output or input path."""
+        return Path(path).with_suffix(STIMULUS_SEQUENCE_SUFFIX)
+
+    def save(
+        self,
+        frames: Sequence[StimulusFrame],
+        path: Union[str, Path],
+        cancel: Optional[threading.Event] = None,
+        codec: str = RAW_CODEC,
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+    ) -> Path:
+        """
+        Write a frame sequence to a single container file.
+
+        codec is "raw" for memory-mappable fixed-stride frames or "delta"
+        for keyframes every keyframe_interval slots plus row deltas. Setting
+        cancel stops the write between frames (or parallel blocks), raising
+        RuntimeError and leaving no partial container behind.
+        """
+        if len(frames) == 0:
+            raise ValueError("frames cannot be empty")
+        if codec not in (RAW_CODEC, DELTA_CODEC):
+            raise ValueError(f"Unsupported stimulus codec: {codec}")
+
+        target = self.sequence_path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        frame_shape, metadata = self._describe(frames)
+        frame_nbytes = int(np.prod(frame_shape))
+        frame_count = len(frames)
+
+        index = np.zeros(frame_count, dtype=INDEX_DTYPE)
+        slot_count = self._fill_index(frames, index)
+
+        header = {
+            "frame_shape": list(frame_shape),
+            "dtype": "uint8",
+            "metadata": metadata,
+            "created_at": datetime.now().isoformat(),
+        }
+        delta_codec = None
+        if codec == DELTA_CODEC:
+            delta_codec = DeltaFrameCodec(
+                self._codec_shape(frame_shape, metadata), keyframe_interval
+            )
+            header["codec"] = {
+                "name": DELTA_CODEC,
+                "frame_shape": list(delta_codec.frame_shape),
+                "keyframe_interval": keyframe_interval,
+            }
+        header_bytes = json.dumps(header).encode("utf-8")
+        index_offset = _align(PREAMBLE.size + len(header_bytes), INDEX_ALIGNMENT)
+        data_offset = _align(
+            index_offset + frame_count * INDEX_DTYPE.itemsize, DATA_ALIGNMENT
+        )
+
+        # Private to this writer, so concurrent saves of one target never
+        # write into each other's partial file before the rename
+        temporary = target.with_name(
+            f"{target.name}.{os.getpid()}-{threading.get_ident()}.tmp"
+        )
+
+        try:
+            with open(temporary, "wb") as f:
+                f.write(
+                    PREAMBLE.pack(
+                        CONTAINER_MAGIC,
+                        CONTAINER_VERSION,
+                        len(header_bytes),
+                        frame_count,
+                        slot_count,
+                        frame_nbytes,
+                        index_offset,
+                        data_offset,
+                    )
+                )
+                f.write(header_bytes)
+                f.seek(index_offset)
+                f.write(index.tobytes())
+
+                if delta_codec is not None:
+                    self._write_encoded_slots(
+                        f, frames, data_offset, slot_count, delta_codec, cancel
+                    )
+                elif self._renders_in_parallel(frames):
+                    # Workers render straight into the preallocated blob
+                    f.truncate(data_offset + slot_count * frame_nbytes)
+                else:
+                    self._write_slots(
+                        f, frames, data_offset, slot_count, frame_nbytes, cancel
+                    )
+
+            if delta_codec is None and self._renders_in_parallel(frames):
+                parallel = frames.parallel
+                for start in range(0, slot_count, parallel.block_size):
+                    _check_cancelled(cancel)
+                    parallel.render_into_file(
+                        temporary,
+                        data_offset + start * frame_nbytes,
+                        start,
+                        min(start + parallel.block_size, slot_count),
+                    )
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+
+        os.replace(temporary, target)
+        return target
+
+    def open(
+        self, path: Union[str, Path]
+    ) -> Union[MappedStimulusSequence, DeltaStimulusSequence]:
+        """Open a stored sequence as a memory-mapped or delta-decoding sequence."""
+        path = self.sequence_path(path)
+        _, header = _read_container(path)
+        if _container_codec(header)["name"] == DELTA_CODEC:
+            return DeltaStimulusSequence(path)
+        return MappedStimulusSequence(path)
+
+    def _renders_in_parallel(self, frames: Sequence[StimulusFrame]) -> bool:
+        """Whether the blob can be rendered in place by a parallel renderer."""
+        return isinstance(frames, StimulusStream) and frames.parallel is not None
+
+    def _write_slots(
+        self,
+        f: Any,
+        frames: Sequence[StimulusFrame],
+        data_offset: int,
+        slot_count: int,
+        frame_nbytes: int,
+        cancel: Optional[threading.Event] = None,
+    ) -> None:
+        """Write distinct frames into the blob in a single sequential pass."""
+        # Repeating frames only add index entries
+        f.seek(data_offset)
+        written = 0
+        for payload in self._iter_slot_payloads(frames):
+            _check_cancelled(cancel)
+            if len(payload) != frame_nbytes:
+                raise ValueError(
+                    f"Frame slot {written} has {len(payload)} bytes, "
+                    f"expected fixed stride of {frame_nbytes}"
+                )
+            f.write(payload)
+            written += 1
+
+        if written != slot_count:
+            raise ValueError("Sequence length changed while saving")
+
+    def _write_encoded_slots(
+        self,
+        f: Any,
+        frames: Sequence[StimulusFrame],
+        data_offset: int,
+        slot_count: int,
+        delta_codec: DeltaFrameCodec,
+        cancel: Optional[threading.Event] = None,
+    ) -> None:
+        """Write the slot payload table and the encoded payloads after it."""
+        slots = np.zeros(slot_count, dtype=DELTA_SLOT_DTYPE)
+        payload_offset = data_offset + slots.nbytes
+
+        f.seek(payload_offset)
+        written = 0
+        pixels = (
+            np.frombuffer(payload, dtype=np.uint8)
+            for payload in self._iter_slot_payloads(frames)
+        )
+        for payload in delta_codec.encode(pixels):
+            _check_cancelled(cancel)
+            if written == slot_count:
+                raise ValueError("Sequence length changed while saving")
+            slots[written] = (payload_offset, len(payload))
+            f.write(payload)
+            payload_offset += len(payload)
+            written += 1
+
+        if written != slot_count:
+            raise ValueError("Sequence length changed while saving")
+
+        f.seek(data_offset)
+        f.write(slots.tobytes())
+
+    def _codec_shape(
+        self, frame_shape: Tuple[int, ...], metadata: Dict[str, Any]
+    ) -> Tuple[int, ...]:
+        """Row-structured frame shape for the delta codec."""
+        if len(frame_shape) > 1 or "frame_size" not in metadata:
+            return frame_shape
+
+        # StimulusFrame lists store flat frame_data; recover rows from metadata
+        shape = frame_shape_for(
+            metadata.get("frame_format", FrameFormat.RGB), *metadata["frame_size"]
+        )
+        if int(np.prod(shape)) != int(np.prod(frame_shape)):
+            return frame_shape
+        return shape
+
+    def _describe(
+        self, frames: Sequence[StimulusFrame]
+    ) -> Tuple[Tuple[int, ...], Dict[str, Any]]:
+        """Frame shape and shared metadata of a sequence."""
+        if isinstance(frames, StimulusFrameSequence):
+            return tuple(frames.frame_shape), dict(frames.metadata)
+
+        first = frames[0]
+        return (len(first.frame_data),), dict(first.metadata)
+
+    def _fill_index(self, frames: Sequence[StimulusFrame], index: np.ndarray) -> int:
+        """Fill the frame index and return the number of distinct frame slots."""
+        if isinstance(frames, StimulusFrameSequence):
+            frame_numbers, timestamps, slots = frames.index_columns()
+            index["frame_number"] = frame_numbers
+            index["timestamp"] = timestamps
+            index["slot"] = slots
+            return frames.slot_count
+
+        for position, frame in enumerate(frames):
+            index[position] = (frame.frame_number, frame.timestamp, position)
+        return len(frames)
+
+    def _iter_slot_payloads(self, frames: Sequence[StimulusFrame]) -> Iterator[Any]:
+        """Yield the bytes-like payload of each distinct frame slot in order."""
+        if isinstance(frames, StimulusFrameSequence):
+            for pixels in frames.iter_slot_pixels():
+                yield memoryview(np.ascontiguousarray(pixels)).cast("B")
+            return
+
+        for frame in frames:
+            yield frame.frame_data
@@ -0,0 +1,1021 @@
+# ISI-Core/tests/test_acquisition_pipeline.py
+
+"""
+Test script for the camera acquisition pipeline.
+Verifies frame buffering between the capture thread and its consumers.
+"""
+
+import json
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from ..src.services.camera_buffer_service import (
+    CameraFrameBatch,
+    CameraFrameRing,
+)
+from ..src.services.acquisition_writer_service import (
+    RAW_FRAMES_FILE,
+    RAW_HEADER_FILE,
+    RAW_TIMING_FILE,
+    BatchedFrameWriter,
+    RawStackSink,
+)
+from ..src.services.camera_stack_service import (
+    ChunkedStackSink,
+    CameraStackReader,
+    shuffle_bytes,
+)
+from ..src.services.frame_scheduler_service import FrameScheduler
+from ..src.services.camera_backend_service import ReplayCamera, SimulatedCamera
+from ..src.services.camera_preview_service import (
+    NO_FRAME,
+    PREVIEW_DECIMATE,
+    CameraPreviewChannel,
+)
+from ..src.services.experiment_service import AcquisitionController
+from ..src.interfaces.experiment_interfaces import (
+    AcquisitionParameters,
+    LateFramePolicy,
+    StimulusFrame,
+)
+
+
+def _make_acquisition_parameters(output_directory: str, **overrides):
+    """Create small, fast acquisition parameters.
+
+    Late frames are caught up rather than skipped, so a busy host slows a
+    test down instead of changing how many frames it captures.
+    """
+    values = dict(
+        camera_resolution=(64, 48),
+        camera_fps=60,
+        buffer_size=32,
+        late_frame_policy=LateFramePolicy.CATCH_UP,
+        output_directory=output_directory,
+    )
+    values.update(overrides)
+    return AcquisitionParameters(**values)
+
+
+def _make_stimulus_frames(count: int):
+    """Create placeholder stimulus frames driving acquisition length."""
+    return [
+        StimulusFrame(frame_number=i, timestamp=i / 60, frame_data=b"")
+        for i in range(count)
+    ]
+
+
+def _publish(ring: CameraFrameRing, frame_number: int) -> None:
+    """Publish a frame whose pixels all equal its frame number."""
+    ring.claim().fill(frame_number)
+    ring.publish(frame_number, frame_number / 60, frame_number / 60)
+
+
+def test_ring_buffer_consumers_and_overruns():
+    """Consumers read in order independently; slow consumers count overruns."""
+    print("Testing camera frame ring...")
+
+    ring = CameraFrameRing(8, (4, 6))
+    fast = ring.reader("writer")
+    slow = ring.reader("analysis")
+    batch = CameraFrameBatch(5, ring.frame_shape)
+
+    for frame_number in range(6):
+        _publish(ring, frame_number)
+
+    # A claim marks the next slot as being overwritten until it is published
+    claiming = CameraFrameRing(2, (4, 6))
+    claiming.claim()
+    assert claiming.claimed == 1 and claiming.published == 0
+    claiming.publish(0, 0.0, 0.0)
+    assert claiming.claimed == claiming.published == 1
+
+    # Reads are ordered and bounded by the batch
+    assert fast.read_into(batch) == 5
+    assert list(batch.frame_numbers[:5]) == [0, 1, 2, 3, 4]
+    assert (batch.frames[:5] == np.arange(5)[:, None, None]).all()
+    assert fast.read_into(batch) == 1 and batch.frame_numbers[0] == 5
+    assert fast.read_into(batch) == 0
+
+    # The slow consumer is lapped and resumes at the oldest intact frame
+    for frame_number in range(6, 20):
+        _publish(ring, frame_number)
+    assert slow.read_into(batch) == 5
+    assert slow.overruns == 20 - 8
+    assert list(batch.frame_numbers[:5]) == [12, 13, 14, 15, 16]
+    assert batch.first_sequence == 12
+    assert fast.read_into(batch) == 5 and fast.overruns == 12 - 6
+
+    # Preview copies the newest frame without consuming anything
+    latest = np.empty(ring.frame_shape, dtype=ring.dtype)
+    assert ring.latest_into(latest) == 19
+    assert (latest == 19).all()
+
+    stats = ring.statistics()
+    assert stats["frames_published"] == 20
+    assert stats["readers"]["analysis"]["frames_read"] == 5
+    assert stats["readers"]["analysis"]["lag"] == 3
+
+    try:
+        ring.reader("writer")
+        raise AssertionError("Duplicate reader name should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected duplicate reader: {e}")
+
+    print("✓ Consumers read independently and count overruns")
+
+
+def test_ring_buffer_producer_does_not_allocate():
+    """Capturing into the ring allocates no frame memory."""
+    print("Testing allocation-free capture...")
+
+    ring = CameraFrameRing(16, (480, 640))
+    ring.reader("writer")
+
+    tracemalloc.start()
+    try:
+        for frame_number in range(500):
+            _publish(ring, frame_number)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    frame_bytes = 480 * 640 * ring.dtype.itemsize
+    assert peak < frame_bytes // 10, peak
+    print(f"✓ 500 frames captured with {peak} bytes peak allocation")
+
+
+def test_ring_buffer_concurrent_reader_never_sees_torn_frames():
+    """A reader racing the producer only returns intact frames."""
+    print("Testing concurrent ring reads...")
+
+    ring = CameraFrameRing(4, (64, 64))
+    reader = ring.reader("analysis")
+    batch = CameraFrameBatch(3, ring.frame_shape)
+    total = 3000
+    seen = []
+
+    def produce():
+        for frame_number in range(total):
+            _publish(ring, frame_number)
+            time.sleep(0)  # let the reader interleave with capture
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while producer.is_alive() or reader.lag:
+        for index in range(reader.read_into(batch)):
+            frame_number = batch.frame_numbers[index]
+            assert (batch.frames[index] == frame_number % 65536).all()
+            seen.append(int(frame_number))
+    producer.join()
+
+    assert seen == sorted(seen)
+    assert len(seen) + reader.overruns == total
+    print(f"✓ Read {len(seen)} intact frames, {reader.overruns} overruns")
+
+
+def test_acquisition_fills_ring_buffer():
+    """Acquisition captures into the ring sized from buffer_size."""
+    print("Testing acquisition ring buffer...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = AcquisitionController()
+        parameters = _make_acquisition_parameters(temp_dir)
+        assert controller.initialize_acquisition(parameters).success
+
+        ring = controller.frame_ring
+        assert ring.capacity == 32 and ring.frame_shape == (48, 64)
+
+        # No frame captured yet: the preview is a blank frame
+        preview = controller.get_camera_preview()
+        assert preview.success and preview.metadata["frame_sequence"] is None
+        assert len(preview.data) == 48 * 64 * 2
+
+        result = controller.start_acquisition(_make_stimulus_frames(20))
+        assert result.success, result.error_message
+        controller._acquisition_thread.join(timeout=10)
+
+        status = controller.get_acquisition_status().data
+        assert status["buffer"]["frames_published"] == 20
+        assert controller.get_camera_preview().metadata["frame_sequence"] == 19
+
+    print("✓ Acquisition captured 20 frames into the ring")
+
+
+def test_ring_buffer_capacity_within_byte_budget():
+    """The ring holds buffer_size frames unless the byte budget caps it."""
+    print("Testing ring buffer byte budget...")
+
+    frame_bytes = 64 * 48 * 2
+    parameters = _make_acquisition_parameters("unused")
+    assert CameraFrameRing.for_parameters(parameters).capacity == 32
+
+    parameters = _make_acquisition_parameters(
+        "unused", buffer_max_bytes=10 * frame_bytes + 1
+    )
+    ring = CameraFrameRing.for_parameters(parameters)
+    assert ring.capacity == 10 and ring.frames.nbytes == 10 * frame_bytes
+    assert not ring.frames.any()
+
+    parameters = _make_acquisition_parameters(
+        "unused", buffer_max_bytes=frame_bytes - 1
+    )
+    try:
+        CameraFrameRing.for_parameters(parameters)
+        assert False, "a budget below one frame should be rejected"
+    except ValueError:
+        pass
+
+    print("✓ Ring capacity capped at 10 frames by the byte budget")
+
+
+def _load_raw_stack(directory: Path):
+    """Read a raw camera stack back as (frames, timing)."""
+    header = json.loads((directory / RAW_HEADER_FILE).read_text())
+    frames = np.fromfile(directory / RAW_FRAMES_FILE, dtype=header["dtype"])
+    frames = frames.reshape([header["frame_count"]] + header["frame_shape"])
+    return frames, np.load(directory / RAW_TIMING_FILE)
+
+
+class _SlowSink(RawStackSink):
+    """Raw sink that simulates a disk slower than the camera."""
+
+    def write_batch(self, frame_offset, batch):
+        time.sleep(0.02)
+        return super().write_batch(frame_offset, batch)
+
+
+def test_batched_writer_writes_every_frame_in_order():
+    """The writer drains the ring in batches and writes frames in order."""
+    print("Testing batched frame writer...")
+
+    ring = CameraFrameRing(64, (24, 32))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        writer = BatchedFrameWriter(
+            ring, RawStackSink(temp_dir, ring), batch_frames=4, workers=3
+        )
+        writer.start()
+        for frame_number in range(50):
+            _publish(ring, frame_number)
+            if frame_number % 10 == 0:
+                time.sleep(0.005)
+        stats = writer.stop(timeout=10)
+
+        frames, timing = _load_raw_stack(Path(temp_dir))
+        assert len(frames) == 50
+        assert (frames == np.arange(50)[:, None, None]).all()
+        assert list(timing["frame_number"]) == list(range(50))
+        assert np.allclose(timing["camera_timestamp"], np.arange(50) / 60)
+
+    assert stats["frames_written"] == 50 and stats["dropped_frames"] == 0
+    assert stats["batches_written"] >= 50 // 4
+    assert stats["bytes_written"] == frames.nbytes
+    assert stats["queue_depth"] == 0
+    assert 1 <= stats["max_queue_depth"] <= stats["queue_capacity"]
+    assert stats["mean_write_latency_ms"] > 0
+    print(f"✓ Wrote 50 frames in {stats['batches_written']} batches")
+
+
+def test_slow_disk_reports_backpressure_without_stalling_capture():
+    """A slow sink shows up as stalls and dropped frames; capture never waits."""
+    print("Testing writer backpressure...")
+
+    ring = CameraFrameRing(8, (24, 32))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        writer = BatchedFrameWriter(
+            ring, _SlowSink(temp_dir, ring), batch_frames=4, pending_batches=2
+        )
+        writer.start()
+
+        capture_start = time.perf_counter()
+        for frame_number in range(200):
+            _publish(ring, frame_number)
+            if frame_number % 20 == 0:
+                time.sleep(0.001)
+        capture_seconds = time.perf_counter() - capture_start
+
+        stats = writer.stop(timeout=30)
+        frames, timing = _load_raw_stack(Path(temp_dir))
+
+    # Lost frames are accounted for, and what was written is intact
+    assert stats["dropped_frames"] > 0
+    assert stats["frames_written"] + stats["dropped_frames"] == 200
+    assert stats["drain_stalls"] > 0
+    assert (frames == timing["frame_number"][:, None, None]).all()
+    assert capture_seconds < 1.0
+    print(
+        f"✓ Slow disk: {stats['dropped_frames']} dropped, "
+        f"{stats['drain_stalls']} drain stalls"
+    )
+
+
+class _FailingStackSink(ChunkedStackSink):
+    """Chunked sink whose disk fails from a given frame on."""
+
+    def __init__(self, *args, fail_from: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_from = fail_from
+
+    def write_batch(self, frame_offset, batch):
+        if frame_offset >= self.fail_from:
+            raise OSError("disk full")
+        return super().write_batch(frame_offset, batch)
+
+
+class _SlowStackSink(ChunkedStackSink):
+    """Chunked sink that simulates a disk slower than the camera."""
+
+    def write_batch(self, frame_offset, batch):
+        time.sleep(0.01)
+        return super().write_batch(frame_offset, batch)
+
+
+def test_writer_failures_still_close_a_readable_stack():
+    """Failed writes and drain errors are reported; written frames stay readable."""
+    print("Testing writer failure handling...")
+
+    ring = CameraFrameRing(64, (24, 32))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "failed.isicam"
+        sink = _FailingStackSink(path, ring.frame_shape, chunk_frames=4, fail_from=16)
+        writer = BatchedFrameWriter(ring, sink, batch_frames=4, workers=1)
+        writer.start()
+        for frame_number in range(40):
+            _publish(ring, frame_number)
+        try:
+            writer.stop(timeout=10)
+            raise AssertionError("A failed write should be reported")
+        except RuntimeError as e:
+            print(f"✓ Correctly reported write failure: {e}")
+
+        stack = CameraStackReader(path)
+        assert len(stack) == 16
+        assert (stack.read() == np.arange(16)[:, None, None]).all()
+
+        # An error in the drain thread itself fails stop() too
+        sink = ChunkedStackSink(Path(temp_dir) / "drain.isicam", ring.frame_shape)
+        writer = BatchedFrameWriter(ring, sink)
+        writer.start()
+
+        def broken_read(batch, append=False):
+            raise ValueError("ring reader failed")
+
+        writer._reader.read_into = broken_read
+        _publish(ring, 40)
+        try:
+            writer.stop(timeout=10)
+            raise AssertionError("A drain error should be reported")
+        except RuntimeError as e:
+            assert "ring reader failed" in str(e)
+            print(f"✓ Correctly reported drain failure: {e}")
+        assert len(CameraStackReader(Path(temp_dir) / "drain.isicam")) == 0
+
+    print("✓ Failed writers close the frames written before the failure")
+
+
+def test_stopping_with_overruns_keeps_batches_aligned():
+    """Stopping a lagging writer leaves only the final batch partial."""
+    print("Testing writer stop with overruns...")
+
+    ring = CameraFrameRing(6, (24, 32))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "overrun.isicam"
+        sink = _SlowStackSink(path, ring.frame_shape, chunk_frames=4)
+        writer = BatchedFrameWriter(ring, sink, batch_frames=4, pending_batches=2)
+        writer.start()
+        for frame_number in range(203):
+            _publish(ring, frame_number)
+            if frame_number % 10 == 0:
+                time.sleep(0.001)
+        stats = writer.stop(timeout=30)
+
+        stack = CameraStackReader(path)
+        assert len(stack) == stats["frames_written"]
+        assert stats["frames_written"] + stats["dropped_frames"] == 203
+        assert (stack.read() == stack.frame_numbers[:, None, None]).all()
+
+        # A read during stop that only finds torn frames must not end the stack
+        path = Path(temp_dir) / "torn.isicam"
+        ring = CameraFrameRing(16, (24, 32))
+        writer = BatchedFrameWriter(
+            ring, ChunkedStackSink(path, ring.frame_shape, chunk_frames=4), 4
+        )
+        writer.start()
+        reader = writer._reader
+        read_into = reader.read_into
+        torn = []
+
+        def read_after_stop(batch, append=False):
+            writer._stopping.wait()
+            if reader.position == 4 and not torn:
+                # Two frames overwritten while copying: skipped, nothing read
+                torn.append(True)
+                reader.position += 2
+                reader.overruns += 2
+                return 0
+            return read_into(batch, append)
+
+        reader.read_into = read_after_stop
+        for frame_number in range(10):
+            _publish(ring, frame_number)
+        torn_stats = writer.stop(timeout=10)
+
+        stack = CameraStackReader(path)
+        assert torn and len(stack) == torn_stats["frames_written"] == 8
+        assert list(stack.frame_numbers) == [0, 1, 2, 3, 6, 7, 8, 9]
+
+    print(f"✓ {stats['frames_written']} frames readable after stopping with overruns")
+
+
+def test_acquisition_streams_frames_to_disk():
+    """Acquisition writes its frames and save_acquisition_data records them."""
+    print("Testing acquisition frame saving...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = AcquisitionController()
+        parameters = _make_acquisition_parameters(temp_dir)
+        assert controller.initialize_acquisition(parameters).success
+
+        acquisition_id = controller.start_acquisition(_make_stimulus_frames(20)).data
+        controller._acquisition_thread.join(timeout=10)
+        assert controller.get_acquisition_status().data["writer"] is not None
+
+        record_path = Path(temp_dir) / "acquisition.json"
+        result = controller.save_acquisition_data(str(record_path))
+        assert result.success, result.error_message
+        assert result.metadata["frames_written"] == 20
+
+        record = json.loads(record_path.read_text())
+        assert record["acquisition_id"] == acquisition_id
+        assert record["frames_captured"] == 20
+        stack = CameraStackReader(record["camera_stack"])
+        assert stack.read().shape == (20, 48, 64)
+        assert list(stack.frame_numbers) == list(range(20))
+        assert stack.metadata["acquisition_id"] == acquisition_id
+
+    print("✓ Acquisition frames streamed to disk")
+
+
+def test_stopping_a_finished_acquisition_closes_its_stack():
+    """stop_acquisition closes the writer of a run that ended on its own."""
+    print("Testing stop after a finished acquisition...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = AcquisitionController()
+        parameters = _make_acquisition_parameters(temp_dir)
+        assert controller.initialize_acquisition(parameters).success
+
+        assert controller.start_acquisition(_make_stimulus_frames(20)).success
+        controller._acquisition_thread.join(timeout=10)
+        assert not controller.get_acquisition_status().data["active"]
+        writer = controller._frame_writer
+        assert writer is not None
+
+        assert controller.stop_acquisition().success
+        assert controller._frame_writer is None
+        assert not writer._drain_thread.is_alive()
+        status = controller.get_acquisition_status().data
+        assert status["writer"]["frames_written"] == 20
+
+        stack = CameraStackReader(controller._camera_stack_path())
+        assert len(stack) == 20
+        assert list(stack.frame_numbers) == list(range(20))
+
+    print("✓ Finished acquisition's stack closed by stop_acquisition")
+
+
+def _make_camera_frames(count: int, shape, seed: int = 0):
+    """Smooth 12-bit frames with sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    rows, columns = np.mgrid[0 : shape[0], 0 : shape[1]]
+    base = 2000 + 800 * np.sin(rows / 9.0) * np.cos(columns / 13.0)
+    frames = np.empty((count,) + tuple(shape), dtype=np.uint16)
+    for index in range(count):
+        noisy = base + 40 * np.sin(index / 5.0) + rng.normal(0, 8, shape)
+        frames[index] = np.clip(noisy, 0, 4095)
+    return frames
+
+
+def test_camera_stack_reads_windows_and_regions():
+    """Chunked stacks round-trip losslessly and read windows and ROIs."""
+    print("Testing chunked camera stack...")
+
+    shape = (70, 90)
+    frames = _make_camera_frames(29, shape)
+    ring = CameraFrameRing(64, shape)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "stack.isicam"
+        sink = ChunkedStackSink(
+            path, shape, chunk_frames=4, tile_shape=(32, 32), metadata={"run": 1}
+        )
+        writer = BatchedFrameWriter(ring, sink, batch_frames=8, workers=2)
+        writer.start()
+        for frame_number, frame in enumerate(frames):
+            ring.claim()[:] = frame
+            ring.publish(frame_number, frame_number / 60, frame_number / 50)
+        stats = writer.stop(timeout=10)
+
+        stack = CameraStackReader(path)
+        assert len(stack) == 29 and stack.frame_shape == shape
+        assert stack.tile_grid == (3, 3) and stack.metadata == {"run": 1}
+
+        # Lossless, including the partial last chunk and edge tiles
+        assert np.array_equal(stack.read(), frames)
+        assert np.array_equal(stack.read_frame(28), frames[28])
+
+        # A window and region spanning chunk and tile boundaries
+        roi = (slice(30, 66), slice(5, 40))
+        assert np.array_equal(stack.read(3, 13, roi), frames[3:13, 30:66, 5:40])
+        assert stack.read(7, 7).shape == (0, 70, 90)
+
+        # Timing columns live in the same file
+        assert list(stack.frame_numbers) == list(range(29))
+        assert np.allclose(stack.timestamps, np.arange(29) / 60)
+        assert np.allclose(stack.camera_timestamps, np.arange(29) / 50)
+
+        try:
+            stack.read(0, 30)
+            raise AssertionError("Reading past the stack should be rejected")
+        except ValueError as e:
+            print(f"✓ Correctly rejected frame range: {e}")
+
+    # Byte shuffling is what makes 12-bit frames compress
+    ratio = frames.nbytes / stats["bytes_written"]
+    unshuffled = frames.nbytes / len(zlib.compress(frames.tobytes(), 6))
+    shuffled = frames.nbytes / len(zlib.compress(shuffle_bytes(frames), 6))
+    assert shuffled > unshuffled and ratio > 1.3, (ratio, unshuffled, shuffled)
+    print(
+        f"✓ Chunked stack round-trips; compression {ratio:.2f}x "
+        f"(unshuffled {unshuffled:.2f}x)"
+    )
+
+
+class _SimulatedClock:
+    """Nanosecond clock that only advances when slept on or worked against."""
+
+    # Simulated OS sleep overshoot, and the cost of a yield
+    OVERSHOOT_NS = 300_000
+    YIELD_NS = 20_000
+
+    def __init__(self):
+        self.now_ns = 1_000_000_000
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.now_ns += round(seconds * 1e9) + self.OVERSHOOT_NS
+        else:
+            self.now_ns += self.YIELD_NS
+
+
+def test_frame_scheduler_does_not_accumulate_loop_overhead():
+    """Per-frame work shifts no deadline: the grid stays on start + n / fps."""
+    print("Testing deadline frame scheduler...")
+
+    clock = _SimulatedClock()
+    scheduler = FrameScheduler(100, clock=clock, sleep=clock.sleep)
+    scheduler.start()
+    for expected in range(30):
+        assert scheduler.wait_next() == expected
+        # Every wakeup lands on its deadline, within one yield
+        lateness_ns = clock() - scheduler.deadline_ns(expected)
+        assert 0 <= lateness_ns < _SimulatedClock.YIELD_NS, lateness_ns
+        clock.now_ns += 4_000_000  # capture work that sleep(1 / fps) would add
+    elapsed = (clock() - scheduler.start_ns) / 1e9
+
+    # 30 frames at 100 fps end at 0.29 s plus the last frame's work,
+    # not the 0.42 s that per-frame sleeps would take
+    assert abs(elapsed - 0.294) < 0.0001, elapsed
+    stats = scheduler.statistics()
+    assert stats["frames_scheduled"] == 30 and stats["dropped_frames"] == 0
+    assert stats["missed_deadlines"] == 0
+    print(
+        f"✓ 30 frames in {elapsed:.3f} s, "
+        f"mean jitter {stats['mean_jitter_ms']:.3f} ms"
+    )
+
+
+def test_frame_scheduler_late_wakeup_policies():
+    """Late wakeups skip to the due frame or catch up on every overdue one."""
+    print("Testing late frame policies...")
+
+    period_ns = 1_000_000_000 // 50
+    late_start = time.perf_counter_ns() - 10 * period_ns - period_ns // 2
+
+    skipping = FrameScheduler(50, LateFramePolicy.SKIP)
+    skipping.start(late_start)
+    assert skipping.wait_next() == 10
+    assert skipping.wait_next() == 11
+    stats = skipping.statistics()
+    assert stats["dropped_frames"] == 10
+    assert stats["missed_deadlines"] >= 1 and stats["frames_scheduled"] == 2
+
+    catching_up = FrameScheduler(50, LateFramePolicy.CATCH_UP)
+    catching_up.start(late_start)
+    indices = [catching_up.wait_next() for _ in range(12)]
+    assert indices == list(range(12))
+    stats = catching_up.statistics()
+    assert stats["dropped_frames"] == 0 and stats["missed_deadlines"] >= 10
+    assert stats["max_jitter_ms"] > 200
+
+    print("✓ Skip drops overdue frames; catch-up issues them back to back")
+
+
+def test_acquisition_reports_frame_timing():
+    """Acquisition status exposes scheduler jitter and dropped frames."""
+    print("Testing acquisition frame timing...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = AcquisitionController()
+        parameters = _make_acquisition_parameters(
+            temp_dir,
+            save_camera_frames=False,
+            late_frame_policy=LateFramePolicy.SKIP,
+        )
+        assert controller.initialize_acquisition(parameters).success
+        assert controller.start_acquisition(_make_stimulus_frames(30)).success
+        controller._acquisition_thread.join(timeout=10)
+
+        timing = controller.get_acquisition_status().data["timing"]
+        ring = controller.frame_ring
+        assert timing["fps"] == 60 and timing["late_policy"] == "skip"
+        assert timing["frames_scheduled"] + timing["dropped_frames"] == 30
+        assert ring.published == timing["frames_scheduled"]
+
+        # Captured frames follow their stimulus frames in order and end on
+        # the last one; how closely they sit on the 60 Hz grid depends on
+        # the host and is only reported
+        count = ring.published
+        assert (np.diff(ring.frame_numbers[:count]) > 0).all()
+        assert (np.diff(ring.timestamps[:count]) > 0).all()
+        assert timing["last_frame_index"] == ring.frame_numbers[count - 1] == 29
+        elapsed = ring.timestamps[:count] - ring.timestamps[0]
+        grid = (ring.frame_numbers[:count] - ring.frame_numbers[0]) / 60
+        grid_error_ms = np.abs(elapsed - grid).mean() * 1000
+
+    print(
+        f"✓ {timing['frames_scheduled']} frames, "
+        f"{timing['missed_deadlines']} missed deadlines, "
+        f"max jitter {timing['max_jitter_ms']:.2f} ms, "
+        f"mean grid error {grid_error_ms:.2f} ms"
+    )
+
+
+def _grab_frames(camera: SimulatedCamera, indices, shape):
+    """Grab and retrieve frames at indices; dropped frames are skipped."""
+    frames = []
+    for frame_index in indices:
+        if camera.grab(frame_index) is not None:
+            frame = np.empty(shape, dtype=np.uint16)
+            camera.retrieve_into(frame)
+            frames.append(frame)
+    return np.array(frames)
+
+
+def test_simulated_camera_is_deterministic():
+    """Same seed, same frames, jitter and drops whatever the capture order."""
+    print("Testing simulated camera determinism...")
+
+    parameters = _make_acquisition_parameters("unused", camera_fps=200)
+    shape = (48, 64)
+
+    cameras = []
+    for _ in range(2):
+        camera = SimulatedCamera(jitter_ms=0.5, drop_probability=0.2, seed=7)
+        assert camera.open(parameters).success
+        cameras.append(camera)
+
+    forward = _grab_frames(cameras[0], range(100), shape)
+    backward = _grab_frames(cameras[1], reversed(range(100)), shape)
+    assert np.array_equal(forward, backward[::-1])
+    assert cameras[0].statistics()["frames_dropped"] == len(range(100)) - len(forward)
+    assert 5 < cameras[0].statistics()["frames_dropped"] < 40
+
+    timestamps = [cameras[0].grab(i) for i in range(100)]
+    assert timestamps == [cameras[1].grab(i) for i in range(100)]
+    kept = [(i, t) for i, t in enumerate(timestamps) if t is not None]
+    assert all(abs(t - i / 200) <= 0.0005 for i, t in kept)
+
+    # Pixel values respect the sensor bit depth
+    for bit_depth in (12, 16):
+        camera = SimulatedCamera(bit_depth=bit_depth, noise_counts=50)
+        assert camera.open(parameters).success
+        frames = _grab_frames(camera, range(10), shape)
+        assert frames.max() <= camera.full_scale
+        assert frames.max() > (camera.full_scale + 1) // 4
+
+    print(f"✓ Identical frames for a seed, {100 - len(forward)} drops of 100")
+
+
+def test_simulated_camera_signal_follows_stimulus_phase():
+    """A stimulus cycle's response phase recovers the simulated retinotopy."""
+    print("Testing simulated intrinsic signal...")
+
+    parameters = _make_acquisition_parameters("unused", camera_fps=64)
+    camera = SimulatedCamera(signal_amplitude=0.01, noise_counts=0, cycle_seconds=1.0)
+    assert camera.open(parameters).success
+    frames = _grab_frames(camera, range(64), (48, 64)).astype(np.float64)
+
+    # Phase of the response at the stimulus frequency, in cycles
+    spectrum = np.fft.rfft(frames, axis=0)[1]
+    response_phase = (-np.angle(spectrum) / (2 * np.pi)) % 1.0
+
+    preferred = camera.preferred_phase
+    inside = ~np.isnan(preferred)
+    error = (response_phase[inside] - preferred[inside] + 0.5) % 1.0 - 0.5
+    assert inside.mean() > 0.3
+    assert np.abs(error).max() < 0.02, np.abs(error).max()
+    assert np.abs(spectrum[~inside]).max() < 1e-6
+
+    print(f"✓ Response phase matches preferred phase within {np.abs(error).max():.4f}")
+
+
+def test_simulated_camera_drives_full_pipeline():
+    """A high-rate simulated camera runs capture, ring and writer end to end."""
+    print("Testing simulated high-rate acquisition...")
+
+    camera = SimulatedCamera(drop_probability=0.01)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = AcquisitionController(camera)
+        parameters = _make_acquisition_parameters(
+            temp_dir, camera_resolution=(256, 256), camera_fps=400, buffer_size=128
+        )
+        assert controller.initialize_acquisition(parameters).success
+
+        started = time.perf_counter()
+        assert controller.start_acquisition(_make_stimulus_frames(400)).success
+        controller._acquisition_thread.join(timeout=30)
+        result = controller.save_acquisition_data(str(Path(temp_dir) / "run.json"))
+        seconds = time.perf_counter() - started
+        assert result.success, result.error_message
+
+        status = controller.get_acquisition_status().data
+        timing, writer = status["timing"], status["writer"]
+        captured = controller.frame_ring.published
+        camera_drops = status["camera"]["frames_dropped"]
+
+        # Every scheduled frame is captured, dropped by the camera or skipped
+        assert captured + camera_drops + timing["dropped_frames"] == 400
+        assert writer["frames_written"] + writer["dropped_frames"] == captured
+
+        stack = CameraStackReader(result.metadata["camera_stack"])
+        assert len(stack) == writer["frames_written"]
+        assert stack.read(0, 1).max() <= camera.full_scale
+
+    print(
+        f"✓ {captured} frames in {seconds:.2f} s, {writer['frames_written']} "
+        f"written at {writer['megabytes_per_second']:.1f} MB/s"
+    )
+
+
+def _record_session(controller, parameters, frame_count: int):
+    """Run an acquisition and return the saved camera stack path."""
+    assert controller.initialize_acquisition(parameters).success
+    assert controller.start_acquisition(_make_stimulus_frames(frame_count)).success
+    controller._acquisition_thread.join(timeout=30)
+    output_path = Path(parameters.output_directory) / "record.json"
+    result = controller.save_acquisition_data(str(output_path))
+    assert result.success, result.error_message
+    return result.metadata["camera_stack"]
+
+
+def test_replay_camera_reproduces_recorded_session():
+    """Replaying a recording through acquisition rewrites the same stack."""
+    print("Testing recorded session replay...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        recorded = _record_session(
+            AcquisitionController(
+                SimulatedCamera(jitter_ms=1.0, drop_probability=0.1, seed=3)
+            ),
+            _make_acquisition_parameters(temp_dir, camera_fps=100),
+            60,
+        )
+        original = CameraStackReader(recorded)
+
+        # As fast as possible: no scheduler pacing, drops reproduced; the
+        # ring holds the whole replay so the writer cannot be overrun
+        replay = ReplayCamera(recorded, realtime=False)
+        controller = AcquisitionController(replay)
+        parameters = _make_acquisition_parameters(
+            temp_dir, camera_fps=100, buffer_size=128
+        )
+        assert controller.initialize_acquisition(parameters).success
+        started = time.perf_counter()
+        assert controller.start_acquisition(
+            _make_stimulus_frames(replay.frame_count)
+        ).success
+        controller._acquisition_thread.join(timeout=30)
+        fast_seconds = time.perf_counter() - started
+        result = controller.save_acquisition_data(str(Path(temp_dir) / "replay.json"))
+        assert result.success, result.error_message
+
+        replayed = CameraStackReader(result.metadata["camera_stack"])
+        assert np.array_equal(replayed.read(), original.read())
+        assert np.array_equal(replayed.frame_numbers, original.frame_numbers)
+        assert np.array_equal(replayed.camera_timestamps, original.camera_timestamps)
+        status = controller.get_acquisition_status().data
+        assert status["timing"]["paced"] is False
+        assert status["camera"]["frames_dropped"] == replay.frame_count - len(original)
+
+        # Real time: the replay takes as long as the recording did
+        replay = ReplayCamera(recorded, realtime=True)
+        controller = AcquisitionController(replay)
+        parameters = _make_acquisition_parameters(
+            temp_dir, camera_fps=100, buffer_size=128, save_camera_frames=False
+        )
+        assert controller.initialize_acquisition(parameters).success
+        started = time.perf_counter()
+        assert controller.start_acquisition(
+            _make_stimulus_frames(replay.frame_count)
+        ).success
+        controller._acquisition_thread.join(timeout=30)
+        realtime_seconds = time.perf_counter() - started
+
+        # Replayed camera timing and frame order match the recording; host
+        # timing depends on the machine and is only reported
+        ring = controller.frame_ring
+        count = ring.published
+        assert count == len(original)
+        assert np.array_equal(ring.frame_numbers[:count], original.frame_numbers)
+        assert np.array_equal(
+            ring.camera_timestamps[:count], original.camera_timestamps
+        )
+        recorded_seconds = original.timestamps[-1] - original.timestamps[0]
+        host = ring.timestamps[:count] - ring.timestamps[0]
+        host_error_ms = (
+            np.abs(host - (original.timestamps - original.timestamps[0])).max() * 1000
+        )
+
+        # A recording only replays into a matching camera resolution
+        mismatched = _make_acquisition_parameters(temp_dir, camera_resolution=(32, 32))
+        result = AcquisitionController(ReplayCamera(recorded)).initialize_acquisition(
+            mismatched
+        )
+        assert not result.success
+        print(f"✓ Correctly rejected mismatched replay: {result.error_message}")
+
+    print(
+        f"✓ Replayed {len(original)} frames in {fast_seconds:.2f} s fast, "
+        f"{realtime_seconds:.2f} s real time (recorded {recorded_seconds:.2f} s, "
+        f"host timing within {host_error_ms:.1f} ms)"
+    )
+
+
+def test_preview_channel_reduces_newest_frame_once():
+    """The preview slot bins or decimates the newest frame, once per frame."""
+    print("Testing shared-memory preview channel...")
+
+    ring = CameraFrameRing(4, (30, 40))
+    rng = np.random.default_rng(1)
+    binned = CameraPreviewChannel(ring.frame_shape, factor=4)
+    decimated = CameraPreviewChannel(ring.frame_shape, factor=4, mode=PREVIEW_DECIMATE)
+    client = CameraPreviewChannel.attach(binned.name, ring.frame_shape, 4)
+    try:
+        assert binned.publish_latest(ring) == -1
+        assert client.read() == (-1, None)
+
+        for frame_number in range(3):
+            frame = rng.integers(0, 4096, ring.frame_shape, dtype=np.uint16)
+            ring.claim()[:] = frame
+            ring.publish(frame_number, 0.0, 0.0)
+
+        # Bins average whole 4 x 4 blocks; decimation keeps every 4th pixel
+        assert binned.publish_latest(ring) == 2
+        assert decimated.publish_latest(ring) == 2
+        expected = frame[:28, :40].reshape(7, 4, 10, 4).mean(axis=(1, 3))
+        sequence, preview = client.read()
+        assert sequence == 2 and preview.shape == (7, 10)
+        assert np.array_equal(preview, np.floor(expected).astype(np.uint16))
+        assert np.array_equal(decimated.read()[1], frame[::4, ::4])
+
+        # Polling without new frames neither republishes nor copies
+        for _ in range(100):
+            assert binned.publish_latest(ring) == 2
+            assert client.read(after=2) == (2, None)
+        assert binned.statistics()["frames_published"] == 1
+    finally:
+        client.close()
+        binned.close()
+        decimated.close()
+
+    print("✓ Preview reduced once per frame and shared by name")
+
+
+def test_acquisition_preview_skips_frames_for_slow_clients():
+    """get_camera_preview serves reduced newest frames and reports skips."""
+    print("Testing acquisition camera preview...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = AcquisitionController()
+        parameters = _make_acquisition_parameters(
+            temp_dir,
+            camera_resolution=(1280, 960),
+            preview_max_size=320,
+            save_camera_frames=False,
+        )
+        assert controller.initialize_acquisition(parameters).success
+        assert controller.start_acquisition(_make_stimulus_frames(20)).success
+
+        # A slow client polling during capture sees the newest frame, never
+        # ahead of the ring, and is told how many frames it missed
+        served, skipped = [], 0
+        while True:
+            running = controller._acquisition_thread.is_alive()
+            after = served[-1] if served else NO_FRAME
+            preview = controller.get_camera_preview(after_sequence=after)
+            assert preview.success, preview.error_message
+            sequence = preview.metadata["frame_sequence"]
+            if preview.data and sequence is not None:
+                assert sequence < controller.frame_ring.published
+                missed = sequence - after - 1
+                assert preview.metadata["frames_skipped"] == missed
+                served.append(sequence)
+                skipped += missed
+            if not running:
+                break
+            time.sleep(0.03)
+        controller._acquisition_thread.join(timeout=10)
+
+        # The last poll came after capture ended and served its final frame;
+        # every frame was either served or counted as skipped
+        published = controller.frame_ring.published
+        assert served == sorted(set(served))
+        assert served[-1] == published - 1
+        assert len(served) + skipped == published
+        metadata = preview.metadata
+        assert metadata["frame_shape"] == [240, 320]
+        assert metadata["source_shape"] == [960, 1280]
+        assert len(preview.data) == 240 * 320 * 2
+
+        # Binned preview of the captured frame
+        full = np.empty((960, 1280), dtype=np.uint16)
+        controller.frame_ring.latest_into(full)
+        expected = full.reshape(240, 4, 320, 4).mean(axis=(1, 3)).astype(np.uint16)
+        pixels = np.frombuffer(preview.data, dtype=np.uint16).reshape(240, 320)
+        assert np.array_equal(pixels, expected)
+
+        # A client already holding the newest frame gets nothing
+        unchanged = controller.get_camera_preview(after_sequence=served[-1])
+        assert unchanged.success and unchanged.data == b""
+        assert unchanged.metadata["frame_sequence"] == served[-1]
+
+        # Skips are counted per client from its own last frame; a client
+        # that sends none gets the frame but no skip count
+        behind = controller.get_camera_preview(after_sequence=served[-1] - 3)
+        assert behind.metadata["frames_skipped"] == 2
+        anonymous = controller.get_camera_preview()
+        assert anonymous.data and anonymous.metadata["frames_skipped"] is None
+        assert unchanged.metadata["frames_skipped"] == 0
+
+        # Polling between frames touches neither the ring nor the pixels
+        started = time.perf_counter()
+        for _ in range(20):
+            controller._preview.publish_latest(controller.frame_ring)
+            controller._preview.read()
+        poll_ms = (time.perf_counter() - started) / 20 * 1000
+        assert poll_ms < 1.0, poll_ms
+
+    print(
+        f"✓ Preview {metadata['frame_shape']} served {len(served)} of "
+        f"{published} frames, polling {poll_ms:.3f} ms"
+    )
+
+
+def main():
+    """Run all acquisition pipeline tests."""
+    print("=== Acquisition Pipeline Tests ===\n")
+    test_ring_buffer_consumers_and_overruns()
+    test_ring_buffer_producer_does_not_allocate()
+    test_ring_buffer_concurrent_reader_never_sees_torn_frames()
+    test_acquisition_fills_ring_buffer()
+    test_ring_buffer_capacity_within_byte_budget()
+    test_batched_writer_writes_every_frame_in_order()
+    test_slow_disk_reports_backpressure_without_stalling_capture()
+    test_writer_failures_still_close_a_readable_stack()
+    test_stopping_with_overruns_keeps_batches_aligned()
+    test_camera_stack_reads_windows_and_regions()
+    test_acquisition_streams_frames_to_disk()
+    test_stopping_a_finished_acquisition_closes_its_stack()
+    test_frame_scheduler_does_not_accumulate_loop_overhead()
+    test_frame_scheduler_late_wakeup_policies()
+    test_acquisition_reports_frame_timing()
+    test_simulated_camera_is_deterministic()
+    test_simulated_camera_signal_follows_stimulus_phase()
+    test_simulated_camera_drives_full_pipeline()
+    test_replay_camera_reproduces_recorded_session()
+    test_preview_channel_reduces_newest_frame_once()
+    test_acquisition_preview_skips_frames_for_slow_clients()
+    print("\n=== Acquisition Pipeline Tests Complete ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,975 @@
+# ISI-Core/tests/test_stimulus_rendering.py
+
+"""
+Test script for the vectorized stimulus rendering engine.
+Verifies block rendering against a straightforward per-frame reference.
+"""
+
+import json
+import tempfile
+import threading
+
+import numpy as np
+
+from ..src.services.stimulus_service import (
+    AZIMUTH_PLANE,
+    ELEVATION_PLANE,
+    GRATING_PHASE_STEPS,
+    PIXEL_ROW_SPACE,
+    SWEEP_DIRECTIONS,
+    VISUAL_DEGREE_SPACE,
+    DerivedSweepSequence,
+    ParallelStimulusRenderer,
+    RemappedBarSequence,
+    SphericalWarpEngine,
+    StimulusFrameView,
+    StimulusRenderer,
+    StimulusStream,
+    expand_to_rgb,
+)
+from ..src.services.parametric_stimulus_service import (
+    PARAMETRIC_PREAMBLE,
+    ParametricBarSequence,
+)
+from ..src.services.experiment_service import MAX_PREVIEW_FRAMES, StimulusGenerator
+from ..src.services.render_profiling_service import (
+    BENCHMARK_STIMULI,
+    StimulusRenderProfiler,
+    format_reports,
+    main as benchmark_main,
+)
+from ..src.interfaces.experiment_interfaces import (
+    FrameFormat,
+    SetupParameters,
+    StimulusEncoding,
+    StimulusFrame,
+    StimulusGenerationOptions,
+    StimulusParameters,
+)
+
+
+def _make_setup(resolution=(192, 108)) -> SetupParameters:
+    """Create a small setup so tests render quickly."""
+    return SetupParameters(
+        monitor_size=(68.0, 121.0),
+        monitor_resolution=resolution,
+        monitor_distance=10.0,
+        monitor_elevation=20.0,
+        monitor_rotation=0.0,
+        mouse_eye_height=5.0,
+        mouse_visual_field_vertical=120.0,
+        mouse_visual_field_horizontal=270.0,
+        table_width=50.0,
+        table_depth=30.0,
+        table_height=10.0,
+    )
+
+
+def _make_bar_parameters(**overrides) -> StimulusParameters:
+    """Create drifting bar parameters."""
+    values = dict(
+        stimulus_type="drifting_bar",
+        duration=2.0,
+        fps=60,
+        orientation=0.0,
+        width=5.0,
+        speed=10.0,
+        background_color=(128, 128, 128),
+    )
+    values.update(overrides)
+    return StimulusParameters(**values)
+
+
+def _make_grating_parameters(**overrides) -> StimulusParameters:
+    """Create drifting grating parameters."""
+    values = dict(
+        stimulus_type="grating",
+        duration=2.0,
+        fps=60,
+        orientation=30.0,
+        spatial_frequency=0.05,
+        temporal_frequency=4.0,
+        phase_shift=0.5,
+        contrast=0.8,
+        background_color=(128, 128, 128),
+    )
+    values.update(overrides)
+    return StimulusParameters(**values)
+
+
+def _reference_bar_frame(frame_num: int, setup: SetupParameters) -> np.ndarray:
+    """Per-frame reference rendering of the horizontal drifting bar."""
+    width, height = setup.monitor_resolution
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :] = (128, 128, 128)
+
+    bar_height = int(height * 0.1)
+    position = (frame_num * 2) % height
+    if position + bar_height < height:
+        frame[position : position + bar_height, :] = (255, 255, 255)
+
+    return frame
+
+
+def test_block_rendering_matches_reference():
+    """Blocks must be identical to frame-by-frame rendering."""
+    print("Testing block rendering against reference...")
+
+    setup = _make_setup()
+    renderer = StimulusRenderer(_make_bar_parameters(), setup)
+
+    rendered = 0
+    for block_start, block in renderer.iter_blocks():
+        for offset, frame in enumerate(block):
+            expected = _reference_bar_frame(block_start + offset, setup)
+            assert np.array_equal(frame, expected), block_start + offset
+            rendered += 1
+
+    assert rendered == renderer.frame_count
+    print(f"✓ {rendered} frames match reference")
+
+
+def test_block_size_respects_memory_budget():
+    """Blocks never exceed the configured memory budget."""
+    print("Testing block memory budget...")
+
+    setup = _make_setup()
+    renderer = StimulusRenderer(
+        _make_bar_parameters(), setup, max_block_bytes=5 * 192 * 108 * 3
+    )
+
+    assert renderer.block_size == 5
+    for _, block in renderer.iter_blocks():
+        assert block.nbytes <= renderer.max_block_bytes
+
+    print(f"✓ Block size {renderer.block_size} within budget")
+
+
+def test_generator_uses_block_renderer():
+    """Generated frames carry the renderer output byte for byte."""
+    print("Testing generator output...")
+
+    setup = _make_setup()
+    parameters = _make_bar_parameters(duration=0.5)
+    result = StimulusGenerator().generate_stimulus_frames(parameters, setup)
+
+    assert result.success, result.error_message
+    block = StimulusRenderer(parameters, setup).render_block(0, len(result.data))
+    for frame, expected in zip(result.data, block):
+        assert frame.frame_data == expected.tobytes()
+
+    print(f"✓ {len(result.data)} generated frames match renderer")
+
+
+def test_stream_random_access_and_iteration():
+    """Streams support len(), random access and ordered iteration."""
+    print("Testing lazy stimulus stream...")
+
+    setup = _make_setup()
+    stream = StimulusStream(
+        StimulusRenderer(
+            _make_bar_parameters(), setup, max_block_bytes=4 * 192 * 108 * 3
+        )
+    )
+
+    assert len(stream) == 120
+    for index in (0, 37, 119, -1):
+        expected = _reference_bar_frame(index % len(stream), setup)
+        assert stream[index].frame_data == expected.tobytes()
+
+    iterated = [frame.frame_number for frame in stream]
+    assert iterated == list(range(len(stream)))
+
+    print(f"✓ Stream of {len(stream)} frames supports random access and iteration")
+
+
+def test_stream_stops_producer_on_early_exit():
+    """Abandoning iteration stops the render-ahead thread."""
+    print("Testing render-ahead shutdown...")
+
+    stream = StimulusStream(
+        StimulusRenderer(
+            _make_bar_parameters(), _make_setup(), max_block_bytes=192 * 108 * 3
+        ),
+        prefetch_blocks=1,
+    )
+    threads_before = threading.active_count()
+
+    iterator = iter(stream)
+    next(iterator)
+    iterator.close()
+
+    assert threading.active_count() == threads_before
+    print("✓ Producer thread stopped")
+
+
+def test_generated_frames_are_lazy_stream():
+    """generate_stimulus_frames serves a lazy stream that materializes on demand."""
+    print("Testing generated stream...")
+
+    setup = _make_setup()
+    parameters = _make_bar_parameters(duration=0.25)
+    result = StimulusGenerator().generate_stimulus_frames(parameters, setup)
+    assert result.success, result.error_message
+    assert result.metadata["encoding"] == StimulusEncoding.RENDERED.value
+
+    stream = result.data
+    frames = stream.to_list()
+    assert isinstance(stream, StimulusStream)
+    assert isinstance(stream[0], StimulusFrameView)
+    assert isinstance(frames, list) and isinstance(frames[0], StimulusFrame)
+    assert [f.frame_data for f in frames] == [f.frame_data for f in stream]
+    print(f"✓ Stream materializes {len(frames)} frames")
+
+
+def test_periodic_cycle_reuse():
+    """Periodic bars render one cycle and serve repeats by index modulo period."""
+    print("Testing periodic cycle reuse...")
+
+    setup = _make_setup()
+    renderer = StimulusRenderer(_make_bar_parameters(duration=5.0), setup)
+    assert renderer.period == 108 // 2
+
+    rendered_frames = []
+    render_frames = renderer.render_frames
+
+    def counting_render(frame_numbers):
+        rendered_frames.extend(frame_numbers)
+        return render_frames(frame_numbers)
+
+    renderer.render_frames = counting_render
+    stream = StimulusStream(renderer)
+
+    for index, (_, _, pixels) in enumerate(stream.iter_pixels()):
+        expected = _reference_bar_frame(index, setup)
+        assert np.array_equal(pixels, expected), index
+
+    assert len(rendered_frames) == renderer.period
+    assert stream.slot_count == renderer.period
+    assert stream.frame_slot(renderer.period + 3) == 3
+
+    print(f"✓ {len(stream)} frames served from {len(rendered_frames)} rendered frames")
+
+
+def test_cycle_renders_on_demand():
+    """Kept cycles fill block by block; isolated reads render their frame only."""
+    print("Testing on-demand cycle rendering...")
+
+    setup = _make_setup()
+    renderer = StimulusRenderer(
+        _make_bar_parameters(duration=5.0), setup, max_block_bytes=4 * 192 * 108 * 3
+    )
+    rendered_frames = []
+    render_frames = renderer.render_frames
+
+    def counting_render(frame_numbers):
+        rendered_frames.extend(frame_numbers)
+        return render_frames(frame_numbers)
+
+    renderer.render_frames = counting_render
+    stream = StimulusStream(renderer, prefetch_blocks=1)
+
+    assert np.array_equal(stream.frame_pixels(30), _reference_bar_frame(30, setup))
+    assert rendered_frames == [30]
+
+    # Abandoning iteration stops rendering and keeps the frames rendered so far
+    iterator = stream.iter_pixels()
+    next(iterator)
+    iterator.close()
+    assert 4 <= len(rendered_frames) < renderer.period
+    assert stream._cycle_frames % 4 == 0 and stream._cycle_frames > 0
+
+    rendered_frames.clear()
+    for index, (_, _, pixels) in enumerate(stream.iter_pixels()):
+        assert np.array_equal(pixels, _reference_bar_frame(index, setup)), index
+    assert len(rendered_frames) < renderer.period
+    assert stream._cycle_frames == renderer.period
+
+    rendered_frames.clear()
+    stream.frame_pixels(len(stream) - 1)
+    assert rendered_frames == []
+
+    # Spherical bar masks render only the frames read
+    generator = StimulusGenerator()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        generator._warp_engine = engine
+        parameters = _make_bar_parameters(
+            retinotopy_mode="bar", duration=3.0, width=20.0, speed=90.0
+        )
+        sequence = generator.generate_stimulus_frames(parameters, setup).data
+        mask_renderer = sequence.masks.renderer
+        mask_frames = []
+        render_masks = mask_renderer.render_frames
+
+        def counting_masks(frame_numbers):
+            mask_frames.extend(frame_numbers)
+            return render_masks(frame_numbers)
+
+        mask_renderer.render_frames = counting_masks
+        reference = StimulusRenderer(parameters, setup, warp_engine=engine)
+        middle = reference.period // 2
+        assert np.array_equal(
+            sequence.frame_pixels(middle), reference.render_frames([middle])[0]
+        )
+        assert mask_frames == [middle]
+
+        cycle = np.stack(list(sequence.iter_slot_pixels()))
+        assert np.array_equal(cycle, reference.render_block(0, reference.period))
+
+    print(f"✓ {renderer.period}-frame cycle rendered on demand")
+
+
+def test_warp_tables_cached_by_geometry():
+    """Warp tables are computed once per geometry and reused from disk."""
+    print("Testing warp table cache...")
+
+    setup = _make_setup()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        tables = engine.coordinate_tables(setup)
+
+        assert tables.shape == (2, 108, 192)
+        assert engine.coordinate_tables(setup) is tables
+        assert not tables.flags.writeable
+
+        # Straight ahead of the eye at the elevated screen center
+        center_elevation = tables[ELEVATION_PLANE, 53:55, 95:97].mean()
+        assert abs(center_elevation - setup.monitor_elevation) < 1.0
+        assert abs(tables[AZIMUTH_PLANE, 53:55, 95:97].mean()) < 1.0
+        assert tables[ELEVATION_PLANE, 0, 96] > tables[ELEVATION_PLANE, -1, 96]
+        assert tables[AZIMUTH_PLANE, 54, -1] > tables[AZIMUTH_PLANE, 54, 0]
+
+        # A fresh engine (new process) memory-maps the stored table
+        reloaded = SphericalWarpEngine(cache_directory=temp_dir)
+        reloaded._compute_tables = None
+        assert np.array_equal(reloaded.coordinate_tables(setup), tables)
+
+        # Non-geometry fields do not change the key; geometry does
+        other_mouse = setup.copy(update={"mouse_eye_height": 7.0})
+        other_distance = setup.copy(update={"monitor_distance": 12.0})
+        assert engine.geometry_key(other_mouse) == engine.geometry_key(setup)
+        assert engine.geometry_key(other_distance) != engine.geometry_key(setup)
+
+        del tables, reloaded
+
+    print("✓ Warp tables cached in memory and on disk")
+
+
+def test_spherical_bar_sweep():
+    """Spherical bars sweep the visual field at constant angular speed."""
+    print("Testing spherical bar sweep...")
+
+    setup = _make_setup()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        parameters = _make_bar_parameters(
+            retinotopy_mode="bar", duration=30.0, width=20.0, speed=60.0
+        )
+        renderer = StimulusRenderer(parameters, setup, warp_engine=engine)
+        elevation = engine.coordinate_tables(setup)[ELEVATION_PLANE]
+
+        assert renderer.period < renderer.frame_count
+        block = renderer.render_block(0, renderer.period)
+
+        # Bar starts off-screen, covers every pixel once, and ends off-screen
+        in_bar = block[..., 0] == 255
+        assert in_bar.any(axis=0).all()
+        assert not in_bar[0].all()
+
+        # The bar is the band of elevations within half a width of its center
+        frame = renderer.period // 2
+        center = elevation.min() - 10.0 + frame * 1.0
+        expected = np.abs(elevation - center) <= 10.0 - 1e-3
+        assert in_bar[frame][expected].all()
+
+        # Downward sweep is the exact time reversal of the upward sweep
+        reverse = StimulusRenderer(
+            parameters.copy(update={"orientation": 180.0}), setup, warp_engine=engine
+        )
+        assert reverse.period == renderer.period
+        reverse_block = reverse.render_block(0, reverse.period)
+        assert np.array_equal(reverse_block, block[::-1])
+
+        del elevation
+
+    print(f"✓ Spherical bar sweeps in {renderer.period} frames")
+
+
+def test_parallel_rendering_matches_serial():
+    """Process-pool rendering produces the same frames as serial rendering."""
+    print("Testing parallel rendering...")
+
+    setup = _make_setup()
+    for overrides in ({}, {"retinotopy_mode": "bar", "width": 20.0, "speed": 60.0}):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            renderer = StimulusRenderer(
+                _make_bar_parameters(**overrides),
+                setup,
+                warp_engine=SphericalWarpEngine(cache_directory=temp_dir),
+            )
+            expected = renderer.render_block(0, renderer.frame_count)
+
+            with ParallelStimulusRenderer(renderer, workers=2, chunk_frames=7) as pool:
+                assert pool.block_size == 14
+                assert np.array_equal(
+                    pool.render_block(0, renderer.frame_count), expected
+                )
+                assert np.array_equal(pool.render_block(5, 50), expected[5:50])
+
+                iterated = np.concatenate([block for _, block in pool.iter_blocks()])
+                assert np.array_equal(iterated, expected)
+
+    print("✓ Parallel blocks match serial rendering")
+
+
+def test_compact_frame_formats_expand_to_rgb():
+    """Luminance and 1-bit frames expand to exactly the RGB frames."""
+    print("Testing compact frame formats...")
+
+    setup = _make_setup(resolution=(190, 108))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        for overrides in ({}, {"retinotopy_mode": "bar", "width": 20.0, "speed": 60.0}):
+            parameters = _make_bar_parameters(**overrides)
+            rgb = StimulusRenderer(parameters, setup, warp_engine=engine)
+            expected = rgb.render_block(0, rgb.period)
+
+            for frame_format, frame_nbytes in (
+                (FrameFormat.LUMINANCE, 108 * 190),
+                (FrameFormat.BINARY, 108 * 24),
+            ):
+                compact = StimulusStream(
+                    StimulusRenderer(
+                        parameters.copy(update={"frame_format": frame_format}),
+                        setup,
+                        warp_engine=engine,
+                    )
+                )
+                block = compact.renderer.render_block(0, compact.renderer.period)
+
+                assert compact.frame_format is frame_format
+                assert compact.renderer.frame_nbytes == frame_nbytes
+                assert np.array_equal(expand_to_rgb(block, compact.metadata), expected)
+                assert np.array_equal(compact.rgb_pixels(5), expected[5])
+
+    colored = _make_bar_parameters(
+        bar_color=(255, 0, 0), frame_format=FrameFormat.LUMINANCE
+    )
+    try:
+        StimulusRenderer(colored, setup)
+        raise AssertionError("Colored luminance stimulus should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected colored luminance stimulus: {e}")
+
+    print("✓ Compact frames expand to identical RGB frames")
+
+
+def test_parametric_bar_matches_raster_path():
+    """Geometry-only bar sequences rasterize to exactly the rendered frames."""
+    print("Testing parametric bar encoding...")
+
+    setup = _make_setup()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        for overrides in (
+            {"duration": 5.0},
+            {"retinotopy_mode": "bar", "width": 20.0, "speed": 60.0},
+            {
+                "retinotopy_mode": "bar",
+                "width": 20.0,
+                "speed": 60.0,
+                "orientation": 270.0,
+            },
+        ):
+            parameters = _make_bar_parameters(**overrides)
+            raster = StimulusStream(
+                StimulusRenderer(parameters, setup, warp_engine=engine)
+            )
+            parametric = ParametricBarSequence.from_parameters(
+                parameters, setup, warp_engine=engine
+            )
+
+            assert len(parametric) == len(raster)
+            assert parametric.slot_count == raster.slot_count
+            for (_, _, expected), pixels in zip(
+                raster.iter_pixels(), parametric.iter_slot_pixels()
+            ):
+                assert np.array_equal(pixels, expected)
+            for index in (0, 17, len(raster) - 1):
+                assert np.array_equal(
+                    parametric.frame_pixels(index), raster.frame_pixels(index)
+                )
+
+            # Whole session ships as kilobytes and decodes to the same frames
+            encoded = parametric.encode()
+            assert len(encoded) < 16 * 1024
+            decoded = ParametricBarSequence.decode(encoded, warp_engine=engine)
+            assert np.array_equal(decoded.geometry, parametric.geometry)
+            assert np.array_equal(decoded.frame_pixels(9), raster.frame_pixels(9))
+
+        # Decoded frames come from the encoded geometry, not the parameters
+        geometry = parametric.geometry.copy()
+        geometry["position"] += 5.0
+        shifted = ParametricBarSequence(parametric.renderer, geometry).encode()
+        decoded = ParametricBarSequence.decode(shifted, warp_engine=engine)
+        assert np.array_equal(decoded.geometry, geometry)
+        assert np.array_equal(
+            decoded.frame_pixels(3),
+            parametric.renderer.render_geometry(geometry[3:4])[0],
+        )
+
+        magic, version, header_length = PARAMETRIC_PREAMBLE.unpack_from(shifted)
+        header_end = PARAMETRIC_PREAMBLE.size + header_length
+        header = json.loads(shifted[PARAMETRIC_PREAMBLE.size : header_end])
+        header["geometry_space"] = (
+            PIXEL_ROW_SPACE
+            if header["geometry_space"] == VISUAL_DEGREE_SPACE
+            else VISUAL_DEGREE_SPACE
+        )
+        tampered = json.dumps(header).encode("utf-8")
+        try:
+            ParametricBarSequence.decode(
+                PARAMETRIC_PREAMBLE.pack(magic, version, len(tampered))
+                + tampered
+                + shifted[header_end:],
+                warp_engine=engine,
+            )
+            raise AssertionError("Mismatched geometry space should be rejected")
+        except ValueError as e:
+            print(f"✓ Correctly rejected geometry space: {e}")
+
+    # The generator encodes bars parametrically when asked to
+    result = StimulusGenerator().generate_stimulus_frames(
+        _make_bar_parameters(),
+        setup,
+        StimulusGenerationOptions(encoding=StimulusEncoding.PARAMETRIC),
+    )
+    assert result.success, result.error_message
+    assert isinstance(result.data, ParametricBarSequence)
+    assert result.metadata["encoded_bytes"] == result.data.nbytes
+
+    try:
+        StimulusGenerationOptions(encoding=StimulusEncoding.PARAMETRIC, cached=True)
+        raise AssertionError("Cached parametric stimuli should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected cached parametric encoding: {e}")
+
+    try:
+        ParametricBarSequence.from_parameters(
+            _make_bar_parameters(stimulus_type="checkerboard"), setup
+        )
+        raise AssertionError("Non-bar stimulus should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected non-bar stimulus: {e}")
+
+    print("✓ Parametric frames equal raster frames")
+
+
+def test_random_access_render_and_downscale():
+    """Single frames render by index; downscaled frames sample the full raster."""
+    print("Testing random-access frame rendering...")
+
+    setup = _make_setup()
+    generator = StimulusGenerator()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generator._warp_engine = SphericalWarpEngine(cache_directory=temp_dir)
+        for overrides in (
+            {"duration": 1200.0},
+            {"retinotopy_mode": "bar", "width": 20.0, "speed": 60.0},
+        ):
+            parameters = _make_bar_parameters(**overrides)
+            stream = generator.generate_stimulus_frames(parameters, setup).data
+            indices = [len(stream) - 1, 3, 77]
+
+            frames = generator.render_frames(parameters, setup, indices)
+            assert frames.success, frames.error_message
+            for index, frame in zip(indices, frames.data):
+                assert frame.frame_number == index
+                assert np.array_equal(frame.pixels, stream.frame_pixels(index))
+
+            single = generator.render_frames(parameters, setup, indices[:1])
+            assert single.data[0].frame_data == stream[indices[0]].frame_data
+
+            thumbnails = generator.render_frames(
+                parameters, setup, indices, downscale=4
+            )
+            assert thumbnails.metadata["frame_size"] == [27, 48]
+            for index, frame in zip(indices, thumbnails.data):
+                assert np.array_equal(
+                    frame.pixels, stream.frame_pixels(index)[::4, ::4]
+                )
+
+    try:
+        generator.render_frames(_make_bar_parameters(), setup, [120])
+        raise AssertionError("Out-of-range index should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected out-of-range index: {e}")
+
+    # Sequences shorter than one frame preview as empty
+    preview = generator.preview_stimulus(
+        _make_bar_parameters(duration=0.01), setup, frame_count=5
+    )
+    assert preview.success, preview.error_message
+    assert preview.data == []
+
+    # Scrubbed previews render the requested frames, bounded in number
+    parameters = _make_bar_parameters()
+    preview = generator.preview_stimulus(
+        parameters, setup, frame_indices=[100, 7], downscale=4
+    )
+    assert preview.success, preview.error_message
+    assert [frame.frame_number for frame in preview.data] == [100, 7]
+    assert preview.metadata["frame_size"] == [27, 48]
+    expected = generator.render_frames(parameters, setup, [100], downscale=4)
+    assert preview.data[0].frame_data == expected.data.rgb_pixels(0).tobytes()
+    assert len(generator.preview_stimulus(parameters, setup, 50).data) == (
+        MAX_PREVIEW_FRAMES
+    )
+    try:
+        generator.preview_stimulus(
+            parameters, setup, frame_indices=range(MAX_PREVIEW_FRAMES + 1)
+        )
+        raise AssertionError("Too many preview frames should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected oversized preview: {e}")
+
+    print("✓ Random-access frames and thumbnails match the full raster")
+
+
+def _generate_sweeps(generator, parameters, setup, options=None):
+    """Generate every sweep direction in turn, keyed by direction name."""
+    results = {}
+    for direction, orientation in SWEEP_DIRECTIONS.items():
+        result = generator.generate_stimulus_frames(
+            parameters.copy(update={"orientation": orientation}), setup, options
+        )
+        assert result.success, result.error_message
+        results[direction] = result
+    return results
+
+
+def test_sweeps_derive_from_generated_directions():
+    """Opposite sweep directions are served as views of one rendered sweep."""
+    print("Testing sweep derivation...")
+
+    setup = _make_setup()
+    generator = StimulusGenerator()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generator._warp_engine = SphericalWarpEngine(cache_directory=temp_dir)
+        parameters = _make_bar_parameters(
+            retinotopy_mode="bar", duration=30.0, width=20.0, speed=60.0
+        )
+        results = _generate_sweeps(generator, parameters, setup)
+
+        # Azimuth and elevation tables of a tilted monitor are not transposes,
+        # so the perpendicular axis falls back to its own render
+        sources = {
+            direction: result.metadata["sweep_source"]
+            for direction, result in results.items()
+        }
+        assert sources == {"up": None, "down": 0.0, "right": None, "left": 90.0}
+
+        sweeps = {direction: result.data for direction, result in results.items()}
+        for direction in ("down", "left"):
+            sweep = sweeps[direction]
+            assert isinstance(sweep, DerivedSweepSequence)
+            reference = StimulusRenderer(
+                parameters.copy(update={"orientation": SWEEP_DIRECTIONS[direction]}),
+                setup,
+                warp_engine=generator._warp_engine,
+            )
+            assert len(sweep) == reference.frame_count
+            assert sweep.slot_count == reference.period
+            expected = reference.render_block(0, reference.period)
+            for index in (0, 7, reference.period - 1, len(sweep) - 1):
+                assert np.array_equal(
+                    sweep.frame_pixels(index), expected[index % reference.period]
+                )
+            assert np.array_equal(np.stack(list(sweep.iter_slot_pixels())), expected)
+
+        # Derived frames share memory with the base sweep's frames
+        up = sweeps["up"]
+        assert np.shares_memory(
+            sweeps["down"].frame_pixels(0), up.frame_pixels(up.slot_count - 1)
+        )
+
+        # Sweeps truncated before a full cycle cannot be mirrored
+        short = _generate_sweeps(
+            generator, parameters.copy(update={"duration": 0.5}), setup
+        )
+        assert all(r.metadata["sweep_source"] is None for r in short.values())
+
+        # Derivation is an option; without it every direction renders
+        rendered = _generate_sweeps(
+            StimulusGenerator(),
+            parameters,
+            setup,
+            StimulusGenerationOptions(derive_sweeps=False),
+        )
+        assert not any(
+            isinstance(r.data, DerivedSweepSequence) for r in rendered.values()
+        )
+
+        try:
+            DerivedSweepSequence(sweeps["up"], reference, transpose=True)
+            raise AssertionError("Mismatched derived frame shape should be rejected")
+        except ValueError as e:
+            print(f"✓ Correctly rejected mismatched derivation: {e}")
+
+    print("✓ Reversed sweeps are derived views of the rendered sweeps")
+
+
+def test_render_budget_profile_and_benchmark():
+    """Profiles report timing, throughput and a presentation mode."""
+    print("Testing render budget profiling...")
+
+    setup = _make_setup()
+    generator = StimulusGenerator()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generator._warp_engine = SphericalWarpEngine(cache_directory=temp_dir)
+        result = generator.profile_render_budget(
+            _make_bar_parameters(fps=120), setup, frames=30
+        )
+        assert result.success, result.error_message
+
+        report = result.data
+        assert report.frames_profiled == 30
+        assert report.frame_bytes == 108 * 192 * 3
+        assert report.frame_budget_ms == 1000 / 120
+        assert 0 < report.mean_frame_ms <= report.p95_frame_ms <= report.max_frame_ms
+        assert report.megabytes_per_second == (
+            report.frames_per_second * report.frame_bytes / 1e6
+        )
+        assert report.peak_frame_allocation_bytes >= report.frame_bytes
+        assert report.recommended_mode == (
+            "streaming" if report.realtime_capable else "pre_rendered"
+        )
+
+        # A budget no render can meet always recommends pre-rendering
+        strict = StimulusRenderProfiler(
+            warp_engine=generator._warp_engine, budget_fraction=1e-9
+        )
+        reports = strict.benchmark(
+            setup, resolutions=[(96, 54), (192, 108)], frame_rates=[30, 60], frames=5
+        )
+        assert len(reports) == 2 * 2 * len(BENCHMARK_STIMULI)
+        assert {r.resolution for r in reports} == {(96, 54), (192, 108)}
+        assert all(r.recommended_mode == "pre_rendered" for r in reports)
+        assert len(format_reports(reports).splitlines()) == len(reports) + 1
+
+        # Presets a frame format cannot represent are skipped, not fatal
+        unsupported = strict.unsupported_stimuli(setup, frame_format=FrameFormat.BINARY)
+        assert set(unsupported) == {"grating", "checkerboard"}
+        binary = strict.benchmark(
+            setup,
+            resolutions=[(96, 54)],
+            frame_rates=[30],
+            frames=5,
+            frame_format=FrameFormat.BINARY,
+        )
+        assert len(binary) == len(BENCHMARK_STIMULI) - len(unsupported)
+        assert all(r.frame_format == FrameFormat.BINARY for r in binary)
+
+    # The benchmark command fails cleanly when nothing can be profiled
+    arguments = ["--resolutions", "96x54", "--fps", "30", "--frames", "2"]
+    assert benchmark_main(arguments + ["--frame-format", "binary"]) == 0
+    assert (
+        benchmark_main(arguments + ["--frame-format", "binary", "--stimuli", "grating"])
+        == 1
+    )
+
+    try:
+        strict.benchmark(setup, stimuli=["plaid"])
+        raise AssertionError("Unknown benchmark stimulus should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected benchmark stimulus: {e}")
+
+    print(f"✓ Profiled {report.frames_per_second:.0f} frames/s at 192x108")
+
+
+def test_grating_phase_tables_match_trig_reference():
+    """Gratings and checkerboards match per-pixel trigonometry per frame."""
+    print("Testing grating phase tables...")
+
+    setup = _make_setup()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        tables = engine.coordinate_tables(setup).astype(np.float64)
+        azimuth, elevation = tables[AZIMUTH_PLANE], tables[ELEVATION_PLANE]
+
+        parameters = _make_grating_parameters()
+        renderer = StimulusRenderer(parameters, setup, warp_engine=engine)
+
+        # 4 Hz at 60 fps repeats every 15 frames
+        assert renderer.period == 15
+        block = renderer.render_block(0, renderer.frame_count)
+        assert np.array_equal(block[15:30], block[:15])
+
+        angle = np.deg2rad(30.0)
+        along = 0.05 * (elevation * np.cos(angle) + azimuth * np.sin(angle))
+        for frame in (0, 4, 11):
+            phase = 2 * np.pi * (along - 4.0 * frame / 60) + 0.5
+            expected = 128 + 0.8 * 127 * np.sin(phase)
+            # Rounding phases to LUT steps keeps the error within about a gray level
+            error = np.abs(block[frame].astype(np.float64) - expected[..., np.newaxis])
+            assert error.max() <= 1.25
+
+        # Contrast-reversing checkerboard flips every check each half cycle
+        checkerboard = StimulusRenderer(
+            _make_grating_parameters(
+                stimulus_type="checkerboard",
+                orientation=0.0,
+                temporal_frequency=2.0,
+                phase_shift=0.0,
+                contrast=1.0,
+                square_wave=True,
+                frame_format=FrameFormat.LUMINANCE,
+            ),
+            setup,
+            warp_engine=engine,
+        )
+        frames = checkerboard.render_frames([0, 15])
+        parity = (
+            np.floor(2 * 0.05 * elevation) + np.floor(2 * 0.05 * azimuth)
+        ) % 2 == 0
+        assert np.array_equal(frames[0], np.where(parity, 255, 1))
+        assert np.array_equal(frames[1], np.where(parity, 1, 255))
+
+        # Static gratings render a single frame
+        static = StimulusRenderer(
+            _make_grating_parameters(temporal_frequency=None), setup, warp_engine=engine
+        )
+        assert static.period == 1
+
+        # A bar retinotopy mode leaves gratings un-swept, so frames past the
+        # bar sweep length keep drifting with the grating's own period
+        grating = _make_grating_parameters(
+            duration=10.0,
+            fps=30,
+            orientation=90.0,
+            temporal_frequency=1.0,
+            speed=60.0,
+            width=20.0,
+        )
+        plain = StimulusRenderer(grating, setup, warp_engine=engine)
+        swept = StimulusRenderer(
+            grating.copy(update={"retinotopy_mode": "bar"}), setup, warp_engine=engine
+        )
+        assert swept.period == plain.period == 30
+        indices = [0, 29, 31, 100, swept.frame_count - 1]
+        assert np.array_equal(
+            swept.render_frames(indices), plain.render_frames(indices)
+        )
+
+        del azimuth, elevation
+
+    for overrides in (
+        {"spatial_frequency": None},
+        {"frame_format": FrameFormat.BINARY},
+    ):
+        try:
+            StimulusRenderer(_make_grating_parameters(**overrides), setup)
+            raise AssertionError(f"Grating with {overrides} should be rejected")
+        except ValueError as e:
+            print(f"✓ Correctly rejected grating: {e}")
+
+    print(f"✓ Grating LUT of {GRATING_PHASE_STEPS} phase steps matches reference")
+
+
+def test_appearance_changes_reuse_geometry():
+    """Color and contrast changes recolor cached geometry instead of re-rendering."""
+    print("Testing appearance-only re-render...")
+
+    setup = _make_setup()
+    generator = StimulusGenerator()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = SphericalWarpEngine(cache_directory=temp_dir)
+        generator._warp_engine = engine
+
+        # Spherical bars recolor the retained bar masks
+        parameters = _make_bar_parameters(
+            retinotopy_mode="bar", duration=3.0, width=20.0, speed=90.0
+        )
+        first = generator.generate_stimulus_frames(parameters, setup)
+        assert first.success, first.error_message
+        assert not first.metadata["geometry_reused"]
+        assert isinstance(first.data, RemappedBarSequence)
+
+        recolored = parameters.copy(
+            update={
+                "background_color": (20, 20, 20),
+                "bar_color": (200, 200, 200),
+                "frame_format": FrameFormat.LUMINANCE,
+            }
+        )
+        second = generator.generate_stimulus_frames(recolored, setup)
+        assert second.success, second.error_message
+        assert second.metadata["geometry_reused"]
+        assert second.data.masks is first.data.masks
+
+        for sequence, expected_parameters in (
+            (first.data, parameters),
+            (second.data, recolored),
+        ):
+            reference = StimulusRenderer(expected_parameters, setup, warp_engine=engine)
+            for index in (0, reference.period // 2, len(sequence) - 1):
+                assert np.array_equal(
+                    sequence.frame_pixels(index), reference.render_frames([index])[0]
+                )
+            assert sequence.metadata == reference.sequence_metadata()
+
+        # Gratings restyle the renderer around the same phase table
+        grating = _make_grating_parameters()
+        generator.generate_stimulus_frames(grating, setup)
+        faded = grating.copy(update={"contrast": 0.3})
+        result = generator.generate_stimulus_frames(faded, setup)
+        assert result.metadata["geometry_reused"]
+        renderer = result.data.renderer
+        reference = StimulusRenderer(faded, setup, warp_engine=engine)
+        assert renderer._phase is generator._renderer_for(grating, setup)[0]._phase
+        assert np.array_equal(
+            renderer.render_block(0, 15), reference.render_block(0, 15)
+        )
+
+        # Geometry changes render from scratch
+        wider = generator.generate_stimulus_frames(
+            parameters.copy(update={"width": 30.0}), setup
+        )
+        assert not wider.metadata["geometry_reused"]
+
+    try:
+        renderer.restyle(grating.copy(update={"spatial_frequency": 0.1}))
+        raise AssertionError("Geometry change should not restyle")
+    except ValueError as e:
+        print(f"✓ Correctly rejected restyle: {e}")
+
+    print("✓ Appearance-only changes reuse cached geometry")
+
+
+def main():
+    """Run all stimulus rendering tests."""
+    print("=== Stimulus Rendering Tests ===\n")
+    test_block_rendering_matches_reference()
+    test_block_size_respects_memory_budget()
+    test_generator_uses_block_renderer()
+    test_stream_random_access_and_iteration()
+    test_stream_stops_producer_on_early_exit()
+    test_generated_frames_are_lazy_stream()
+    test_periodic_cycle_reuse()
+    test_cycle_renders_on_demand()
+    test_warp_tables_cached_by_geometry()
+    test_spherical_bar_sweep()
+    test_parallel_rendering_matches_serial()
+    test_compact_frame_formats_expand_to_rgb()
+    test_parametric_bar_matches_raster_path()
+    test_random_access_render_and_downscale()
+    test_sweeps_derive_from_generated_directions()
+    test_render_budget_profile_and_benchmark()
+    test_grating_phase_tables_match_trig_reference()
+    test_appearance_changes_reuse_geometry()
+    print("\n=== Stimulus Rendering Tests Complete ===")
+
+
+if __name__ == "__main__":
+    main()
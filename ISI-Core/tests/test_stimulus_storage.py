@@ -0,0 +1,735 @@
+# ISI-Core/tests/test_stimulus_storage.py
+
+"""
+Test script for stimulus sequence storage.
+Verifies container round trips and memory-mapped, zero-copy frame access.
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections.abc import Sequence as SequenceABC
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from ..src.services.stimulus_service import (
+    ParallelStimulusRenderer,
+    StimulusFrameView,
+    StimulusRenderer,
+    StimulusSequence,
+    StimulusStream,
+)
+from ..src.services.stimulus_storage_service import (
+    DeltaStimulusSequence,
+    MappedStimulusSequence,
+    StimulusSequenceStore,
+    STIMULUS_SEQUENCE_SUFFIX,
+)
+from ..src.services.stimulus_cache_service import StimulusCache
+from ..src.services.stimulus_pregeneration_service import StimulusPregenerator
+from ..src.services import image_export_service
+from ..src.services.image_export_service import (
+    PNG_SIGNATURE,
+    StimulusImageExporter,
+)
+from ..src.services.experiment_service import FrameSynchronizer, StimulusGenerator
+from ..src.interfaces.experiment_interfaces import (
+    CameraFrame,
+    FrameFormat,
+    SetupParameters,
+    StimulusGenerationOptions,
+    StimulusParameters,
+    StimulusFrame,
+)
+
+
+def _make_setup() -> SetupParameters:
+    """Create a small setup so tests render quickly."""
+    return SetupParameters(
+        monitor_size=(68.0, 121.0),
+        monitor_resolution=(160, 90),
+        monitor_distance=10.0,
+        monitor_elevation=20.0,
+        monitor_rotation=0.0,
+        mouse_eye_height=5.0,
+        mouse_visual_field_vertical=120.0,
+        mouse_visual_field_horizontal=270.0,
+        table_width=50.0,
+        table_depth=30.0,
+        table_height=10.0,
+    )
+
+
+def _make_stream(
+    duration: float = 1.0, frame_format: FrameFormat = FrameFormat.RGB
+) -> StimulusStream:
+    """Create a drifting bar stream."""
+    parameters = StimulusParameters(
+        stimulus_type="drifting_bar",
+        duration=duration,
+        fps=60,
+        orientation=0.0,
+        background_color=(128, 128, 128),
+        frame_format=frame_format,
+    )
+    return StimulusStream(StimulusRenderer(parameters, _make_setup()))
+
+
+def _decode_png(data: bytes) -> Tuple[Tuple[int, int, int, int], bytes, np.ndarray]:
+    """Decode an Up-filtered PNG into (IHDR fields, PLTE, stored rows)."""
+    assert data[:8] == PNG_SIGNATURE
+    chunks, offset = {}, 8
+    while offset < len(data):
+        (length,) = struct.unpack_from(">I", data, offset)
+        chunk_type = data[offset + 4 : offset + 8]
+        payload = data[offset + 8 : offset + 8 + length]
+        (crc,) = struct.unpack_from(">I", data, offset + 8 + length)
+        assert crc == zlib.crc32(chunk_type + payload)
+        chunks[chunk_type] = payload
+        offset += 12 + length
+
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    filtered = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    filtered = filtered.reshape(height, -1)
+    assert (filtered[:, 0] == 2).all()
+    rows = np.cumsum(filtered[:, 1:], axis=0, dtype=np.uint8)
+    return (width, height, bit_depth, color_type), chunks.get(b"PLTE", b""), rows
+
+
+def test_stream_round_trip():
+    """A saved stream reopens with identical frames, timing and metadata."""
+    print("Testing container round trip...")
+
+    stream = _make_stream()
+    store = StimulusSequenceStore()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = store.save(stream, Path(temp_dir) / "sequence.json")
+        assert path.suffix == STIMULUS_SEQUENCE_SUFFIX
+        assert len(list(Path(temp_dir).iterdir())) == 1
+
+        loaded = store.open(path)
+        assert len(loaded) == len(stream)
+        assert loaded.frame_shape == stream.frame_shape
+        assert loaded.metadata == stream.metadata
+
+        for original, restored in zip(stream, loaded):
+            assert original.frame_number == restored.frame_number
+            assert original.timestamp == restored.timestamp
+            assert original.frame_data == restored.frame_data
+
+        del loaded
+
+    print(f"✓ {len(stream)} frames round trip through one file")
+
+
+def test_concurrent_saves_of_one_target():
+    """Writers saving the same target each stage a private temporary file."""
+    print("Testing concurrent saves...")
+
+    stream = _make_stream(duration=0.5)
+    store = StimulusSequenceStore()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target = Path(temp_dir) / "sequence.json"
+        errors = []
+
+        def save():
+            try:
+                store.save(stream, target)
+            except Exception as e:
+                errors.append(e)
+
+        writers = [threading.Thread(target=save) for _ in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(timeout=30)
+
+        assert not errors, errors
+        assert [path.suffix for path in Path(temp_dir).iterdir()] == [
+            STIMULUS_SEQUENCE_SUFFIX
+        ]
+        loaded = store.open(target.with_suffix(STIMULUS_SEQUENCE_SUFFIX))
+        assert [f.frame_data for f in loaded] == [f.frame_data for f in stream]
+        del loaded
+
+    print("✓ Concurrent saves leave one complete sequence")
+
+
+def test_periodic_sequence_stores_one_cycle():
+    """Repeating frames are stored once and indexed modulo the period."""
+    print("Testing periodic storage...")
+
+    stream = _make_stream(duration=4.0)
+    store = StimulusSequenceStore()
+    frame_nbytes = int(np.prod(stream.frame_shape))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = store.save(stream, Path(temp_dir) / "periodic")
+        loaded = store.open(path)
+
+        assert loaded.slot_count == stream.slot_count < len(stream)
+        assert path.stat().st_size < (loaded.slot_count + 2) * frame_nbytes
+        for index in (0, stream.slot_count - 1, stream.slot_count, len(stream) - 1):
+            assert np.array_equal(
+                loaded.frame_pixels(index), stream.frame_pixels(index)
+            )
+            assert loaded.frame_timing(index) == stream.frame_timing(index)
+
+        del loaded
+
+    print(f"✓ {len(stream)} frames stored in {stream.slot_count} slots")
+
+
+def test_frame_views_are_memory_mapped():
+    """Frame pixels are views into the mapped file, not copies."""
+    print("Testing zero-copy frame views...")
+
+    stream = _make_stream(duration=0.25)
+    store = StimulusSequenceStore()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        loaded = store.open(store.save(stream, Path(temp_dir) / "sequence"))
+        view = loaded.frame_pixels(3)
+
+        assert isinstance(view.base, np.memmap) or isinstance(view, np.memmap)
+        assert not view.flags.writeable
+        assert np.array_equal(view, stream.frame_pixels(3))
+
+        del view, loaded
+
+    print("✓ Frame views are read-only memory maps")
+
+
+def test_binary_stream_round_trip():
+    """1-bit sequences store packed masks and expand to RGB after loading."""
+    print("Testing binary frame storage...")
+
+    rgb = _make_stream()
+    binary = _make_stream(frame_format=FrameFormat.BINARY)
+    store = StimulusSequenceStore()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rgb_path = store.save(rgb, Path(temp_dir) / "rgb")
+        binary_path = store.save(binary, Path(temp_dir) / "binary")
+        loaded = store.open(binary_path)
+
+        assert loaded.frame_format is FrameFormat.BINARY
+        assert loaded.frame_shape == (90, 20)
+        assert binary_path.stat().st_size * 10 < rgb_path.stat().st_size
+        for index in (0, 7, len(rgb) - 1):
+            assert np.array_equal(loaded.rgb_pixels(index), rgb.frame_pixels(index))
+
+        del loaded
+
+    print("✓ Binary sequence expands to identical RGB frames")
+
+
+def test_parallel_save_writes_in_place():
+    """Parallel streams render the container blob in place across workers."""
+    print("Testing parallel save...")
+
+    serial = _make_stream(duration=0.5)
+    renderer = StimulusRenderer(serial.renderer.parameters, _make_setup())
+    store = StimulusSequenceStore()
+
+    with ParallelStimulusRenderer(renderer, workers=2, chunk_frames=4) as parallel:
+        stream = StimulusStream(renderer, parallel=parallel)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            expected = store.open(store.save(serial, Path(temp_dir) / "serial"))
+            loaded = store.open(store.save(stream, Path(temp_dir) / "parallel"))
+
+            assert loaded.slot_count == expected.slot_count
+            assert np.array_equal(loaded.index_columns(), expected.index_columns())
+            for slot_pixels, expected_pixels in zip(
+                loaded.iter_slot_pixels(), expected.iter_slot_pixels()
+            ):
+                assert np.array_equal(slot_pixels, expected_pixels)
+
+            del expected, loaded, slot_pixels, expected_pixels
+
+    print(f"✓ {stream.slot_count} slots rendered in place by 2 workers")
+
+
+def test_stimulus_cache_hits_and_eviction():
+    """Repeat generations reopen the cached container; LRU entries are evicted."""
+    print("Testing stimulus cache...")
+
+    setup = _make_setup()
+    parameters = _make_stream(duration=0.5).renderer.parameters
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generator = StimulusGenerator(cache_directory=temp_dir)
+        cache = generator.stimulus_cache
+
+        first = generator.generate_stimulus_frames(
+            parameters, setup, StimulusGenerationOptions(cached=True)
+        )
+        second = generator.generate_stimulus_frames(
+            parameters, setup, StimulusGenerationOptions(cached=True)
+        )
+        assert first.success and second.success, first.error_message
+        assert not first.metadata["cache_hit"] and second.metadata["cache_hit"]
+        assert second.data.path == first.data.path
+        assert [f.frame_data for f in second.data] == [
+            f.frame_data for f in _make_stream(duration=0.5)
+        ]
+
+        # Non-render setup fields share the entry; render fields do not
+        other_mouse = setup.copy(update={"mouse_eye_height": 7.0})
+        other_monitor = setup.copy(update={"monitor_distance": 12.0})
+        assert cache.key(parameters, other_mouse) == cache.key(parameters, setup)
+        assert cache.key(parameters, other_monitor) != cache.key(parameters, setup)
+
+        statistics = generator.get_cache_statistics().data
+        assert (statistics["hits"], statistics["misses"]) == (1, 1)
+        assert statistics["entries"] == 1
+
+        # A budget of one entry evicts the least recently used sequence
+        entry_bytes = statistics["size_bytes"]
+        small_cache = StimulusCache(cache.cache_directory, max_bytes=entry_bytes)
+        longer = parameters.copy(update={"duration": 0.75})
+        small_cache.put(_make_stream(duration=0.75), longer, setup)
+
+        assert small_cache.get(parameters, setup) is None
+        assert small_cache.get(longer, setup) is not None
+        assert small_cache.statistics()["evictions"] == 1
+
+        del first, second
+
+        # Staging names are unique per process, so processes never share one
+        staged = cache._staging_path(cache.key(parameters, setup))
+        assert str(os.getpid()) in staged.name
+
+    # Without a cache directory nothing is written to disk
+    uncached = StimulusGenerator()
+    result = uncached.generate_stimulus_frames(
+        parameters, setup, StimulusGenerationOptions(cached=True)
+    )
+    assert result.success, result.error_message
+    assert "cache_hit" not in result.metadata
+    assert uncached.stimulus_cache is None
+    assert uncached.get_cache_statistics().data == {"enabled": False}
+
+    print(f"✓ Cache served repeat generation; statistics {statistics['hits']} hit")
+
+
+class _GatedFrames(SequenceABC):
+    """Frames whose reads block until a gate opens, like a long render."""
+
+    def __init__(self, frames, gate: threading.Event):
+        self.frames = frames
+        self.gate = gate
+        self.started = threading.Event()
+        self.reads = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        self.reads += 1
+        self.started.set()
+        self.gate.wait()
+        return self.frames[index]
+
+
+def test_stimulus_cache_renders_without_blocking_lookups():
+    """A render in progress blocks neither lookups nor a same-key repeat render."""
+    print("Testing concurrent stimulus cache renders...")
+
+    setup = _make_setup()
+    stream = _make_stream(duration=0.25)
+    parameters = stream.renderer.parameters
+    other = parameters.copy(update={"duration": 0.5})
+    frames = list(stream)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = StimulusCache(cache_directory=temp_dir)
+        gate = threading.Event()
+        first = _GatedFrames(frames, gate)
+        second = _GatedFrames(frames, gate)
+        results = {}
+
+        def put(name, gated):
+            results[name] = cache.put(gated, parameters, setup)
+
+        rendering = threading.Thread(target=put, args=("first", first))
+        rendering.start()
+        assert first.started.wait(timeout=10)
+
+        # Lookups and statistics answer while the render is blocked
+        started = time.perf_counter()
+        assert cache.get(other, setup) is None
+        assert cache.statistics()["entries"] == 0
+        assert time.perf_counter() - started < 1.0
+
+        # A second miss for the same stimulus waits instead of rendering
+        repeat = threading.Thread(target=put, args=("second", second))
+        repeat.start()
+        time.sleep(0.2)
+        assert second.reads == 0
+
+        gate.set()
+        rendering.join(timeout=30)
+        repeat.join(timeout=30)
+        assert second.reads == 0
+        assert results["first"].path == results["second"].path
+        assert len(results["second"]) == len(frames)
+        assert cache.statistics()["entries"] == 1
+
+        del results
+
+    print("✓ Lookups stayed responsive and the repeat render was shared")
+
+
+def test_pregeneration_restarts_and_fills_cache():
+    """Background renders follow parameter changes and feed the cache."""
+    print("Testing stimulus pre-generation...")
+
+    setup = _make_setup()
+    parameters = _make_stream(duration=0.5).renderer.parameters
+    edited = parameters.copy(update={"duration": 0.75})
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generator = StimulusGenerator(cache_directory=temp_dir)
+        cache = generator.stimulus_cache
+
+        with StimulusPregenerator(generator, settle_seconds=0.2) as pregenerator:
+            # Rapid edits only render the settled parameters
+            pregenerator.update(parameters, setup)
+            pregenerator.update(edited, setup)
+            assert pregenerator.status()["state"] == "waiting"
+            assert pregenerator.wait_for(edited, setup, timeout=30.0)
+            assert pregenerator.status()["state"] == "done"
+            assert not cache.contains(parameters, setup)
+            assert cache.contains(edited, setup)
+
+            result = generator.generate_stimulus_frames(
+                edited, setup, StimulusGenerationOptions(cached=True)
+            )
+            assert result.metadata["cache_hit"]
+
+            # Generating something else abandons the stale expectation
+            pregenerator.update(parameters, setup)
+            assert not pregenerator.wait_for(
+                parameters.copy(update={"duration": 0.25}), setup
+            )
+            assert pregenerator.status()["state"] == "idle"
+
+        # Cancelled saves leave no partial container behind
+        cancel = threading.Event()
+        cancel.set()
+        store = StimulusSequenceStore()
+        target = Path(temp_dir) / f"cancelled{STIMULUS_SEQUENCE_SUFFIX}"
+        try:
+            store.save(_make_stream(duration=0.5), target, cancel=cancel)
+            raise AssertionError("Cancelled save should raise")
+        except RuntimeError as e:
+            print(f"✓ Correctly cancelled save: {e}")
+        assert list(Path(temp_dir).glob("cancelled*")) == []
+
+        del result
+
+    print("✓ Pre-generation rendered the settled stimulus into the cache")
+
+
+def test_pregeneration_requires_a_cache():
+    """Without a cache directory pre-generation fails instead of faking success."""
+    print("Testing pre-generation without a cache...")
+
+    setup = _make_setup()
+    parameters = _make_stream(duration=0.5).renderer.parameters
+
+    with StimulusPregenerator(StimulusGenerator(), settle_seconds=0.0) as pregenerator:
+        pregenerator.update(parameters, setup)
+        assert not pregenerator.wait_for(parameters, setup, timeout=30.0)
+        status = pregenerator.status()
+        assert status["state"] == "failed"
+        assert "cache directory" in status["error"]
+
+    print(f"✓ Pre-generation without a cache reported: {status['error']}")
+
+
+def test_png_export_is_ordered_and_compact():
+    """Frames export as decodable, compressed PNGs in frame order."""
+    print("Testing PNG export...")
+
+    stream = _make_stream(duration=2.0)
+    binary = _make_stream(duration=0.5, frame_format=FrameFormat.BINARY)
+    progress = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        exporter = StimulusImageExporter(workers=4)
+        paths = exporter.export(
+            stream,
+            Path(temp_dir) / "rgb",
+            progress_callback=lambda done, total: progress.append((done, total)),
+        )
+
+        assert [path.name for path in paths[:2]] == [
+            "frame_000000.png",
+            "frame_000001.png",
+        ]
+        assert len(paths) == len(stream)
+        assert progress == [(done, len(stream)) for done in range(1, len(stream) + 1)]
+
+        for index in (0, 17, len(stream) - 1):
+            header, _, rows = _decode_png(paths[index].read_bytes())
+            assert header == (160, 90, 8, 2)
+            assert np.array_equal(rows.reshape(90, 160, 3), stream.frame_pixels(index))
+
+        # Repeated rows filter to zeros, so bar frames compress many times over
+        assert (
+            max(path.stat().st_size for path in paths) * 20
+            < stream.renderer.frame_nbytes
+        )
+
+        # Binary frames keep their packed bits and the stimulus palette
+        result = StimulusGenerator().export_stimulus_images(
+            binary.to_list(), str(Path(temp_dir) / "binary")
+        )
+        assert result.success, result.error_message
+        header, palette, rows = _decode_png(Path(result.data[7]).read_bytes())
+        assert header == (160, 90, 1, 3)
+        assert palette == binary.renderer.palette.tobytes()
+        assert np.array_equal(rows, binary.frame_pixels(7))
+
+    try:
+        StimulusImageExporter(compression_level=12)
+        raise AssertionError("Invalid compression level should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected compression level: {e}")
+
+    print(f"✓ Exported {len(paths)} PNG frames in order")
+
+
+def test_png_export_bounds_encoded_slots():
+    """Periodic exports encode each slot once, within a bounded slot cache."""
+    print("Testing PNG export slot reuse...")
+
+    stream = _make_stream(duration=2.0)
+    assert stream.slot_count < len(stream)
+    encoded = []
+    encode_png = image_export_service.encode_png
+
+    def counting_encode(pixels, metadata, compression_level):
+        encoded.append(1)
+        return encode_png(pixels, metadata, compression_level)
+
+    image_export_service.encode_png = counting_encode
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            reused = StimulusImageExporter(workers=4).export(
+                stream, Path(temp_dir) / "reused"
+            )
+            assert len(encoded) == stream.slot_count
+
+            # A cache smaller than the cycle re-encodes evicted slots
+            del encoded[:]
+            bounded = StimulusImageExporter(workers=4, slot_cache_entries=8).export(
+                stream, Path(temp_dir) / "bounded"
+            )
+            assert stream.slot_count < len(encoded) <= len(stream)
+            assert [path.read_bytes() for path in bounded] == [
+                path.read_bytes() for path in reused
+            ]
+    finally:
+        image_export_service.encode_png = encode_png
+
+    print(f"✓ {stream.slot_count} slots encoded once for {len(stream)} frames")
+
+
+def test_delta_codec_round_trip():
+    """Delta-encoded containers decode losslessly with random access."""
+    print("Testing delta codec storage...")
+
+    stream = _make_stream(duration=2.0)
+    store = StimulusSequenceStore()
+    generator = StimulusGenerator()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        raw_path = store.save(stream, Path(temp_dir) / "raw")
+        saved = generator.save_stimulus_sequence(
+            stream, str(Path(temp_dir) / "delta"), codec="delta"
+        )
+        assert saved.success, saved.error_message
+        assert saved.metadata["codec"] == "delta"
+
+        loaded = generator.load_stimulus_sequence(saved.metadata["output_path"]).data
+        assert isinstance(loaded, DeltaStimulusSequence)
+        assert loaded.slot_count == stream.slot_count
+        assert loaded.metadata == stream.metadata
+        assert raw_path.stat().st_size > 50 * loaded.nbytes
+
+        # Out-of-order access decodes from keyframes; repeats reuse slots
+        for index in (100, 3, 44, 45, 0, len(stream) - 1, 31, 33):
+            assert loaded.frame_timing(index) == stream.frame_timing(index)
+            assert np.array_equal(
+                loaded.frame_pixels(index), stream.frame_pixels(index)
+            )
+
+        start = time.perf_counter()
+        decoded = [pixels for _, _, pixels in loaded.iter_pixels()]
+        per_frame = (time.perf_counter() - start) / len(decoded)
+        assert per_frame < 1 / stream.renderer.parameters.fps
+        assert all(
+            np.array_equal(pixels, expected)
+            for pixels, expected in zip(decoded, stream.iter_slot_pixels())
+        )
+
+        # Flat StimulusFrame lists are diffed in rows recovered from metadata
+        frames = _make_stream(duration=0.25, frame_format=FrameFormat.BINARY).to_list()
+        list_path = store.save(frames, Path(temp_dir) / "list", codec="delta")
+        from_list = store.open(list_path)
+        assert from_list.codec.frame_shape == (90, 20)
+        assert [f.frame_data for f in from_list] == [f.frame_data for f in frames]
+
+        try:
+            MappedStimulusSequence(list_path)
+            raise AssertionError("Raw reader should reject delta containers")
+        except ValueError as e:
+            print(f"✓ Correctly rejected encoded container: {e}")
+
+        del loaded, from_list
+
+    try:
+        store.save(frames, "unused", codec="lzw")
+        raise AssertionError("Unknown codec should be rejected")
+    except ValueError as e:
+        print(f"✓ Correctly rejected codec: {e}")
+
+    print(f"✓ Delta codec decodes in {per_frame * 1000:.2f} ms per frame")
+
+
+def test_columnar_sequence():
+    """StimulusSequence holds columns, one metadata block and one pixel buffer."""
+    print("Testing columnar stimulus sequence...")
+
+    stream = _make_stream(duration=0.5)
+    sequence = StimulusSequence.from_frames(stream)
+
+    assert sequence.frames.flags.c_contiguous
+    assert sequence.slot_count == stream.slot_count
+    assert np.array_equal(sequence.timestamps, stream.index_columns()[1])
+
+    views = list(sequence)
+    assert all(isinstance(view, StimulusFrameView) for view in views)
+    assert views[3].pixels.base is not None
+    assert views[3].metadata is views[4].metadata
+    assert [v.frame_data for v in views] == [f.frame_data for f in stream]
+
+    # StimulusFrame lists convert to the same columnar layout
+    frames = stream.to_list()
+    from_list = StimulusSequence.from_frames(frames)
+    assert np.array_equal(from_list.frame_numbers, sequence.frame_numbers)
+    assert from_list[5].frame_data == frames[5].frame_data
+
+    store = StimulusSequenceStore()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = StimulusGenerator().save_stimulus_sequence(
+            sequence, str(Path(temp_dir) / "columnar")
+        )
+        assert result.success, result.error_message
+        loaded = store.open(result.metadata["output_path"])
+        assert loaded.slot_count == sequence.slot_count
+        assert np.array_equal(loaded.frame_pixels(25), sequence.frame_pixels(25))
+        del loaded
+
+    print(f"✓ {len(sequence)} frames in one {sequence.frames.nbytes} byte buffer")
+
+
+def test_synchronizer_accepts_sequences():
+    """Synchronization of a sequence matches the per-frame nearest search."""
+    print("Testing frame synchronization on sequences...")
+
+    sequence = StimulusSequence.from_frames(_make_stream(duration=0.5))
+    camera_times = [0.0, 0.004, 1 / 120, 0.1, 0.2501, 0.49, 3.0]
+
+    def camera_frames():
+        return [
+            CameraFrame(frame_number=i, timestamp=t, camera_timestamp=t, frame_data=b"")
+            for i, t in enumerate(camera_times)
+        ]
+
+    synchronizer = FrameSynchronizer()
+    from_sequence = synchronizer.synchronize_frames(camera_frames(), sequence)
+    from_list = synchronizer.synchronize_frames(camera_frames(), sequence.to_list())
+    assert from_sequence.success and from_list.success, from_sequence.error_message
+
+    for time, (camera, stimulus), (_, expected) in zip(
+        camera_times, from_sequence.data, from_list.data
+    ):
+        nearest = min(sequence.to_list(), key=lambda f: abs(time - f.timestamp))
+        assert stimulus.frame_number == expected.frame_number == nearest.frame_number
+        assert camera.synchronized_stimulus_frame == nearest.frame_number
+
+    print(f"✓ {len(from_sequence.data)} camera frames matched from timestamp column")
+
+
+def test_list_round_trip_and_validation():
+    """Plain frame lists are stored as fixed-stride byte frames."""
+    print("Testing list storage and validation...")
+
+    frames = [
+        StimulusFrame(
+            frame_number=i,
+            timestamp=i / 30,
+            frame_data=bytes([i]) * 12,
+            metadata={"stimulus_type": "custom"},
+        )
+        for i in range(5)
+    ]
+    store = StimulusSequenceStore()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        loaded = store.open(store.save(frames, Path(temp_dir) / "frames"))
+        assert [f.frame_data for f in loaded] == [f.frame_data for f in frames]
+        del loaded
+
+        frames.append(StimulusFrame(frame_number=5, timestamp=0.2, frame_data=b"short"))
+        try:
+            store.save(frames, Path(temp_dir) / "ragged")
+            raise AssertionError("Ragged frames should be rejected")
+        except ValueError as e:
+            print(f"✓ Correctly rejected ragged frames: {e}")
+
+        assert not (Path(temp_dir) / f"ragged{STIMULUS_SEQUENCE_SUFFIX}").exists()
+
+        corrupt = Path(temp_dir) / f"corrupt{STIMULUS_SEQUENCE_SUFFIX}"
+        corrupt.write_bytes(b"not a container" * 8)
+        result = StimulusGenerator().load_stimulus_sequence(str(corrupt))
+        assert not result.success
+        print(f"✓ Correctly rejected corrupt file: {result.error_message}")
+
+
+def main():
+    """Run all stimulus storage tests."""
+    print("=== Stimulus Storage Tests ===\n")
+    test_stream_round_trip()
+    test_concurrent_saves_of_one_target()
+    test_periodic_sequence_stores_one_cycle()
+    test_frame_views_are_memory_mapped()
+    test_binary_stream_round_trip()
+    test_parallel_save_writes_in_place()
+    test_stimulus_cache_hits_and_eviction()
+    test_stimulus_cache_renders_without_blocking_lookups()
+    test_pregeneration_restarts_and_fills_cache()
+    test_pregeneration_requires_a_cache()
+    test_png_export_is_ordered_and_compact()
+    test_png_export_bounds_encoded_slots()
+    test_delta_codec_round_trip()
+    test_columnar_sequence()
+    test_synchronizer_accepts_sequences()
+    test_list_round_trip_and_validation()
+    print("\n=== Stimulus Storage Tests Complete ===")
+
+
+if __name__ == "__main__":
+    main()